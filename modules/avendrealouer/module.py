@@ -76,3 +76,7 @@ class AvendrealouerModule(Module, CapHousing):
         return housing
 
     OBJECTS = {Housing: fill_housing}
+
+    # fill methods only download files with browser.open()
+    FILLOBJ_BATCH_SIZE = 10
+    FILLOBJ_MAX_WORKERS = 4
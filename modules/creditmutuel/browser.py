@@ -31,6 +31,7 @@ from weboob.exceptions import (
     BrowserIncorrectPassword, BrowserUnavailable, BrowserQuestion, NoAccountsException, NeedInteractiveFor2FA,
 )
 from weboob.tools.compat import basestring
+from weboob.tools.memo import sync_memoized
 from weboob.tools.value import Value
 from weboob.tools.capabilities.bank.transactions import FrenchTransaction, sorted_transactions
 from weboob.browser.browsers import need_login, TwoFactorBrowser
@@ -753,6 +754,8 @@ class CreditMutuelBrowser(TwoFactorBrowser):
                     self.page.fill_market_order(obj=order)
                 yield order
 
+    # iter_history and iter_coming of the module both filter this history
+    @sync_memoized
     @need_login
     def get_history(self, account):
         transactions = []
@@ -85,6 +85,9 @@ class CreditMutuelModule(
         for tr in self.browser.get_history(account):
             if tr._is_coming:
                 yield tr
+            elif self.sync_cache.shared:
+                # read the whole history, so it is cached for iter_history
+                continue
             else:
                 break
 
@@ -18,6 +18,13 @@
 # along with this weboob module. If not, see <http://www.gnu.org/licenses/>.
 
 
+from datetime import date
+import os
+from unittest import TestCase
+
+from weboob.capabilities.bank import Account
+from weboob.core.ouiboube import WebNip
+from weboob.tools.capabilities.bank.transactions import FrenchTransaction
 from weboob.tools.test import BackendTest
 
 
@@ -29,3 +36,45 @@ class CreditMutuelTest(BackendTest):
         if len(l) > 0:
             a = l[0]
             list(self.backend.iter_history(a))
+
+
+class CreditMutuelSyncTest(TestCase):
+    def setUp(self):
+        weboob = WebNip(modules_path=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.addCleanup(weboob.deinit)
+        self.module = weboob.build_backend('creditmutuel', {'login': 'foo', 'password': 'bar'})
+        self.browser = self.module.browser
+        self.browser.logged = True
+        self.browser.list_operations = self.list_operations
+        self.calls = 0
+
+        self.account = Account('1234')
+        self.account._is_inv = False
+        self.account._link_id = 'operations'
+
+    def list_operations(self, page, account):
+        self.calls += 1
+        for day, is_coming in ((3, True), (2, False), (1, False)):
+            tr = FrenchTransaction()
+            tr.date = date(2020, 1, day)
+            tr._is_coming = is_coming
+            yield tr
+
+    def test_history_fetched_once(self):
+        with self.module.sync_scope():
+            self.assertEqual(len(list(self.module.iter_coming(self.account))), 1)
+            self.assertEqual(len(list(self.module.iter_history(self.account))), 2)
+        self.assertEqual(self.calls, 1)
+
+        # without a scope, each method fetches the history
+        list(self.module.iter_coming(self.account))
+        list(self.module.iter_history(self.account))
+        self.assertEqual(self.calls, 3)
+
+    def test_call_scope(self):
+        # a scope opened around a single call doesn't make iter_coming read
+        # the whole history
+        with self.module.sync_scope(call=True):
+            self.assertEqual(len(list(self.module.iter_coming(self.account))), 1)
+            self.assertEqual(len(list(self.module.iter_history(self.account))), 2)
+        self.assertEqual(self.calls, 2)
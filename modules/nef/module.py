@@ -43,6 +43,9 @@ class NefModule(Module, CapBankTransfer):
     CONFIG = BackendConfig(ValueBackendPassword('login', label='username', regexp='.+'),
                            ValueBackendPassword('password', label='Password'))
 
+    # the CSV export is ordered by date, descending
+    HISTORY_SORTED = True
+
     def create_default_browser(self):
         return self.create_browser(self.config['login'].get(),
                                    self.config['password'].get())
@@ -45,6 +45,9 @@ class SogecartenetModule(Module, CapBank):
         }),
     )
 
+    # history pages are months, from the most recent one
+    HISTORY_SORTED = True
+
     def create_default_browser(self):
         browsers = {
             'titulaire': SogecarteTitulaireBrowser,
@@ -47,3 +47,7 @@ class UnsplashModule(Module, CapImage):
             img.thumbnail.data = self.browser.open(img.thumbnail.url).content
 
     OBJECTS = {BaseImage: fill_image}
+
+    # fill methods only download files with browser.open()
+    FILLOBJ_BATCH_SIZE = 10
+    FILLOBJ_MAX_WORKERS = 4
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Copyright(C) 2020  weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure instantiation of the BROWSER of every module.
+
+Constructor arguments are filled with dummy values. Browsers which can't be
+built this way (abstract browsers, missing dependencies, constructors doing
+requests) are skipped.
+"""
+
+from __future__ import print_function
+
+import argparse
+import inspect
+import logging
+import os
+import time
+
+from weboob import __version__
+from weboob.browser.browsers import AbstractBrowser, PagesBrowser
+from weboob.core.modules import ModulesLoader, ModuleLoadError
+from weboob.tools.value import Value
+
+
+class FakeConfig(dict):
+    def __missing__(self, key):
+        return Value(default=u'')
+
+
+def make_args(klass):
+    args = []
+    for name, param in inspect.signature(klass.__init__).parameters.items():
+        if name == 'self' or param.kind != param.POSITIONAL_OR_KEYWORD or param.default is not param.empty:
+            continue
+        args.append(FakeConfig() if name == 'config' else u'dummy')
+    return args
+
+
+def iter_browsers(path, only=None):
+    loader = ModulesLoader(path, __version__)
+    for name in sorted(loader.iter_existing_module_names()):
+        if only and name not in only:
+            continue
+        try:
+            module = loader.get_or_load_module(name)
+        except ModuleLoadError:
+            continue
+        klass = module.klass.BROWSER
+        if klass is None or issubclass(klass, AbstractBrowser) or not issubclass(klass, PagesBrowser):
+            continue
+
+        args = make_args(klass)
+        try:
+            klass(*args).deinit()
+        except Exception:
+            continue
+        yield name, klass, args
+
+
+def bench(klass, args, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        browser = klass(*args)
+        duration = time.time() - start
+        browser.deinit()
+        if best is None or duration < best:
+            best = duration
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-p', '--path', default=os.path.join(os.path.dirname(__file__), '..', 'modules'),
+                        help='path to modules')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='keep the best of N runs')
+    parser.add_argument('-v', '--verbose', action='store_true', help='display time of every browser')
+    parser.add_argument('modules', nargs='*', help='only these modules')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    total = 0
+    count = 0
+    for name, klass, browser_args in iter_browsers(args.path, args.modules):
+        duration = bench(klass, browser_args, args.repeat)
+        if args.verbose:
+            print('%-24s %3d URLs %8.0f us' % (name, len(klass.get_url_registry()), duration * 1e6))
+        total += duration
+        count += 1
+
+    print('%d browsers, %.1f ms in total, %.0f us per browser' % (count, total * 1e3, total * 1e6 / max(count, 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# Copyright(C) 2020  weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure ItemElement throughput on a synthetic history page.
+
+The page is parsed once with the DEBUG_FILTERS level disabled (normal
+runs), and once with it enabled, which is the cost every filter call paid
+before the debug string was built lazily.
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import time
+
+import lxml.html
+
+from weboob.browser.elements import ListElement, ItemElement, TableElement
+from weboob.browser.filters.html import TableCell
+from weboob.browser.filters.standard import CleanText, CleanDecimal, Date, Regexp, Env
+from weboob.capabilities.bank import Transaction
+from weboob.tools.log import DEBUG_FILTERS
+
+
+class FakePage(object):
+    browser = None
+    logger = None
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.params = {}
+
+
+class iter_history(TableElement):
+    head_xpath = '//table/thead/tr/th'
+    item_xpath = '//table/tbody/tr'
+
+    col_date = 'Date'
+    col_label = 'Label'
+    col_amount = 'Amount'
+
+    class item(ItemElement):
+        klass = Transaction
+
+        obj_id = Regexp(CleanText('./@id'), r'row-(\d+)')
+        obj_date = Date(CleanText(TableCell('date')), dayfirst=True)
+        obj_label = CleanText(TableCell('label'))
+        obj_amount = CleanDecimal.French(TableCell('amount'))
+        obj_category = Env('category', default=None)
+
+
+class iter_list(ListElement):
+    item_xpath = '//table/tbody/tr'
+
+    class item(ItemElement):
+        klass = Transaction
+
+        obj_id = Regexp(CleanText('./@id'), r'row-(\d+)')
+        obj_date = Date(CleanText('./td[1]'), dayfirst=True)
+        obj_label = CleanText('./td[2]')
+        obj_amount = CleanDecimal.French('./td[3]')
+
+
+def build_doc(rows):
+    lines = ['<html><body><table><thead><tr><th>Date</th><th>Label</th><th>Amount</th></tr></thead><tbody>']
+    for i in range(rows):
+        lines.append('<tr id="row-%d"><td>%02d/01/2020</td><td>  CB  SHOP   %d  </td><td>-1 %03d,%02d €</td></tr>'
+                     % (i, i % 28 + 1, i, i % 1000, i % 100))
+    lines.append('</tbody></table></body></html>')
+    return lxml.html.fromstring(''.join(lines))
+
+
+def bench(element, doc, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        count = len(list(element(FakePage(doc))()))
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+    return count / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--rows', type=int, default=2000, help='number of rows in the page')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='keep the best of N runs')
+    args = parser.parse_args()
+
+    doc = build_doc(args.rows)
+    logger = logging.getLogger('b2filters')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    for element in (iter_list, iter_history):
+        for level, label in ((logging.DEBUG, 'DEBUG_FILTERS off'), (DEBUG_FILTERS, 'DEBUG_FILTERS on')):
+            logger.setLevel(level)
+            print('%-14s %-18s %10.0f items/s' % (element.__name__, label, bench(element, doc, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# Copyright(C) 2020  weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure creation of Transaction and Account objects.
+
+Objects are built like a module does: construct the object, then set the
+fields parsed from the website.
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import time
+from decimal import Decimal
+
+from weboob.capabilities.bank import Account, Transaction
+
+
+def make_transaction(i):
+    tr = Transaction(str(i))
+    tr.date = datetime.date(2020, 1, i % 28 + 1)
+    tr.rdate = tr.date
+    tr.type = Transaction.TYPE_CARD
+    tr.raw = u'CB SHOP %d' % i
+    tr.label = u'SHOP %d' % i
+    tr.amount = Decimal(-i)
+    return tr
+
+
+def make_account(i):
+    account = Account(str(i))
+    account.label = u'Account %d' % i
+    account.currency = u'EUR'
+    account.type = Account.TYPE_CHECKING
+    account.balance = Decimal(i)
+    account.iban = u'FR7630004000031234567890143'
+    return account
+
+
+def bench(function, count, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for i in range(count):
+            function(i)
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+    return count / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--count', type=int, default=20000, help='number of objects to create')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='keep the best of N runs')
+    args = parser.parse_args()
+
+    for function in (make_transaction, make_account):
+        print('%-18s %10.0f objects/s' % (function.__name__, bench(function, args.count, args.repeat)))
+    print('%-18s %10.0f objects/s' % ('copy', bench(lambda i, tr=make_transaction(0): tr.copy(),
+                                                    args.count, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# Copyright(C) 2020  weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the cold start of listing all modules with their capabilities.
+
+Every run is done in a new interpreter. The "static" mode reads metadata
+of modules from their sources, the "import" mode imports every module, as
+when their metadata can't be read statically.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def run(path, mode):
+    from weboob.core.modules import LoadedModule, ModulesLoader, import_module_package
+    from weboob.core.ouiboube import Weboob
+
+    start = time.time()
+    loader = ModulesLoader(path, Weboob.VERSION)
+    if mode == 'import':
+        for name in loader.iter_existing_module_names():
+            try:
+                loader.loaded[name] = LoadedModule(import_module_package(name, path))
+            except Exception:
+                continue
+    else:
+        for name in loader.iter_existing_module_names():
+            try:
+                loader.load_module(name)
+            except Exception:
+                continue
+
+    modules = caps = 0
+    for module in loader.loaded.values():
+        try:
+            module.config
+        except Exception:
+            continue
+        modules += 1
+        caps += len(list(module.iter_caps()))
+    return {
+        'modules': modules,
+        'caps': caps,
+        'time': time.time() - start,
+        'imported': len(sys.modules),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-p', '--path', default=os.path.join(os.path.dirname(__file__), os.pardir, 'modules'),
+                        help='directory of modules')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='keep the best of N runs')
+    parser.add_argument('--run', choices=('static', 'import'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(os.path.abspath(args.path), args.run)))
+        return
+
+    for mode in ('static', 'import'):
+        results = []
+        for _ in range(args.repeat):
+            output = subprocess.check_output([sys.executable, __file__, '--path', args.path, '--run', mode],
+                                             stderr=open(os.devnull, 'w'))
+            results.append(json.loads(output.decode('utf-8').strip().split('\n')[-1]))
+        best = min(results, key=lambda result: result['time'])
+        print('%-8s %4d modules %5d caps %8.2fs %6d modules in sys.modules' % (
+            mode, best['modules'], best['caps'], best['time'], best['imported']))
+
+
+if __name__ == '__main__':
+    main()
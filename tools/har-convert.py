@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+from argparse import ArgumentParser
+import json
+
+from weboob.browser.har import load_har
+
+
+def main():
+    parser = ArgumentParser(description='Convert a bundle saved by weboob to a standalone HAR file')
+    parser.add_argument('file', help='bundle.har, bundle.jsonl, bundle.jsonl.gz or bundle.jsonl.zst file')
+    parser.add_argument('output', nargs='?', default=None, help='HAR file to write')
+    args = parser.parse_args()
+
+    if args.output is None:
+        args.output = args.file.split('.jsonl')[0]
+        if not args.output.endswith('.har'):
+            args.output += '.har'
+        if args.output == args.file:
+            parser.error('please give an output file')
+
+    with open(args.output, 'w') as fd:
+        json.dump(load_har(args.file), fd, separators=(',', ':'))
+
+
+if __name__ == '__main__':
+    main()
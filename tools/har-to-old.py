@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 
-from argparse import ArgumentParser, FileType
+from argparse import ArgumentParser
 from base64 import b64decode
-import json
 import mimetypes
 import os
 from pathlib import Path
 from urllib.parse import urlparse
 
+from weboob.browser.har import load_har
+
 
 def write_request(entry, fd):
     entry = entry['request']
@@ -76,18 +77,18 @@ def main():
             write_body(entry, fd)
 
     parser = ArgumentParser()
-    parser.add_argument('file', type=FileType('r'), help='HAR file to extract')
+    parser.add_argument('file', help='HAR file, or JSON lines bundle, to extract')
     parser.add_argument('destdir', nargs='?', default=None, help='Destination directory for extracted files')
     args = parser.parse_args()
 
     if args.destdir is None:
         # Automatically generate destdir if not provided
-        if args.file.name.endswith('.har'):
-            args.destdir = args.file.name[:-4]
+        if args.file.endswith('.har'):
+            args.destdir = args.file[:-4]
         else:
-            args.destdir = f'{args.file.name}_content'
+            args.destdir = f'{args.file}_content'
 
-    data = json.load(args.file)
+    data = load_har(args.file)
     for n in range(len(data['log']['entries'])):
         print('extracting request', n)
         extract(n, args.destdir)
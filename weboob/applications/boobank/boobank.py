@@ -19,6 +19,7 @@
 
 from __future__ import print_function
 
+from collections import OrderedDict
 from contextlib import contextmanager
 import datetime
 import uuid
@@ -47,6 +48,8 @@ from weboob.capabilities.profile import CapProfile
 from weboob.tools.application.repl import ReplApplication, defaultcount
 from weboob.tools.application.captcha import CaptchaMixin
 from weboob.tools.application.formatters.iformatter import IFormatter, PrettyFormatter
+from weboob.tools.capabilities.bank.sync import HistorySync
+from weboob.tools.capabilities.bank.transactions import merge_iterators
 from weboob.tools.compat import getproxies
 from weboob.tools.log import getLogger
 from weboob.tools.misc import to_unicode
@@ -499,6 +502,19 @@ class EmitterListFormatter(IFormatter):
         )
 
 
+def _iter_backend_history(backend, command, accounts, *args):
+    if command == 'iter_new_history':
+        iter_history = HistorySync(backend).iter_new_history
+    else:
+        iter_history = getattr(backend, command)
+
+    if len(accounts) == 1:
+        return iter_history(accounts[0], *args)
+
+    # histories are read one after another, as they use the same browser
+    return merge_iterators(*[list(iter_history(account, *args)) for account in accounts])
+
+
 class Boobank(CaptchaMixin, ReplApplication):
     APPNAME = 'boobank'
     VERSION = '2.1'
@@ -527,6 +543,7 @@ class Boobank(CaptchaMixin, ReplApplication):
                            'transfer':    'transfer',
                            'history':     'ops_list',
                            'coming':      'ops_list',
+                           'sync':        'ops_list',
                            'transfer_history': 'transfer_list',
                            'investment':  'investment_list',
                            'advisor':     'advisor_list',
@@ -617,14 +634,44 @@ class Boobank(CaptchaMixin, ReplApplication):
         """
         return self.do_ls(line)
 
+    def iter_merged_history(self, command, accounts, *args):
+        """
+        Merge transactions of accounts, most recent first.
+
+        *command* is a method of :class:`CapBank` called with every account
+        and *args*, or 'iter_new_history' to only get transactions not seen
+        by the previous synchronization (see :class:`HistorySync`).
+
+        A backend runs one call at a time, so accounts of a same backend are
+        read in a single call: a call paused until its results are consumed
+        would prevent the next one from starting.
+        """
+        accounts_by_backend = OrderedDict()
+        for account in accounts:
+            accounts_by_backend.setdefault(account.backend, []).append(account)
+
+        histories = [self.do(_iter_backend_history, command, backend_accounts, *args, backends=backend)
+                     for backend, backend_accounts in accounts_by_backend.items()]
+        return merge_iterators(*histories)
+
+    def get_accounts(self, ids):
+        accounts = []
+        for id in ids.split(','):
+            account = self.get_object(id, 'get_account', [])
+            if not account:
+                print('Error: account "%s" not found (Hint: try the command "list")' % id, file=self.stderr)
+                return None
+            accounts.append(account)
+        return accounts
+
     def show_history(self, command, line):
-        id, end_date = self.parse_command_args(line, 2, 1)
+        ids, end_date = self.parse_command_args(line, 2, 1)
 
-        account = self.get_object(id, 'get_account', [])
-        if not account:
-            print('Error: account "%s" not found (Hint: try the command "list")' % id, file=self.stderr)
+        accounts = self.get_accounts(ids)
+        if not accounts:
             return 2
 
+        args = ()
         if end_date is not None:
             try:
                 end_date = parse_date(end_date)
@@ -635,11 +682,16 @@ class Boobank(CaptchaMixin, ReplApplication):
             old_count = self.options.count
             self.options.count = None
 
-        self.start_format(account=account)
-        for transaction in self.do(command, account, backends=account.backend):
-            if end_date is not None and transaction.date < end_date:
-                break
-            self.format(transaction)
+            if command == 'iter_history':
+                # let modules stop fetching pages at this date
+                command, args = 'iter_history_since', (end_date,)
+
+        self.start_format(account=accounts[0])
+        with self.weboob.sync_scope(backends=[account.backend for account in accounts]):
+            for transaction in self.iter_merged_history(command, accounts, *args):
+                if end_date is not None and transaction.date < end_date:
+                    break
+                self.format(transaction)
 
         if end_date is not None:
             self.options.count = old_count
@@ -652,10 +704,11 @@ class Boobank(CaptchaMixin, ReplApplication):
     @defaultcount(10)
     def do_history(self, line):
         """
-        history ID [END_DATE]
+        history ID[,ID...] [END_DATE]
 
         Display history of transactions.
 
+        If several accounts are given, their histories are merged.
         If END_DATE is supplied, list all transactions until this date.
         """
         return self.show_history('iter_history', line)
@@ -668,14 +721,41 @@ class Boobank(CaptchaMixin, ReplApplication):
     @defaultcount(10)
     def do_coming(self, line):
         """
-        coming ID [END_DATE]
+        coming ID[,ID...] [END_DATE]
 
         Display future transactions.
 
+        If several accounts are given, their transactions are merged.
         If END_DATE is supplied, show all transactions until this date.
         """
         return self.show_history('iter_coming', line)
 
+    def complete_sync(self, text, line, *ignored):
+        args = line.split(' ')
+        if len(args) == 2:
+            return self._complete_account()
+
+    def do_sync(self, line):
+        """
+        sync ID[,ID...]
+
+        Display transactions not seen by the previous synchronization of
+        these accounts.
+
+        The first synchronization displays the whole history. An account is
+        only synchronized once its whole history has been read.
+        """
+        ids, = self.parse_command_args(line, 1, 1)
+
+        accounts = self.get_accounts(ids)
+        if not accounts:
+            return 2
+
+        self.start_format(account=accounts[0])
+        with self.weboob.sync_scope(backends=[account.backend for account in accounts]):
+            for transaction in self.iter_merged_history('iter_new_history', accounts):
+                self.format(transaction)
+
     def complete_transfer(self, text, line, *ignored):
         args = line.split(' ')
         if len(args) == 2:
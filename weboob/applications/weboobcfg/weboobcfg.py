@@ -161,6 +161,8 @@ class WeboobCfg(ReplApplication):
         for backend_name, module_name, params in sorted(self.weboob.backends_config.iter_backends()):
             try:
                 module = self.weboob.modules_loader.get_or_load_module(module_name)
+                # may import the module, if its config can't be read statically
+                config = module.config
             except ModuleLoadError as e:
                 self.logger.warning('Unable to load module %r: %s' % (module_name, e))
                 continue
@@ -170,7 +172,7 @@ class WeboobCfg(ReplApplication):
             row = OrderedDict([('Name', backend_name),
                                ('Module', module_name),
                                ('Configuration', ', '.join(
-                                   '%s=%s' % (key, ('*****' if key in module.config and module.config[key].masked
+                                   '%s=%s' % (key, ('*****' if key in config and config[key].masked
                                                     else value))
                                    for key, value in params.items())),
                                ])
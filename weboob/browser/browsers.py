@@ -24,7 +24,6 @@ from functools import wraps
 import re
 import pickle
 import base64
-import io
 from hashlib import sha256
 import zlib
 from functools import reduce
@@ -34,7 +33,6 @@ except ImportError:
     import urllib3
 import os
 import sys
-from copy import deepcopy
 import inspect
 from datetime import datetime, timedelta
 from dateutil import parser
@@ -54,19 +52,22 @@ from weboob.exceptions import (
 )
 
 from weboob.tools.log import getLogger
+from weboob.tools.memo import SyncCache
 from weboob.tools.compat import basestring, unicode, urlparse, urljoin, urlencode, parse_qsl
 from weboob.tools.misc import to_unicode
 from weboob.tools.json import json
 from weboob.tools.value import Value
-from weboob import __version__
 
 from .adapters import HTTPAdapter
 from .cookies import WeboobCookieJar
+from .har import HARWriter
+from .ratelimit import RateLimiter
+from .retry_policy import RetryPolicy, RetryStats
 from .exceptions import HTTPNotFound, ClientError, ServerError
 from .sessions import FuturesSession
 from .profiles import Firefox
-from .pages import NextPage
-from .url import URL, normalize_url
+from .pages import NextPage, prefetch_pagination
+from .url import URL, URLRouter, normalize_url
 
 
 class Browser(object):
@@ -98,7 +99,16 @@ class Browser(object):
 
     MAX_RETRIES = 2
     """
-    Maximum retries on failed requests.
+    Maximum retries on failed connections, done immediately by the
+    transport adapter. Not used with a :attr:`RETRY_POLICY`, which retries
+    them itself, as retries of both would multiply.
+    """
+
+    RETRY_POLICY = RetryPolicy()
+    """
+    Policy to retry requests failing because of the network or the server,
+    with backoff (see :class:`weboob.browser.retry_policy.RetryPolicy`). None to
+    disable it. Counters are in `self.session.retry_stats`.
     """
 
     MAX_WORKERS = 10
@@ -117,6 +127,46 @@ class Browser(object):
     Example: weboob.browser.cookies.BlockAllCookies()
     """
 
+    RATE_LIMIT = None
+    """
+    Maximum number of requests per second to a host, shared by all browsers
+    of the process. None to disable rate limiting.
+    """
+
+    RATE_LIMIT_BURST = 1
+    """
+    Number of requests to a host which can be sent at once before
+    :attr:`RATE_LIMIT` applies.
+    """
+
+    HONOR_RETRY_AFTER = False
+    """
+    Delay next requests to a host as asked by the `Retry-After` header of its
+    429 and 503 responses.
+    """
+
+    HAR_FORMAT = 'har'
+    """
+    Format of the bundle where responses are saved when `responses_dirname`
+    is set, one of :data:`weboob.browser.har.HAR_FORMATS`. The `jsonl.gz`
+    format is the cheapest to write. Overridden by the `WEBOOB_HAR_FORMAT`
+    environment variable.
+    """
+
+    HAR_SIDE_FILES = False
+    """
+    Save binary and large bodies of responses in files next to the bundle,
+    instead of inlining them in base64 (see
+    :class:`weboob.browser.har.HARWriter`). Overridden by the
+    `WEBOOB_HAR_SIDE_FILES` environment variable.
+    """
+
+    REPLAY_IGNORE_PARAMS = ()
+    """
+    Volatile query parameters ignored when matching requests against a
+    replayed HAR file (see the `WEBOOB_HAR_REPLAY` environment variable).
+    """
+
     @classmethod
     def asset(cls, localfile):
         """
@@ -150,10 +200,25 @@ class Browser(object):
         self._setup_session(self.PROFILE)
         self.url = None
         self.response = None
-        self.har_bundle = None
+        self.har_writer = None
+        self.sync_cache = SyncCache()
+
+    def sync_scope(self):
+        """
+        Context manager during which results of methods decorated by
+        :func:`weboob.tools.memo.sync_memoized` are cached.
+
+        When the browser belongs to a module, use
+        :meth:`weboob.tools.backend.Module.sync_scope` instead.
+        """
+        return self.sync_cache.scope()
 
     def deinit(self):
         self.session.close()
+        if self.session.retry_stats is not None and self.session.retry_stats.retries:
+            self.logger.debug('retry stats: %s', self.session.retry_stats)
+        if self.har_writer is not None:
+            self.har_writer.flush()
 
     def set_normalized_url(self, response, **kwargs):
         response.url = normalize_url(response.url)
@@ -215,31 +280,6 @@ class Browser(object):
 
         request = response.request
 
-        if not self.har_bundle:
-            self.har_bundle = {
-                'log': {
-                    'version': '1.2',
-                    'creator': {
-                        'name': 'weboob',
-                        'version': __version__,
-                    },
-                    'browser': {
-                        'name': 'weboob',
-                        'version': __version__,
-                    },
-                    # there are no pages, but we need that to please firefox
-                    'pages': [{
-                        'id': 'fake_page',
-                        'pageTimings': {},
-                        # and chromium wants some of it too
-                        'startedDateTime': (datetime.now() - response.elapsed).isoformat(),
-                    }],
-                    # don't put additional data after this list, to have a fixed-size suffix after it
-                    # so we can add more entries without rewriting the whole file.
-                    'entries': [],
-                },
-            }
-
         har_entry = {
             '$anchor': slug,
             'startedDateTime': (datetime.now() - response.elapsed).isoformat(),
@@ -288,13 +328,10 @@ class Browser(object):
                     }
                     for k, v in response.headers.items()
                 ],
+                # the text, or the side file, is set by the HAR writer
                 'content': {
                     'mimeType': response.headers.get('Content-Type', ''),
                     'size': len(response.content),
-                    # systematically use base64 to avoid more content alteration
-                    # than there already is...
-                    'encoding': "base64",
-                    'text': base64.b64encode(response.content).decode('ascii'),
                 },
                 'cookies': [
                     {
@@ -336,31 +373,12 @@ class Browser(object):
                     } for key, value in parse_qsl(request.body)
                 ]
 
-        with self.responses_lock:
-            self.har_bundle['log']['entries'].append(har_entry)
-
-            har_path = os.path.join(self.responses_dirname, 'bundle.har')
-            if not os.path.isfile(har_path):
-                with open(har_path, 'w') as fd:
-                    json.dump(self.har_bundle, fd, separators=(',', ':'))
-            else:
-                # hack to avoid rewriting the whole file: entries are last in the JSON file
-                # we need to seek at the right place and write the new entry.
-                # this will unfortunately overwrite closings.
-                suffix = "]}}"
-                with open(har_path, 'r+') as fd:
-                    # can't seek with a negative value...
-                    fd.seek(0, io.SEEK_END)
-                    after_entry_pos = fd.tell() - len(suffix)
-                    fd.seek(after_entry_pos)
-
-                    if fd.read(len(suffix)) != suffix:
-                        self.logger.warning('HAR file does not end with the expected pattern')
-                    else:
-                        fd.seek(after_entry_pos)
-                        fd.write(',')  # there should have been at least one entry
-                        json.dump(har_entry, fd, separators=(',', ':'))
-                        fd.write(suffix)
+        if self.har_writer is None:
+            fmt = os.environ.get('WEBOOB_HAR_FORMAT', self.HAR_FORMAT)
+            side_files = os.environ.get('WEBOOB_HAR_SIDE_FILES', '1' if self.HAR_SIDE_FILES else '0') == '1'
+            self.har_writer = HARWriter.for_directory(self.responses_dirname, fmt, logger=self.logger,
+                                                      side_files=side_files)
+        self.har_writer.add(har_entry, response.content)
 
         msg = u'Response saved to %s' % response_filepath
         if warning:
@@ -368,8 +386,13 @@ class Browser(object):
         else:
             self.logger.info(msg)
 
+    def _get_adapter_retries(self):
+        if self.RETRY_POLICY is not None:
+            return 0
+        return self.MAX_RETRIES
+
     def _create_session(self):
-        return FuturesSession(max_workers=self.MAX_WORKERS, max_retries=self.MAX_RETRIES)
+        return FuturesSession(max_workers=self.MAX_WORKERS, max_retries=self._get_adapter_retries())
 
     def _setup_session(self, profile):
         """
@@ -389,7 +412,7 @@ class Browser(object):
 
         # defines a max_retries. It's mandatory in case a server is not
         # handling keep alive correctly, like the proxy burp
-        adapter_kwargs = dict(max_retries=self.MAX_RETRIES,
+        adapter_kwargs = dict(max_retries=self._get_adapter_retries(),
                               proxy_headers=self.proxy_headers)
         # set connection pool size equal to MAX_WORKERS if needed
         if self.MAX_WORKERS > requests.adapters.DEFAULT_POOLSIZE:
@@ -398,10 +421,26 @@ class Browser(object):
         session.mount('https://', HTTPAdapter(**adapter_kwargs))
         session.mount('http://', HTTPAdapter(**adapter_kwargs))
 
+        if os.environ.get('WEBOOB_HAR_REPLAY'):
+            # serve responses from a HAR file, without network
+            session.replay_har(os.environ['WEBOOB_HAR_REPLAY'],
+                               match_body=os.environ.get('WEBOOB_HAR_REPLAY_MATCH_BODY') == '1',
+                               ignore_params=self.REPLAY_IGNORE_PARAMS,
+                               strict=os.environ.get('WEBOOB_HAR_REPLAY_LENIENT') != '1')
+
+        if self.RATE_LIMIT or self.HONOR_RETRY_AFTER:
+            session.rate_limiter = RateLimiter(self.RATE_LIMIT, self.RATE_LIMIT_BURST,
+                                               retry_after=self.HONOR_RETRY_AFTER, logger=self.logger)
+
+        if self.RETRY_POLICY is not None:
+            session.retry_policy = self.RETRY_POLICY
+            session.retry_stats = RetryStats()
+
         if self.TIMEOUT:
             session.timeout = self.TIMEOUT
         ## weboob only can provide proxy and HTTP auth options
         session.trust_env = False
+        session.logger = getLogger('session', self.logger)
 
         profile.setup_session(session)
 
@@ -831,27 +870,105 @@ class PagesBrowser(DomainBrowser):
     You can then use URL instances to go on pages.
     """
 
+    PAGINATION_PREFETCH = 0
+    """
+    Number of next pages requested in background by :meth:`pagination` and
+    the :func:`weboob.browser.pages.pagination` decorator, while objects of
+    the current page are consumed. 0 to disable prefetching.
+    See :func:`weboob.browser.pages.prefetch_pagination`.
+    """
+
     _urls = None
 
+    _routers = {}
+    _MAX_ROUTERS = 1000
+    _router_cache = None
+
     def __init__(self, *args, **kwargs):
         self.highlight_el = kwargs.pop('highlight_el', False)
         super(PagesBrowser, self).__init__(*args, **kwargs)
 
         self.page = None
 
-        # exclude properties because they can access other fields not yet defined
-        def is_property(attr):
-            v = getattr(type(self), attr, None)
-            return hasattr(v, '__get__') or hasattr(v, '__set__')
+        attrs = self.get_url_registry()
+        # URL objects set on the instance before this constructor
+        instance_attrs = [(k, v) for k, v in self.__dict__.items() if isinstance(v, URL)]
+        if instance_attrs:
+            attrs = sorted(dict(attrs + instance_attrs).items(), key=lambda v: v[1]._creation_counter)
+
+        self._urls = OrderedDict()
+        for k, v in attrs:
+            url = self._urls[k] = v.bind(self)
+            setattr(self, k, url)
+
+    @classmethod
+    def get_url_registry(cls):
+        """
+        Get URL objects declared on this class and its parents.
+
+        The list is computed once per class, and again if the parents of the
+        class change (see :class:`AbstractBrowser`).
 
-        attrs = [(attr, getattr(self, attr)) for attr in dir(self) if not is_property(attr)]
-        attrs = [v for v in attrs if isinstance(v[1], URL)]
+        :rtype: list[(str, :class:`URL`)]
+        """
+        registry = cls.__dict__.get('_url_registry')
+        if registry is not None and registry[0] == cls.__mro__:
+            return registry[1]
+
+        seen = set()
+        attrs = []
+        for klass in cls.__mro__:
+            for attr, value in vars(klass).items():
+                if attr in seen:
+                    continue
+                seen.add(attr)
+                if isinstance(value, URL):
+                    attrs.append((attr, value))
         attrs.sort(key=lambda v: v[1]._creation_counter)
-        self._urls = OrderedDict(deepcopy(attrs))
-        for k, v in self._urls.items():
-            setattr(self, k, v)
-        for url in self._urls.values():
-            url.browser = self
+
+        cls._url_registry = (cls.__mro__, attrs)
+        return attrs
+
+    def get_router(self):
+        """
+        Get the :class:`weboob.browser.url.URLRouter` of URL objects of this
+        browser.
+
+        Routers are shared by all browsers of a class with the same base URL,
+        and built again if patterns of URL objects are changed.
+        """
+        urls = list(self._urls.values())
+        patterns = [url.urls for url in urls]
+        if self._router_cache is not None:
+            baseurl, cached_patterns, router = self._router_cache
+            if baseurl == self.BASEURL and cached_patterns == patterns:
+                return router
+
+        key = (type(self), self.BASEURL, tuple(tuple(p) for p in patterns))
+        router = self._routers.get(key)
+        if router is None:
+            if len(self._routers) >= self._MAX_ROUTERS:
+                self._routers.clear()
+            router = self._routers[key] = URLRouter(urls, self.BASEURL)
+
+        self._router_cache = (self.BASEURL, [list(p) for p in patterns], router)
+        return router
+
+    def handle_page(self, response):
+        """
+        Set the `page` attribute of a response, with the first :class:`URL`
+        object which handles it.
+
+        :rtype: :class:`weboob.browser.pages.Page` or None
+        """
+        response.page = None
+        urls = list(self._urls.values())
+        for position in self.get_router().candidates(response.url):
+            response.page = urls[position].handle(response)
+            if response.page is not None:
+                self.logger.debug('Handle %s with %s', response.url, response.page.__class__.__name__)
+                break
+        return response.page
 
     def open(self, *args, **kwargs):
         """
@@ -874,13 +991,7 @@ class PagesBrowser(DomainBrowser):
                 response.page = page_class(self, response)
                 return callback(response)
 
-            for url in self._urls.values():
-                response.page = url.handle(response)
-                if response.page is not None:
-                    self.logger.debug('Handle %s with %s', response.url, response.page.__class__.__name__)
-                    break
-
-            if response.page is None:
+            if self.handle_page(response) is None:
                 regexp = r'^(?P<proto>\w+)://.*'
 
                 proto_response = re.match(regexp, response.url)
@@ -947,7 +1058,17 @@ class PagesBrowser(DomainBrowser):
         <weboob.browser.browsers.Page object at 0x...>
         >>> list(b.pagination(lambda: b.page.iter_values()))
         ['One', 'Two', 'Three', 'Four']
+
+        When :attr:`PAGINATION_PREFETCH` is set, the next page is requested
+        in background while objects of the current one are consumed.
         """
+        if self.PAGINATION_PREFETCH and self.page is not None:
+            # func relies on the current page of the browser, so pages can't be iterated before being loaded
+            for r in prefetch_pagination(self, self.page, lambda page: func(*args, **kwargs),
+                                         depth=self.PAGINATION_PREFETCH, early=False):
+                yield r
+            return
+
         while True:
             try:
                 for r in func(*args, **kwargs):
@@ -971,13 +1092,16 @@ def need_login(func):
     In all other cases (when the browser isn't on any defined page or
     when the page's `logged` attribute is ``False``), the
     :meth:`LoginBrowser.do_login` method of the browser is called before
-    calling :`func`.
+    calling :`func`. As the session has been lost, results cached by
+    :func:`weboob.tools.memo.sync_memoized` are forgotten.
     """
 
     @wraps(func)
     def inner(browser, *args, **kwargs):
         if (not hasattr(browser, 'logged') or (hasattr(browser, 'logged') and not browser.logged)) and \
                 (not hasattr(browser, 'page') or browser.page is None or not browser.page.logged):
+            if getattr(browser, 'sync_cache', None) is not None:
+                browser.sync_cache.clear()
             browser.do_login()
             if browser.logger.settings.get('export_session'):
                 browser.logger.debug('logged in with session: %s', json.dumps(browser.export_session()))
@@ -1008,9 +1132,11 @@ class LoginBrowser(PagesBrowser):
         """
         Logout from website.
 
-        By default, simply clears the cookies.
+        By default, simply clears the cookies and the results cached by
+        :func:`weboob.tools.memo.sync_memoized`.
         """
         self.session.cookies.clear()
+        self.sync_cache.clear()
 
 
 class StatesMixin(object):
@@ -17,18 +17,33 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-__all__ = ['CacheMixin']
+from hashlib import sha256
+import re
+from threading import Lock
+from time import time
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from weboob.tools.json import json
+
+
+__all__ = ['CacheMixin', 'CacheStats', 'SQLiteCache']
 
 
 class CacheEntry(object):
-    def __init__(self, response):
+    def __init__(self, response, expires=None):
         self.response = response
+        self.expires = expires
         self.etag = response.headers.get('ETag')
         self.last_modified = response.headers.get('Last-Modified')
 
     def has_cache_key(self):
         return (self.etag or self.last_modified)
 
+    def is_fresh(self, now):
+        return self.expires is not None and now < self.expires
+
     def update_request(self, request):
         if self.last_modified:
             request.headers['If-Modified-Since'] = self.last_modified
@@ -36,8 +51,153 @@ class CacheEntry(object):
             request.headers['If-None-Match'] = self.etag
 
 
+class CacheStats(object):
+    """Statistics of a cache, for a browser"""
+
+    def __init__(self):
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @property
+    def hit_ratio(self):
+        """Ratio of requests served from the cache, including revalidated ones."""
+        total = self.hits + self.revalidated + self.misses
+        return float(self.hits + self.revalidated) / total if total else 0.
+
+    def __str__(self):
+        return '%d hits, %d revalidated, %d misses (%.0f%% hit ratio), %d bytes saved' % (
+            self.hits, self.revalidated, self.misses, self.hit_ratio * 100, self.bytes_saved)
+
+
+class SQLiteCache(object):
+    """
+    Cache store persisted in a SQLite database.
+
+    It can be used as :attr:`CacheMixin.cache`, and shared by several
+    processes. As keys contain the cookies and credentials of requests,
+    browsers logged in different accounts don't share responses. When a
+    budget is exceeded, the least recently used responses are removed.
+
+    :param path: path of the database file
+    :type path: str
+    :param max_bytes: maximum total size of response bodies
+    :type max_bytes: int
+    :param max_entries: maximum number of responses
+    :type max_entries: int
+    :param timeout: how long to wait for another process to release the database, in seconds
+    :type timeout: float
+    """
+
+    def __init__(self, path, max_bytes=None, max_entries=None, timeout=30):
+        import sqlite3
+
+        self.sqlite3 = sqlite3
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.lock = Lock()
+        # transactions are handled explicitly
+        self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                              'key TEXT PRIMARY KEY, url TEXT, status INTEGER, reason TEXT, headers TEXT, '
+                              'encoding TEXT, content BLOB, expires REAL, size INTEGER, accessed REAL)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def make_key(self, key):
+        return sha256(repr(key).encode('utf-8')).hexdigest()
+
+    def __contains__(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT 1 FROM responses WHERE key = ?', (self.make_key(key),)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def __getitem__(self, key):
+        key = self.make_key(key)
+        with self.lock:
+            row = self.conn.execute('SELECT url, status, reason, headers, encoding, content, expires '
+                                    'FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            self.conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time(), key))
+
+        url, status, reason, headers, encoding, content, expires = row
+        response = Response()
+        response.url = url
+        response.status_code = status
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response._content = bytes(content)
+        return CacheEntry(response, expires)
+
+    def __setitem__(self, key, entry):
+        response = entry.response
+        content = response.content
+        row = (self.make_key(key), response.url, response.status_code, response.reason,
+               json.dumps(list(response.headers.items())), response.encoding,
+               self.sqlite3.Binary(content), entry.expires, len(content), time())
+
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+                self.evict()
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def __delitem__(self, key):
+        with self.lock:
+            self.conn.execute('DELETE FROM responses WHERE key = ?', (self.make_key(key),))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM responses')
+
+    def evict(self):
+        """
+        Remove the least recently used responses until the cache fits in its budget.
+
+        It has to be called with the lock held, in a transaction.
+        """
+        if self.max_entries is not None:
+            self.conn.execute('DELETE FROM responses WHERE key IN '
+                              '(SELECT key FROM responses ORDER BY accessed DESC, rowid DESC LIMIT -1 OFFSET ?)',
+                              (self.max_entries,))
+
+        if self.max_bytes is not None:
+            total = self.conn.execute('SELECT SUM(size) FROM responses').fetchone()[0] or 0
+            if total <= self.max_bytes:
+                return
+
+            keys = []
+            for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY accessed, rowid'):
+                if total <= self.max_bytes:
+                    break
+                keys.append((key,))
+                total -= size
+            self.conn.executemany('DELETE FROM responses WHERE key = ?', keys)
+
+
 class CacheMixin(object):
-    """Mixin to inherit in a Browser"""
+    """Mixin to inherit in a Browser
+
+    A cache store can be given with the `cache` keyword argument, for
+    example a :class:`SQLiteCache` shared by several browsers. By default,
+    responses are kept in memory.
+    """
 
     cache_is_updatable = True
 
@@ -54,45 +214,95 @@ class CacheMixin(object):
     obsolete page in the cache.
     """
 
+    cache_ttl_rules = ()
+
+    """Time to live of responses, for matching URLs
+
+    List of `(regexp, seconds)` tuples. The first regexp matching the URL of
+    a GET or HEAD request gives how long its response is returned from the
+    cache without querying the server. Responses without `ETag` or
+    `Last-Modified` are cached only if a rule matches.
+    """
+
     def __init__(self, *args, **kwargs):
+        cache = kwargs.pop('cache', None)
         super(CacheMixin, self).__init__(*args, **kwargs)
 
-        self.cache = {}
+        self.cache = cache if cache is not None else {}
 
         """Cache store object
 
         To limit the size of the cache, a :class:`weboob.tools.lrudict.LimitedLRUDict`
-        instance can be used.
+        instance can be used. To persist it, a :class:`SQLiteCache` can be used.
         """
 
+        self.cache_stats = CacheStats()
+
+    def deinit(self):
+        self.logger.debug('cache stats: %s', self.cache_stats)
+        super(CacheMixin, self).deinit()
+
     def make_cache_key(self, request):
-        """Make a key for the cache corresponding to the request."""
+        """Make a key for the cache corresponding to the request.
+
+        The key is made from the prepared request: it contains the body, and
+        the cookies and credentials sent, so responses are not shared between
+        sessions.
+        """
 
-        body = getattr(request, 'body', None)
-        headers = tuple(request.headers.values())
-        return (request.method, request.url, body, headers)
+        prepared = self.prepare_request(request)
+        headers = tuple(sorted(prepared.headers.items()))
+        return (prepared.method, prepared.url, prepared.body, headers)
+
+    def get_cache_ttl(self, url):
+        """Get the time to live of the response of an URL, from :attr:`cache_ttl_rules`."""
+
+        for regexp, ttl in self.cache_ttl_rules:
+            if re.match(regexp, url):
+                return ttl
+
+    def get_cached_response(self, entry, request):
+        response = entry.response
+        self.cache_stats.bytes_saved += len(response.content)
+        if not hasattr(response, 'page') and hasattr(self, 'handle_page'):
+            # loaded from a persistent store
+            response.request = request
+            self.handle_page(response)
+        return response
 
     def open_with_cache(self, url, **kwargs):
         """Perform a request using the cache if possible."""
         request = self.build_request(url, **kwargs)
 
         key = self.make_cache_key(request)
-        if key in self.cache:
-            if not self.cache_is_updatable:
+        ttl = self.get_cache_ttl(request.url) if request.method in ('GET', 'HEAD') else None
+        try:
+            entry = self.cache[key]
+        except KeyError:
+            entry = None
+
+        if entry is not None:
+            if not self.cache_is_updatable or entry.is_fresh(time()):
                 self.logger.debug('cache HIT for %r', request.url)
-                return self.cache[key].response
+                self.cache_stats.hits += 1
+                return self.get_cached_response(entry, request)
             else:
-                self.cache[key].update_request(request)
+                entry.update_request(request)
 
         response = super(CacheMixin, self).open(request, **kwargs)
-        if response.status_code == 304:
+        if response.status_code == 304 and entry is not None:
             self.logger.debug('cache HIT for %r', request.url)
-            return self.cache[key].response
+            self.cache_stats.revalidated += 1
+            if ttl is not None:
+                entry.expires = time() + ttl
+                self.cache[key] = entry
+            return self.get_cached_response(entry, request)
         elif response.status_code == 200:
-            entry = CacheEntry(response)
-            if entry.has_cache_key():
+            entry = CacheEntry(response, time() + ttl if ttl is not None else None)
+            if entry.has_cache_key() or ttl is not None:
                 self.logger.debug('storing %r response in cache', request.url)
                 self.cache[key] = entry
 
         self.logger.debug('cache MISS for %r', request.url)
+        self.cache_stats.misses += 1
         return response
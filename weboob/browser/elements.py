@@ -19,17 +19,19 @@
 
 from __future__ import print_function
 
+import datetime
 import os
 import re
 import sys
 from collections import OrderedDict
 from copy import deepcopy
+from decimal import Decimal
 import traceback
 
 import lxml.html
 
 from weboob.tools.log import getLogger, DEBUG_FILTERS
-from weboob.tools.compat import basestring, unicode, with_metaclass
+from weboob.tools.compat import basestring, long, unicode, with_metaclass
 from weboob.browser.pages import NextPage
 from weboob.capabilities.base import FetchError
 
@@ -43,6 +45,9 @@ __all__ = [
 ]
 
 
+filters_logger = getLogger('b2filters')
+
+
 def generate_table_element(doc, head_xpath, cleaner=CleanText):
     """
     Prints generated base code for TableElement/TableCell usage.
@@ -78,6 +83,103 @@ def generate_table_element(doc, head_xpath, cleaner=CleanText):
         print(' ' * indent * 3 + 'obj_' + col + ' = ' + "TableCell('%s') & CleanText()" % col)
 
 
+def _class_cache(klass, name, builder):
+    """
+    Get an attribute computed once per class (subclasses do not inherit it).
+    """
+    try:
+        return klass.__dict__[name]
+    except KeyError:
+        value = builder(klass)
+        setattr(klass, name, value)
+        return value
+
+
+_IMMUTABLE_TYPES = (basestring, bytes, int, long, float, bool, type(None), Decimal,
+                    datetime.date, datetime.time, datetime.timedelta)
+
+
+class ElementEnv(dict):
+    """
+    Environment of an element.
+
+    Elements get a copy of their parent's environment. To avoid deep-copying
+    it for every item, a copy made by :meth:`fork` shares mutable values with
+    its source until they are read: each side deep-copies a shared value the
+    first time it accesses it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ElementEnv, self).__init__(*args, **kwargs)
+        self._shared = set()
+
+    def fork(self):
+        shared = set(key for key, value in dict.items(self) if not isinstance(value, _IMMUTABLE_TYPES))
+        self._shared |= shared
+
+        env = ElementEnv(dict.items(self))
+        env._shared = shared
+        return env
+
+    __copy__ = fork
+
+    def __deepcopy__(self, memo):
+        return self.fork()
+
+    def _own(self, key):
+        if key in self._shared:
+            self._shared.discard(key)
+            value = deepcopy(dict.__getitem__(self, key))
+            dict.__setitem__(self, key, value)
+
+    def _own_all(self):
+        for key in list(self._shared):
+            self._own(key)
+
+    def __getitem__(self, key):
+        self._own(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        self._own(key)
+        return dict.get(self, key, default)
+
+    def __setitem__(self, key, value):
+        self._shared.discard(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._shared.discard(key)
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *args):
+        self._own(key)
+        return dict.pop(self, key, *args)
+
+    def setdefault(self, key, default=None):
+        self._own(key)
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        self._own_all()
+        dict.update(self, *args, **kwargs)
+
+    def items(self):
+        self._own_all()
+        return dict.items(self)
+
+    def values(self):
+        self._own_all()
+        return dict.values(self)
+
+    def popitem(self):
+        self._own_all()
+        return dict.popitem(self)
+
+    def copy(self):
+        return self.fork()
+
+
 class DataError(Exception):
     """
     Returned data from pages are incoherent.
@@ -148,12 +250,12 @@ class AbstractElement(object):
     def xpath(self, *args, **kwargs):
         return self.el.xpath(*args, **kwargs)
 
+    @staticmethod
+    def _build_loaders_plan(klass):
+        return [(attrname[len('load_'):], attrname) for attrname in dir(klass) if attrname.startswith('load_')]
+
     def handle_loaders(self):
-        for attrname in dir(self):
-            m = re.match('load_(.*)', attrname)
-            if not m:
-                continue
-            name = m.group(1)
+        for name, attrname in _class_cache(type(self), '_loaders_plan', self._build_loaders_plan):
             if name in self.loaders:
                 continue
             loader = getattr(self, attrname)
@@ -161,9 +263,12 @@ class AbstractElement(object):
 
     def fill_env(self, page, parent=None):
         if parent is not None:
-            self.env = deepcopy(parent.env)
+            if isinstance(parent.env, ElementEnv):
+                self.env = parent.env.fork()
+            else:
+                self.env = ElementEnv(deepcopy(parent.env))
         else:
-            self.env = deepcopy(page.params)
+            self.env = ElementEnv(deepcopy(page.params))
 
 
 class ListElement(AbstractElement):
@@ -171,10 +276,15 @@ class ListElement(AbstractElement):
     empty_xpath = None
     flush_at_end = False
     ignore_duplicate = False
+    # build items lazily, while objects are consumed, instead of building all
+    # of them before yielding the first object; unless flush_at_end is set,
+    # objects are not kept either, only their IDs to detect duplicates
+    streaming = False
 
     def __init__(self, *args, **kwargs):
         super(ListElement, self).__init__(*args, **kwargs)
         self.objects = OrderedDict()
+        self.streamed_ids = set()
 
     def __call__(self, *args, **kwargs):
         for key, value in kwargs.items():
@@ -199,23 +309,39 @@ class ListElement(AbstractElement):
         else:
             yield self.el
 
+    @staticmethod
+    def _build_elements_plan(klass):
+        elements = []
+        for attrname in dir(klass):
+            attr = getattr(klass, attrname)
+            if isinstance(attr, type) and issubclass(attr, AbstractElement) and attr != klass:
+                elements.append(attr)
+        return elements
+
+    def iter_items(self):
+        """
+        Build the sub-elements of every node found by :meth:`find_elements`.
+        """
+        elements = _class_cache(type(self), '_elements_plan', self._build_elements_plan)
+
+        for el in self.find_elements():
+            for klass in elements:
+                item = klass(self.page, self, el)
+                if item.condition is not None and not item.condition():
+                    continue
+
+                item.handle_loaders()
+                yield item
+
     def __iter__(self):
         if self.condition is not None and not self.condition():
             return
 
         self.parse(self.el)
 
-        items = []
-        for el in self.find_elements():
-            for attrname in dir(self):
-                attr = getattr(self, attrname)
-                if isinstance(attr, type) and issubclass(attr, AbstractElement) and attr != type(self):
-                    item = attr(self.page, self, el)
-                    if item.condition is not None and not item.condition():
-                        continue
-
-                    item.handle_loaders()
-                    items.append(item)
+        items = self.iter_items()
+        if not self.streaming:
+            items = list(items)
 
         for item in items:
             for obj in item:
@@ -251,13 +377,16 @@ class ListElement(AbstractElement):
 
     def store(self, obj):
         if obj.id:
-            if obj.id in self.objects:
+            if obj.id in self.objects or obj.id in self.streamed_ids:
                 if self.ignore_duplicate:
                     self.logger.warning('There are two objects with the same ID! %s' % obj.id)
                     return
                 else:
                     raise DataError('There are two objects with the same ID! %s' % obj.id)
-            self.objects[obj.id] = obj
+            if self.streaming and not self.flush_at_end:
+                self.streamed_ids.add(obj.id)
+            else:
+                self.objects[obj.id] = obj
         return obj
 
 
@@ -389,8 +518,8 @@ class ItemElement(with_metaclass(_ItemElementMeta, AbstractElement)):
                 raise
             else:
                 value = FetchError
-        logger = getLogger('b2filters')
-        logger.log(DEBUG_FILTERS, "%s.%s = %r" % (self._random_id, key, value))
+        if filters_logger.isEnabledFor(DEBUG_FILTERS):
+            filters_logger.log(DEBUG_FILTERS, "%s.%s = %r" % (self._random_id, key, value))
         setattr(self.obj, key, value)
 
 
@@ -450,32 +579,43 @@ class ItemElementFromAbstractPage(ItemElement):
         return object.__new__(cls)
 
 
+_REGEXP_TYPE = type(re.compile(''))
+
+
 class TableElement(ListElement):
     head_xpath = None
     cleaner = CleanText
 
+    @staticmethod
+    def _build_columns_plan(klass):
+        columns = {}
+        for attrname in dir(klass):
+            if not attrname.startswith('col_'):
+                continue
+
+            cols = getattr(klass, attrname)
+            if not isinstance(cols, (list, tuple)):
+                cols = [cols]
+            titles = [s.lower() for s in cols if isinstance(s, (str, unicode))]
+            regexps = [s for s in cols if isinstance(s, _REGEXP_TYPE)]
+            columns[attrname[len('col_'):]] = (titles, regexps)
+        return columns
+
     def __init__(self, *args, **kwargs):
         super(TableElement, self).__init__(*args, **kwargs)
 
         self._cols = {}
 
-        columns = {}
-        for attrname in dir(self):
-            m = re.match('col_(.*)', attrname)
-            if m:
-                cols = getattr(self, attrname)
-                if not isinstance(cols, (list,tuple)):
-                    cols = [cols]
-                columns[m.group(1)] = [s.lower() if isinstance(s, (str, unicode)) else s for s in cols]
+        columns = _class_cache(type(self), '_columns_plan', self._build_columns_plan)
 
         colnum = 0
         for el in self.el.xpath(self.head_xpath):
             title = self.cleaner.clean(el)
-            for name, titles in columns.items():
+            lower_title = title.lower()
+            for name, (titles, regexps) in columns.items():
                 if name in self._cols:
                     continue
-                if title.lower() in [s for s in titles if isinstance(s, (str, unicode))] or \
-                   any(map(lambda x: x.match(title), [s for s in titles if isinstance(s, type(re.compile('')))])):
+                if lower_title in titles or any(regexp.match(title) for regexp in regexps):
                     self._cols[name] = colnum
             try:
                 colnum += int(el.attrib.get('colspan', 1))
@@ -500,7 +640,7 @@ class DictElement(ListElement):
         bases = [self.el]
         for key in selector:
             if key == '*':
-                bases = sum([el if isinstance(el, list) else list(el.values()) for el in bases], [])
+                bases = [sub for el in bases for sub in (el if isinstance(el, list) else el.values())]
             else:
                 bases = [el[int(key)] if isinstance(el, list) else el[key] for el in bases]
 
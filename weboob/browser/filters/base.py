@@ -35,6 +35,8 @@ class NoDefault(object):
 
 _NO_DEFAULT = NoDefault()
 
+logger = getLogger('b2filters')
+
 
 class FilterError(ParseError):
     pass
@@ -91,47 +93,54 @@ class _Filter(object):
             el.attrib['title'] = 'weboob field: %s' % self._key
 
 
+def _debug_string(flt, value):
+    outputvalue = value
+    if isinstance(value, list):
+        from lxml import etree
+        outputvalue = ''
+        first = True
+        for element in value:
+            if first:
+                first = False
+            else:
+                outputvalue += ', '
+            if isinstance(element, etree.ElementBase):
+                outputvalue += "%s" % etree.tostring(element, encoding=unicode)
+            else:
+                outputvalue += "%r" % element
+
+    result = ''
+    if flt._obj is not None:
+        result += "%s" % flt._obj._random_id
+    if flt._key is not None:
+        result += ".%s" % flt._key
+    name = str(flt)
+    result += " %s(%r" % (name, outputvalue)
+    for arg in flt.__dict__:
+        if arg.startswith('_') or arg == u"selector":
+            continue
+        if arg == u'default' and getattr(flt, arg) == _NO_DEFAULT:
+            continue
+        result += ", %s=%r" % (arg, getattr(flt, arg))
+    result += u')'
+    return result
+
+
 def debug(*args):
     """
     A decorator function to provide some debug information
     in Filters.
     It prints by default the name of the Filter and the input value.
+
+    The debug string is only built when the DEBUG_FILTERS level is enabled
+    on the 'b2filters' logger.
     """
     def wraper(function):
         @wraps(function)
         def print_debug(self, value):
-            logger = getLogger('b2filters')
-            result = ''
-            outputvalue = value
-            if isinstance(value, list):
-                from lxml import etree
-                outputvalue = ''
-                first = True
-                for element in value:
-                    if first:
-                        first = False
-                    else:
-                        outputvalue += ', '
-                    if isinstance(element, etree.ElementBase):
-                        outputvalue += "%s" % etree.tostring(element, encoding=unicode)
-                    else:
-                        outputvalue += "%r" % element
-            if self._obj is not None:
-                result += "%s" % self._obj._random_id
-            if self._key is not None:
-                result += ".%s" % self._key
-            name = str(self)
-            result += " %s(%r" % (name, outputvalue)
-            for arg in self.__dict__:
-                if arg.startswith('_') or arg == u"selector":
-                    continue
-                if arg == u'default' and getattr(self, arg) == _NO_DEFAULT:
-                    continue
-                result += ", %s=%r" % (arg, getattr(self, arg))
-            result += u')'
-            logger.log(DEBUG_FILTERS, result)
-            res = function(self, value)
-            return res
+            if logger.isEnabledFor(DEBUG_FILTERS):
+                logger.log(DEBUG_FILTERS, _debug_string(self, value))
+            return function(self, value)
         return print_debug
     return wraper
 
@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import base64
+import gzip
+import io
+import mimetypes
+import os
+from datetime import datetime
+from io import BytesIO
+from threading import Lock, Thread
+
+from requests.adapters import BaseAdapter
+from requests.cookies import extract_cookies_to_jar
+from requests.exceptions import ConnectionError
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.response import HTTPResponse
+
+from weboob import __version__
+from weboob.tools.compat import parse_qsl, urlencode, urlparse, urlunparse
+from weboob.tools.json import json
+from weboob.tools.log import getLogger
+
+try:
+    from http.client import parse_headers
+except ImportError:
+    from httplib import HTTPMessage as parse_headers
+
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+
+
+__all__ = ['HARReplayAdapter', 'HARReplayError', 'HARWriter', 'HAR_FORMATS', 'load_har']
+
+
+HAR_FORMATS = ('har', 'jsonl', 'jsonl.gz', 'jsonl.zst')
+"""
+Formats of files written by :class:`HARWriter`. Except 'har', they contain
+one JSON document per line: the HAR log without its entries, then every
+entry.
+"""
+
+
+def _open_file(path, mode):
+    # mode is 'rb' or 'ab': compressed files are sequences of gzip members or
+    # zstd frames, one per written batch
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('Please install python3-zstandard')
+
+        fd = open(path, mode)
+        if mode == 'rb':
+            return zstandard.ZstdDecompressor().stream_reader(fd, read_across_frames=True, closefd=True)
+        return zstandard.ZstdCompressor().stream_writer(fd, closefd=True)
+    return open(path, mode)
+
+
+def load_har(path):
+    """
+    Load a file written by :class:`HARWriter` as a HAR document.
+
+    Bodies saved in side files are read and inlined in base64, so the result
+    can be dumped as a standalone HAR file.
+
+    :param path: path of a HAR or JSON lines file
+    :type path: str
+    :rtype: dict
+    """
+    if path.endswith('.har'):
+        with open(path) as fd:
+            har = json.load(fd)
+    else:
+        har = None
+        entries = []
+        with _open_file(path, 'rb') as fd:
+            for line in fd.read().decode('utf-8').splitlines():
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                if 'log' not in obj:
+                    entries.append(obj)
+                elif har is None:
+                    # other headers were written by later sessions
+                    har = obj
+        if har is None:
+            raise ValueError('%s has no HAR log header' % path)
+        har['log']['entries'] = entries
+
+    dirname = os.path.dirname(path)
+    for entry in har['log']['entries']:
+        content = entry['response'].get('content', {})
+        if '_file' in content:
+            with open(os.path.join(dirname, content.pop('_file')), 'rb') as fd:
+                content['text'] = base64.b64encode(fd.read()).decode('ascii')
+            content['encoding'] = 'base64'
+    return har
+
+
+class HARReplayError(ConnectionError):
+    """
+    Raised by :class:`HARReplayAdapter` when no recorded response matches a
+    request.
+    """
+
+
+class _OriginalResponse(object):
+    # what requests needs to extract cookies from a response
+    def __init__(self, headers):
+        lines = ''.join('%s: %s\r\n' % (k, v) for k, v in headers) + '\r\n'
+        self.msg = parse_headers(BytesIO(lines.encode('latin-1', 'replace')))
+
+    def isclosed(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class HARReplayAdapter(BaseAdapter):
+    """
+    Transport adapter serving responses from a HAR file, like the
+    bundle written by :meth:`weboob.browser.browsers.Browser.save_response`
+    (see :func:`load_har`).
+
+    Requests are matched on their method and URL, and on their body if
+    *match_body* is True. When several recorded responses match a request,
+    they are served in the recorded order.
+
+    In strict mode, :class:`HARReplayError` is raised when no recorded
+    response is left for a request. Otherwise, the last response served for
+    the request is served again, then a response recorded for the same URL
+    without query string, and at last a 404 response.
+
+    :param har: path of the HAR file, or its decoded content
+    :type har: str or dict
+    :param match_body: also compare bodies of requests
+    :type match_body: bool
+    :param ignore_params: names of volatile query parameters (timestamps,
+                          tokens...) ignored when comparing URLs
+    :type ignore_params: list[str]
+    :param strict: raise an error when no recorded response matches
+    :type strict: bool
+    """
+
+    def __init__(self, har, match_body=False, ignore_params=(), strict=True):
+        super(HARReplayAdapter, self).__init__()
+
+        if not isinstance(har, dict):
+            har = load_har(har)
+
+        self.match_body = match_body
+        self.ignore_params = frozenset(ignore_params)
+        self.strict = strict
+        self.lock = Lock()
+
+        # key -> [entries not served yet, last served entry]
+        self.entries = {}
+        for entry in har['log']['entries']:
+            request = entry['request']
+            body = request.get('postData', {}).get('text')
+            for key in self.iter_keys(request['method'], request['url'], body):
+                self.entries.setdefault(key, [[], None])[0].append(entry)
+
+    def normalize_url(self, url, with_query=True):
+        scheme, netloc, path, params, query, fragment = urlparse(url)
+        if with_query:
+            query = urlencode(sorted((k, v) for k, v in parse_qsl(query, keep_blank_values=True)
+                                     if k not in self.ignore_params))
+        else:
+            query = ''
+        return urlunparse((scheme, netloc.lower(), path, params, query, ''))
+
+    def iter_keys(self, method, url, body):
+        """
+        Keys under which a request is matched, from the most to the least
+        precise one. The first one is required in strict mode.
+        """
+        if isinstance(body, bytes):
+            # as it is saved by Browser.save_response
+            body = body.decode('latin-1')
+
+        method = method.upper()
+        url_key = self.normalize_url(url)
+        if self.match_body:
+            yield ('body', method, url_key, body or None)
+        yield ('url', method, url_key)
+        yield ('path', method, self.normalize_url(url, with_query=False))
+
+    def find_entry(self, request):
+        keys = list(self.iter_keys(request.method, request.url, request.body))
+
+        with self.lock:
+            if keys[0] in self.entries:
+                pending = self.entries[keys[0]][0]
+                if pending:
+                    entry = self.entries[keys[0]][1] = pending.pop(0)
+                    return entry
+
+            if self.strict:
+                return None
+
+            for key in keys:
+                if key in self.entries:
+                    pending, last = self.entries[key]
+                    if last is not None or pending:
+                        return last or pending[0]
+
+    def send(self, request, **kwargs):
+        entry = self.find_entry(request)
+        if entry is None:
+            if self.strict:
+                raise HARReplayError('No recorded response for %s %s' % (request.method, request.url), request=request)
+            return self.build_response(request, {
+                'status': 404,
+                'statusText': 'Not Found',
+                'headers': [],
+                'content': {'text': ''},
+            })
+        return self.build_response(request, entry['response'])
+
+    def build_response(self, request, har_response):
+        content = har_response.get('content', {})
+        if content.get('encoding') == 'base64':
+            body = base64.b64decode(content.get('text', ''))
+        else:
+            body = content.get('text', '').encode('utf-8')
+
+        headers = [(h['name'], h['value']) for h in har_response.get('headers', [])]
+        # content is already decoded, and may not have the recorded length
+        headers = [(k, v) for k, v in headers
+                   if k.lower() not in ('content-encoding', 'transfer-encoding', 'content-length')]
+
+        response = Response()
+        response.status_code = har_response['status']
+        response.reason = har_response.get('statusText', '')
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.raw = HTTPResponse(body=BytesIO(body), headers=headers, status=response.status_code,
+                                    reason=response.reason, version=11, preload_content=False,
+                                    original_response=_OriginalResponse(headers))
+        response._content = body
+        extract_cookies_to_jar(response.cookies, request, response.raw)
+        return response
+
+    def close(self):
+        pass
+
+
+class HARWriter(object):
+    """
+    Write HAR entries to a `bundle.<format>` file from a background thread.
+
+    :meth:`add` only queues the entry and the response body, so requests are
+    not slowed down by encoding and writing them. When the queue is full,
+    :meth:`add` waits for the writer to catch up. The thread stops after
+    being idle for :attr:`IDLE_TIMEOUT` seconds, and is restarted by the next
+    entry.
+
+    Bodies are inlined in base64, as in any HAR file. With *side_files*,
+    bodies which are valid UTF-8 are inlined as text, to be cheaper to write
+    and easier to read. Others, and large ones, are then saved as-is in a
+    side file named after the `$anchor` of the entry, referenced by the
+    non-standard `_file` key of the response content (see :func:`load_har`).
+
+    Use :meth:`for_directory` to get the writer of a directory, shared by
+    all browsers of the process.
+
+    :param dirname: directory where files are written
+    :type dirname: str
+    :param fmt: one of :data:`HAR_FORMATS`
+    :type fmt: str
+    :param max_queue: maximum number of entries waiting to be written
+    :type max_queue: int
+    :param side_files: save binary and large bodies in side files
+    :type side_files: bool
+    """
+
+    INLINE_MAX_SIZE = 1 << 20
+    """
+    With side files, bodies larger than this number of bytes are saved in
+    side files.
+    """
+
+    IDLE_TIMEOUT = 1
+    """
+    Seconds after which an idle writer thread stops.
+    """
+
+    # the HAR format ends with the entries list, so new entries are written
+    # just before this suffix
+    HAR_SUFFIX = b']}}'
+
+    _writers = {}
+    _writers_lock = Lock()
+
+    def __init__(self, dirname, fmt='har', max_queue=100, logger=None, side_files=False):
+        if fmt not in HAR_FORMATS:
+            raise ValueError('Unknown HAR format %r, expected one of %s' % (fmt, ', '.join(HAR_FORMATS)))
+        if fmt.endswith('.zst'):
+            # fail now, not in the writer thread
+            _open_file(os.devnull, 'rb').close()
+
+        self.dirname = dirname
+        self.fmt = fmt
+        self.path = os.path.join(dirname, 'bundle.%s' % fmt)
+        self.side_files = side_files
+        self.logger = getLogger('har', logger)
+        self.queue = Queue.Queue(max_queue)
+        self.lock = Lock()
+        self.thread = None
+
+    @classmethod
+    def for_directory(cls, dirname, fmt='har', logger=None, side_files=False):
+        """
+        Get the writer of a directory, creating it if needed.
+
+        Writing a file from several threads would corrupt it, so all browsers
+        of the process share the same writer for a file, created with the
+        *side_files* parameter of the first one.
+        """
+        key = (os.path.abspath(dirname), fmt)
+        with cls._writers_lock:
+            if key not in cls._writers:
+                cls._writers[key] = cls(dirname, fmt, logger=logger, side_files=side_files)
+            return cls._writers[key]
+
+    def add(self, entry, body):
+        """
+        Queue an entry to write.
+
+        :param entry: HAR entry, with a `$anchor` key, and without the text
+                      of its response content
+        :type entry: dict
+        :param body: body of the response
+        :type body: bytes
+        """
+        self.queue.put((entry, body))
+
+        with self.lock:
+            if self.thread is None:
+                self.thread = Thread(target=self._run, name='weboob-har-writer')
+                self.thread.start()
+
+    def flush(self):
+        """
+        Wait until all queued entries are written.
+        """
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.IDLE_TIMEOUT)]
+            except Queue.Empty:
+                with self.lock:
+                    # an entry may have been queued while nobody was waiting
+                    if self.queue.empty():
+                        self.thread = None
+                        return
+                continue
+
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            try:
+                started = batch[0][0].get('startedDateTime')
+                self.write([self.encode_entry(entry, body) for entry, body in batch], started)
+            except Exception:
+                self.logger.exception('Unable to save %d responses to %s', len(batch), self.path)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def encode_entry(self, entry, body):
+        content = entry['response']['content']
+        if not self.side_files:
+            # systematically use base64 to avoid more content alteration
+            content['encoding'] = 'base64'
+            content['text'] = base64.b64encode(body).decode('ascii')
+            return json.dumps(entry, separators=(',', ':')).encode('utf-8')
+
+        text = None
+        if len(body) <= self.INLINE_MAX_SIZE:
+            try:
+                text = body.decode('utf-8')
+            except UnicodeDecodeError:
+                pass
+
+        if text is not None:
+            content['text'] = text
+        else:
+            mimetype = content.get('mimeType', '').split(';')[0].strip()
+            filename = entry['$anchor'] + (mimetypes.guess_extension(mimetype, False) or '')
+            with open(os.path.join(self.dirname, filename), 'wb') as fd:
+                fd.write(body)
+            content['_file'] = filename
+
+        return json.dumps(entry, separators=(',', ':')).encode('utf-8')
+
+    def build_header(self, started):
+        return {
+            'log': {
+                'version': '1.2',
+                'creator': {
+                    'name': 'weboob',
+                    'version': __version__,
+                },
+                'browser': {
+                    'name': 'weboob',
+                    'version': __version__,
+                },
+                # there are no pages, but we need that to please firefox
+                'pages': [{
+                    'id': 'fake_page',
+                    'pageTimings': {},
+                    # and chromium wants some of it too
+                    'startedDateTime': started,
+                }],
+                # don't put additional data after this list, to have a fixed-size suffix after it
+                # so we can add more entries without rewriting the whole file.
+                'entries': [],
+            },
+        }
+
+    def write(self, entries, started=None):
+        """
+        Write encoded entries to the file, with the HAR log header if it is
+        a new file.
+        """
+        if not os.path.isdir(self.dirname):
+            os.makedirs(self.dirname)
+        started = started or datetime.now().isoformat()
+        exists = os.path.isfile(self.path) and os.path.getsize(self.path) > 0
+
+        if self.fmt != 'har':
+            with _open_file(self.path, 'ab') as fd:
+                if not exists:
+                    fd.write(json.dumps(self.build_header(started), separators=(',', ':')).encode('utf-8') + b'\n')
+                for entry in entries:
+                    fd.write(entry + b'\n')
+            return
+
+        if not exists:
+            header = json.dumps(self.build_header(started), separators=(',', ':')).encode('utf-8')
+            assert header.endswith(b'[' + self.HAR_SUFFIX)
+            with open(self.path, 'wb') as fd:
+                fd.write(header[:-len(self.HAR_SUFFIX)])
+                fd.write(b','.join(entries))
+                fd.write(self.HAR_SUFFIX)
+            return
+
+        # hack to avoid rewriting the whole file: entries are last in the JSON file
+        # we need to seek at the right place and write the new entries.
+        # this will unfortunately overwrite closings.
+        with open(self.path, 'r+b') as fd:
+            fd.seek(-len(self.HAR_SUFFIX), io.SEEK_END)
+            after_entry_pos = fd.tell()
+            if fd.read(len(self.HAR_SUFFIX)) != self.HAR_SUFFIX:
+                self.logger.warning('HAR file does not end with the expected pattern')
+                return
+
+            fd.seek(after_entry_pos - 1)
+            # no separator if the list is empty
+            separator = b'' if fd.read(1) == b'[' else b','
+            fd.seek(after_entry_pos)
+            fd.write(separator + b','.join(entries))
+            fd.write(self.HAR_SUFFIX)
@@ -19,7 +19,7 @@
 
 from __future__ import absolute_import
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from functools import wraps
 import warnings
 from io import BytesIO, StringIO
@@ -68,10 +68,20 @@ def pagination(func):
     <weboob.browser.pages.Page object at 0x...>
     >>> list(b.page.iter_values())
     ['One', 'Two', 'Three', 'Four']
+
+    When the :attr:`PagesBrowser.PAGINATION_PREFETCH` attribute of the
+    browser is set, next pages are requested in background (see
+    :func:`prefetch_pagination`).
     """
 
     @wraps(func)
     def inner(page, *args, **kwargs):
+        depth = getattr(page.browser, 'PAGINATION_PREFETCH', 0)
+        if depth:
+            for r in prefetch_pagination(page.browser, page, lambda page: func(page, *args, **kwargs), depth):
+                yield r
+            return
+
         while True:
             try:
                 for r in func(page, *args, **kwargs):
@@ -101,6 +111,154 @@ class NextPage(Exception):
         self.request = request
 
 
+class _PrefetchedPage(object):
+    def __init__(self, future=None, page=None):
+        # the future of the response, or the page itself if NextPage gave it
+        self.future = future
+        self.page = page
+        # objects of the page and request of the next one, once it is iterated
+        self.iterated = False
+        self.objects = None
+        self.next_request = None
+        self.error = None
+
+    def iterate(self, iter_page, page):
+        self.iterated = True
+        self.objects = []
+        try:
+            for obj in iter_page(page):
+                self.objects.append(obj)
+        except NextPage as e:
+            self.next_request = e.request
+        except Exception as e:
+            # raised after yielding objects found before it
+            self.error = e
+
+
+def prefetch_pagination(browser, page, iter_page, depth=1, early=True):
+    """
+    Iterate on objects of paginated pages like :func:`pagination`, but
+    request next pages in background, with the asynchronous session of the
+    browser.
+
+    Each page is fully iterated before yielding its objects, so the request
+    given by :class:`NextPage` is sent while the caller consumes them. When
+    *depth* is higher than 1, pages received while the caller consumes
+    objects are iterated at once, to request up to *depth* pages ahead.
+
+    Objects are yielded in the same order, and the browser goes on every
+    page (`page`, `url` and `response` attributes, :meth:`Page.on_leave`
+    and :meth:`Page.on_load` hooks) when the caller reaches its first
+    object, as without prefetching. But pages iterated early are iterated
+    before being loaded: *iter_page* must then only rely on its page
+    argument. If the caller stops the iteration, requests not sent yet are
+    cancelled.
+
+    :param browser: browser of the pages
+    :type browser: :class:`weboob.browser.browsers.PagesBrowser`
+    :param page: first page, which the browser is on
+    :type page: :class:`Page`
+    :param iter_page: function called with a page, returning an iterator on
+                      its objects, which raises :class:`NextPage`
+    :type iter_page: callable
+    :param depth: maximum number of pages requested ahead; pages not
+                  iterated early only request the next one once the caller
+                  reaches them
+    :type depth: int
+    :param early: iterate pages as soon as they are received, instead of
+                  when the caller reaches them
+    :type early: bool
+    """
+    pending = deque()
+
+    def fetch(request, current):
+        # called when the last queued page is iterated
+        if request is None or len(pending) >= depth:
+            return
+
+        if isinstance(request, Page):
+            pending.append(_PrefetchedPage(page=request))
+            return
+
+        # resolve the URL from the page which gave it, not from the browser, which may not be on it yet
+        base = current.url if current is not None else None
+        if isinstance(request, requests.Request):
+            request.url = url = browser.absurl(request.url, base=base)
+        else:
+            request = url = browser.absurl(request, base=base)
+        referrer = browser.get_referrer(base, url)
+        pending.append(_PrefetchedPage(future=browser.open(request, referrer=referrer, is_async=True)))
+
+    def advance():
+        # iterate received pages early, to request next ones
+        while pending and len(pending) < depth:
+            last = pending[-1]
+            if last.iterated or (last.future is not None and not last.future.done()):
+                return
+            if last.future is not None and last.future.exception() is not None:
+                # raised when the caller reaches this page
+                return
+
+            next_page = last.page or last.future.result().page
+            last.iterate(iter_page, next_page)
+            fetch(last.next_request, next_page)
+
+    def load(prefetched):
+        if prefetched.future is None:
+            return prefetched.page
+
+        response = prefetched.future.result()
+        if browser.page is not None:
+            browser.page.on_leave()
+        browser.response = response
+        browser.page = response.page
+        browser.url = response.url
+        if browser.page is not None:
+            browser.page.on_load()
+        # on_load may have called location()
+        return browser.response.page
+
+    current = _PrefetchedPage(page=page)
+    try:
+        while True:
+            if not current.iterated:
+                # pages iterated early have already requested the next one
+                current.iterate(iter_page, page)
+                fetch(current.next_request, page)
+
+            for obj in current.objects:
+                yield obj
+                if early:
+                    advance()
+
+            if current.error is not None:
+                raise current.error
+
+            if not pending:
+                return
+
+            current = pending.popleft()
+            page = load(current)
+    finally:
+        for prefetched in pending:
+            if prefetched.future is not None:
+                prefetched.future.cancel()
+
+
+class _LazyDoc(object):
+    """
+    Build the document of a page the first time it is accessed.
+
+    The document is then stored in the instance, which hides this descriptor.
+    """
+
+    def __get__(self, page, owner):
+        if page is None:
+            return self
+        page.doc = page.build_doc(page.data)
+        return page.doc
+
+
 class Page(object):
     """
     Represents a page.
@@ -135,6 +293,16 @@ class Page(object):
     :class:`LoginBrowser` and the :func:`need_login` decorator.
     """
 
+    LAZY_DOC = False
+    """
+    If True, :attr:`doc` is only built when it is accessed for the first time.
+
+    It is useful for pages which are only used to match an URL, or to read the
+    response without parsing it.
+    """
+
+    doc = _LazyDoc()
+
     def __new__(cls, *args, **kwargs):
         """ Accept any arguments, necessary for AbstractPage __new__ override.
 
@@ -152,19 +320,20 @@ class Page(object):
         self.url = self.response.url
         self.params = params
 
-        # Setup encoding and build document
+        # Setup encoding
         self.forced_encoding = self.normalize_encoding(encoding or self.ENCODING)
         if self.forced_encoding:
             self.response.encoding = self.forced_encoding
-        self.doc = self.build_doc(self.data)
-
-        # Last chance to change encoding, according to :meth:`detect_encoding`,
-        # which can be used to detect a document-level encoding declaration
-        if not self.forced_encoding:
+        else:
+            # Last chance to change encoding, according to :meth:`detect_encoding`,
+            # which can be used to detect a document-level encoding declaration
             encoding = self.detect_encoding()
             if encoding and encoding != self.encoding:
                 self.response.encoding = encoding
-                self.doc = self.build_doc(self.data)
+
+        # Build document, once the encoding is known
+        if not self.LAZY_DOC:
+            self.doc = self.build_doc(self.data)
 
     # Encoding issues are delegated to Response instance, implemented by
     # requests module.
@@ -222,6 +391,9 @@ class Page(object):
         """
         Override this method to implement detection of document-level encoding
         declaration, if any (eg. html5's <meta charset="some-charset">).
+
+        It is called before :attr:`doc` is built, so it has to look at the raw
+        :attr:`content`.
         """
         return None
 
@@ -547,6 +719,12 @@ class RawPage(Page):
         return content
 
 
+_HEAD_END_REGEXP = re.compile(br'</head\s*>', re.IGNORECASE)
+_COMMENT_REGEXP = re.compile(br'<!--.*?-->', re.DOTALL)
+_META_REGEXP = re.compile(br'<meta\b([^>]*)>', re.IGNORECASE)
+_ATTRIBUTE_REGEXP = re.compile(br'([\w:-]+)\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)')
+
+
 class HTMLPage(Page):
     """
     HTML page.
@@ -585,10 +763,23 @@ class HTMLPage(Page):
     Make links URLs absolute.
     """
 
+    ENCODING_SNIFF_SIZE = 8192
+    """
+    Size of the start of the content in which :meth:`detect_encoding` looks
+    for meta tags declaring the encoding.
+    """
+
+    _xpath_functions_defined = set()
+
     def __init__(self, *args, **kwargs):
-        import lxml.html as html
-        ns = html.etree.FunctionNamespace(None)
-        self.define_xpath_functions(ns)
+        # XPath functions are global, define them only once for each
+        # implementation of define_xpath_functions.
+        define = getattr(self.define_xpath_functions, '__func__', self.define_xpath_functions)
+        if define not in self._xpath_functions_defined:
+            import lxml.html as html
+            ns = html.etree.FunctionNamespace(None)
+            self.define_xpath_functions(ns)
+            self._xpath_functions_defined.add(define)
 
         super(HTMLPage, self).__init__(*args, **kwargs)
 
@@ -618,7 +809,8 @@ class HTMLPage(Page):
         """
         Define XPath functions on the given lxml function namespace.
 
-        This method is called in constructor of :class:`HTMLPage` and can be
+        This method is called by the constructor of the first instance of
+        :class:`HTMLPage` (or of a child class overloading it) and can be
         overloaded by children classes to add extra functions.
         """
         ns['lower-case'] = lambda context, args: ' '.join([s.lower() for s in args])
@@ -701,18 +893,38 @@ class HTMLPage(Page):
 
     def detect_encoding(self):
         """
-        Look for encoding in the document "http-equiv" and "charset" meta nodes.
+        Look for encoding in the "http-equiv" and "charset" meta nodes, in the
+        head of the document.
+
+        Only the first :attr:`ENCODING_SNIFF_SIZE` bytes of the content are
+        read, the document is not parsed.
         """
-        encoding = self.encoding
-        for content in self.doc.xpath('//head/meta[lower-case(@http-equiv)="content-type"]/@content'):
-            # meta http-equiv=content-type content=...
-            _, params = parse_header(content)
-            if 'charset' in params:
-                encoding = self.normalize_encoding(params['charset'].strip("'\""))
-
-        for charset in self.doc.xpath('//head/meta[@charset]/@charset'):
-            # meta charset=...
-            encoding = self.normalize_encoding(charset)
+        head = self.content[:self.ENCODING_SNIFF_SIZE]
+        m = _HEAD_END_REGEXP.search(head)
+        if m:
+            head = head[:m.start()]
+        head = _COMMENT_REGEXP.sub(b'', head)
+
+        http_equiv_encoding = charset_encoding = None
+        for meta in _META_REGEXP.findall(head):
+            attrs = {}
+            for key, value in _ATTRIBUTE_REGEXP.findall(meta):
+                if value[:1] in (b'"', b"'"):
+                    value = value[1:-1]
+                else:
+                    value = value.rstrip(b'/')
+                attrs[key.decode('latin-1').lower()] = value.decode('latin-1')
+
+            if 'charset' in attrs:
+                # meta charset=...
+                charset_encoding = self.normalize_encoding(attrs['charset'])
+            elif attrs.get('http-equiv', '').lower() == 'content-type' and 'content' in attrs:
+                # meta http-equiv=content-type content=...
+                _, params = parse_header(attrs['content'])
+                if 'charset' in params:
+                    http_equiv_encoding = self.normalize_encoding(params['charset'].strip("'\""))
+
+        encoding = charset_encoding or http_equiv_encoding or self.encoding
 
         if encoding == u'iso-8859-1' or not encoding:
             encoding = u'windows-1252'
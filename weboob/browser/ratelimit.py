@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from email.utils import mktime_tz, parsedate_tz
+from threading import Lock
+import time
+
+from weboob.tools.compat import urlparse
+from weboob.tools.log import getLogger
+
+
+__all__ = ['RateLimiter', 'TokenBucket', 'parse_retry_after']
+
+
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+def parse_retry_after(value, now=None):
+    """
+    Parse the value of a `Retry-After` header.
+
+    >>> parse_retry_after('120')
+    120.0
+    >>> parse_retry_after('Wed, 01 Jan 2020 00:01:00 GMT', now=1577836800)
+    60.0
+    >>> parse_retry_after('soon') is None
+    True
+
+    :param value: number of seconds, or HTTP date
+    :type value: str
+    :param now: current timestamp
+    :type now: float
+    :returns: number of seconds to wait, or None if the value is invalid
+    :rtype: float
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    if now is None:
+        now = time.time()
+    return max(0., float(mktime_tz(date) - now))
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket.
+
+    Callers get tokens in the order they asked for them: every call to
+    :meth:`acquire` reserves the next free slot, then sleeps until it.
+
+    :param rate: tokens per second, None for no limit
+    :type rate: float
+    :param burst: maximum number of tokens available at once
+    :type burst: int
+    """
+
+    clock = staticmethod(_monotonic)
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self, rate=None, burst=1):
+        self.lock = Lock()
+        self.rate = None
+        self.burst = 1
+        # time at which the bucket will be full again
+        self.full_at = 0.
+        self.configure(rate, burst)
+
+    @property
+    def interval(self):
+        return 1. / self.rate if self.rate else 0.
+
+    def configure(self, rate, burst):
+        with self.lock:
+            self.rate = rate
+            self.burst = max(1, burst)
+
+    def restrict(self, rate, burst):
+        """
+        Apply the lowest of current and given rate and burst.
+        """
+        if not rate:
+            return
+
+        with self.lock:
+            if not self.rate:
+                self.rate, self.burst = rate, max(1, burst)
+            else:
+                self.rate = min(self.rate, rate)
+                self.burst = max(1, min(self.burst, burst))
+
+    def reserve(self):
+        """
+        Reserve a token.
+
+        :returns: number of seconds to wait before using it
+        :rtype: float
+        """
+        with self.lock:
+            now = self.clock()
+            interval = self.interval
+            start = max(now, self.full_at - (self.burst - 1) * interval)
+            self.full_at = max(self.full_at, now) + interval
+            return start - now
+
+    def acquire(self):
+        """
+        Wait until a token is available, and take it.
+
+        :returns: number of seconds waited
+        :rtype: float
+        """
+        delay = self.reserve()
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+    def pause(self, seconds):
+        """
+        Don't give any token during the next *seconds*.
+        """
+        with self.lock:
+            self.full_at = max(self.full_at, self.clock() + seconds + (self.burst - 1) * self.interval)
+
+
+class RateLimiter(object):
+    """
+    Limit the rate of requests of a session, per host.
+
+    Buckets are shared by all limiters of the process, so browsers of
+    several backends targeting the same host are throttled together. When
+    limiters with different settings share a host, the most restrictive
+    ones apply.
+
+    :param rate: maximum number of requests per second to a host, None for
+                 no limit
+    :type rate: float
+    :param burst: number of requests which can be sent at once
+    :type burst: int
+    :param retry_after: delay next requests to a host as asked by the
+                        `Retry-After` header of 429 and 503 responses
+    :type retry_after: bool
+    :param max_retry_after: longest delay accepted from a `Retry-After` header
+    :type max_retry_after: float
+    """
+
+    _buckets = {}
+    _buckets_lock = Lock()
+
+    def __init__(self, rate=None, burst=1, retry_after=False, max_retry_after=300, logger=None):
+        self.rate = rate
+        self.burst = burst
+        self.retry_after = retry_after
+        self.max_retry_after = max_retry_after
+        self.logger = getLogger('ratelimit', logger)
+
+    @classmethod
+    def get_bucket(cls, host, rate, burst):
+        with cls._buckets_lock:
+            bucket = cls._buckets.get(host)
+            if bucket is None:
+                bucket = cls._buckets[host] = TokenBucket(rate, burst)
+                return bucket
+        bucket.restrict(rate, burst)
+        return bucket
+
+    def bucket_for(self, url):
+        return self.get_bucket(urlparse(url).netloc.lower(), self.rate, self.burst)
+
+    def wait(self, request):
+        """
+        Wait until a request can be sent.
+        """
+        delay = self.bucket_for(request.url).acquire()
+        if delay > 1:
+            self.logger.debug('Request to %s delayed %.1fs by rate limiting', request.url, delay)
+
+    def handle_response(self, response):
+        """
+        Pause requests to the host of a response which asks for it.
+        """
+        if not self.retry_after or response.status_code not in (429, 503):
+            return
+
+        delay = parse_retry_after(response.headers.get('Retry-After'))
+        if delay is None:
+            return
+
+        delay = min(delay, self.max_retry_after)
+        self.logger.info('%s asked to wait %.0fs before next requests', urlparse(response.url).netloc, delay)
+        self.bucket_for(response.url).pause(delay)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import random
+from threading import Lock
+import time
+
+from requests.exceptions import ConnectionError, SSLError, Timeout
+
+from .har import HARReplayError
+from .ratelimit import parse_retry_after
+
+
+__all__ = ['RetryPolicy', 'RetryStats']
+
+
+class RetryStats(object):
+    """Counters of retries of a session"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.requests = 0
+        self.retries = 0
+        self.delay = 0.
+        self.denied = 0
+
+    def add_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def __str__(self):
+        return '%d requests, %d retries (%.1fs waited), %d denied by the budget' % (
+            self.requests, self.retries, self.delay, self.denied)
+
+
+class RetryPolicy(object):
+    """
+    Policy to retry requests which failed because of the network or the
+    server.
+
+    The n-th retry waits a random delay between 0 and
+    `backoff_factor * 2 ** (n - 1)` seconds (exponential backoff with full
+    jitter), at most *max_backoff*. When the server answers with a
+    `Retry-After` header, this delay is used instead, unless it is longer
+    than *max_retry_after*, in which case the request is not retried.
+
+    Retries of a session are limited by a budget: a session can retry at
+    most *budget_min* requests, plus *budget_ratio* of the requests it sent,
+    so a failing site can't multiply the load we put on it.
+
+    The policy holds no state, so it can be shared by browsers: counters are
+    kept by :class:`RetryStats`.
+
+    :param max_retries: maximum number of retries of a request
+    :type max_retries: int
+    :param methods: methods which are safe to retry
+    :type methods: iterable[str]
+    :param statuses: HTTP status codes of responses to retry
+    :type statuses: iterable[int]
+    :param backoff_factor: base delay, in seconds
+    :type backoff_factor: float
+    :param max_backoff: maximum delay, in seconds
+    :type max_backoff: float
+    :param jitter: randomize delays
+    :type jitter: bool
+    :param max_retry_after: longest `Retry-After` delay accepted, in seconds
+    :type max_retry_after: float
+    :param budget_ratio: retries allowed per request sent by a session
+    :type budget_ratio: float
+    :param budget_min: retries always allowed to a session
+    :type budget_min: int
+    """
+
+    EXCEPTIONS = (ConnectionError, Timeout)
+    """
+    Exceptions on which requests are retried.
+    """
+
+    NOT_RETRIED_EXCEPTIONS = (SSLError, HARReplayError)
+    """
+    Exceptions which won't get better on a retry.
+    """
+
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self, max_retries=2, methods=('GET', 'HEAD'), statuses=(429, 502, 503, 504),
+                 backoff_factor=.5, max_backoff=30, jitter=True, max_retry_after=60,
+                 budget_ratio=.2, budget_min=10):
+        self.max_retries = max_retries
+        self.methods = frozenset(method.upper() for method in methods)
+        self.statuses = frozenset(statuses)
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_retry_after = max_retry_after
+        self.budget_ratio = budget_ratio
+        self.budget_min = budget_min
+
+    def is_retryable(self, request, response=None, exception=None):
+        """
+        Whether a request which failed with this response or exception may be
+        retried.
+        """
+        if request.method.upper() not in self.methods:
+            return False
+        if exception is not None:
+            return isinstance(exception, self.EXCEPTIONS) and not isinstance(exception, self.NOT_RETRIED_EXCEPTIONS)
+        return response.status_code in self.statuses
+
+    def get_backoff(self, retry):
+        """
+        Delay before the *retry*-th retry, starting from 1.
+        """
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** (retry - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def get_delay(self, request, retry, stats, response=None, exception=None):
+        """
+        Delay before retrying a failed request, updating *stats*.
+
+        :param retry: number of the next retry, starting from 1
+        :type retry: int
+        :param stats: counters of the session
+        :type stats: :class:`RetryStats`
+        :returns: seconds to wait, or None to not retry
+        :rtype: float
+        """
+        if retry > self.max_retries or not self.is_retryable(request, response, exception):
+            return None
+
+        delay = None
+        if response is not None:
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is not None and delay > self.max_retry_after:
+                return None
+        if delay is None:
+            delay = self.get_backoff(retry)
+
+        with stats.lock:
+            if stats.retries >= self.budget_min + self.budget_ratio * stats.requests:
+                stats.denied += 1
+                return None
+            stats.retries += 1
+            stats.delay += delay
+        return delay
@@ -22,7 +22,6 @@ from __future__ import unicode_literals, absolute_import
 import codecs
 from collections import OrderedDict
 from contextlib import contextmanager
-from copy import deepcopy
 from glob import glob
 import os
 import hashlib
@@ -454,8 +453,7 @@ class SeleniumBrowser(object):
         for attr in dir(cls):
             val = getattr(cls, attr)
             if isinstance(val, URL):
-                val = deepcopy(val)
-                val.browser = self
+                val = val.bind(self)
                 setattr(self, attr, val)
                 self._urls.append(val)
         self._urls.sort(key=lambda u: u._creation_counter)
@@ -34,7 +34,10 @@ from requests.sessions import merge_setting
 from requests.structures import CaseInsensitiveDict
 from requests.utils import get_netrc_auth
 
+from weboob.tools.log import getLogger
+
 from .adapters import HTTPAdapter
+from .har import HARReplayAdapter
 
 
 def merge_hooks(request_hooks, session_hooks, dict_class=OrderedDict):
@@ -61,6 +64,60 @@ def merge_hooks(request_hooks, session_hooks, dict_class=OrderedDict):
 
 
 class WeboobSession(Session):
+    logger = getLogger('session')
+
+    rate_limiter = None
+    """
+    :class:`weboob.browser.ratelimit.RateLimiter` applied to every request
+    sent by this session, including redirections.
+    """
+
+    retry_policy = None
+    """
+    :class:`weboob.browser.retry_policy.RetryPolicy` applied to every request sent
+    by this session.
+    """
+
+    retry_stats = None
+    """
+    :class:`weboob.browser.retry_policy.RetryStats` of this session, set with
+    :attr:`retry_policy`.
+    """
+
+    def send(self, request, **kwargs):
+        policy = self.retry_policy
+        if policy is not None:
+            self.retry_stats.add_request()
+
+        retry = 0
+        while True:
+            retry += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait(request)
+
+            try:
+                response = super(WeboobSession, self).send(request, **kwargs)
+            except Exception as exc:
+                if policy is None:
+                    raise
+                delay = policy.get_delay(request, retry, self.retry_stats, exception=exc)
+                if delay is None:
+                    raise
+                error = exc
+            else:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.handle_response(response)
+                if policy is None:
+                    return response
+                delay = policy.get_delay(request, retry, self.retry_stats, response=response)
+                if delay is None:
+                    return response
+                error = '%s %s' % (response.status_code, response.reason)
+                response.close()
+
+            self.logger.info('%s %s failed (%s), retry %d in %.1fs', request.method, request.url, error, retry, delay)
+            policy.sleep(delay)
+
     def prepare_request(self, request):
         """Constructs a :class:`PreparedRequest <PreparedRequest>` for
         transmission and returns it. The :class:`PreparedRequest` has settings
@@ -101,6 +158,20 @@ class WeboobSession(Session):
         )
         return p
 
+    def replay_har(self, har, **kwargs):
+        """
+        Serve responses of all HTTP(S) requests of this session from a HAR
+        file, instead of the network.
+
+        Arguments are given to :class:`weboob.browser.har.HARReplayAdapter`.
+
+        :rtype: :class:`weboob.browser.har.HARReplayAdapter`
+        """
+        adapter = HARReplayAdapter(har, **kwargs)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        return adapter
+
 
 class FuturesSession(WeboobSession):
     def __init__(self, executor=None, max_workers=2, max_retries=2, *args, **kwargs):
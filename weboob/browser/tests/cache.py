@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from weboob.browser import PagesBrowser, URL
+from weboob.browser.cache import CacheMixin, SQLiteCache
+from weboob.browser.pages import RawPage
+
+
+class MockAdapter(BaseAdapter):
+    """Serve responses without network, with an ETag for /etag/ URLs."""
+
+    def __init__(self):
+        super(MockAdapter, self).__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.headers = CaseInsensitiveDict()
+        response.encoding = 'utf-8'
+        if '/etag/' in request.url:
+            response.headers['ETag'] = '"foo"'
+        if request.headers.get('If-None-Match') == '"foo"':
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response._content = ('content of %s' % request.url).encode('utf-8')
+            if request.body:
+                response._content += (' for %s' % request.body).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+class MyCacheBrowser(CacheMixin, PagesBrowser):
+    BASEURL = 'http://cache.test/'
+
+    cache_ttl_rules = [(r'http://cache\.test/ttl/', 3600)]
+
+    raw = URL(r'.*', RawPage)
+
+    open = CacheMixin.open_with_cache
+
+    def __init__(self, *args, **kwargs):
+        super(MyCacheBrowser, self).__init__(*args, **kwargs)
+        self.adapter = MockAdapter()
+        self.session.mount('http://cache.test/', self.adapter)
+
+
+class CacheMixinTest(TestCase):
+    def test_revalidation(self):
+        browser = MyCacheBrowser()
+        for _ in range(3):
+            response = browser.open('http://cache.test/etag/a')
+            self.assertEqual(response.content, b'content of http://cache.test/etag/a')
+
+        self.assertEqual(len(browser.adapter.requests), 3)
+        self.assertEqual(browser.adapter.requests[-1].headers['If-None-Match'], '"foo"')
+        self.assertEqual(browser.cache_stats.revalidated, 2)
+
+    def test_ttl(self):
+        browser = MyCacheBrowser()
+        browser.open('http://cache.test/ttl/a')
+        browser.open('http://cache.test/ttl/a')
+        browser.open('http://cache.test/nocache/a')
+        browser.open('http://cache.test/nocache/a')
+
+        self.assertEqual([r.url for r in browser.adapter.requests],
+                         ['http://cache.test/ttl/a', 'http://cache.test/nocache/a', 'http://cache.test/nocache/a'])
+        self.assertEqual(browser.cache_stats.hits, 1)
+        self.assertEqual(browser.cache_stats.misses, 3)
+        self.assertEqual(browser.cache_stats.hit_ratio, 0.25)
+
+    def test_post(self):
+        browser = MyCacheBrowser()
+        for name in ('alice', 'bob', 'alice'):
+            response = browser.open('http://cache.test/ttl/search', data={'q': name})
+            self.assertEqual(response.content, b'content of http://cache.test/ttl/search for q=%s' % name.encode())
+        # rules only apply to GET and HEAD requests
+        self.assertEqual(len(browser.adapter.requests), 3)
+        self.assertEqual(browser.cache_stats.hits, 0)
+
+    def test_sessions(self):
+        cache = {}
+        browsers = [MyCacheBrowser(cache=cache), MyCacheBrowser(cache=cache)]
+        for browser, name in zip(browsers, ('alice', 'bob')):
+            browser.session.cookies.set('session', name, domain='cache.test')
+            browser.open('http://cache.test/ttl/a')
+            browser.open('http://cache.test/ttl/a')
+            self.assertEqual(len(browser.adapter.requests), 1)
+            self.assertEqual(browser.adapter.requests[0].headers['Cookie'], 'session=%s' % name)
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+        self.path = os.path.join(self.tmpdir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_persistence(self):
+        cache = SQLiteCache(self.path)
+        browser = MyCacheBrowser(cache=cache)
+        browser.open('http://cache.test/ttl/a')
+        cache.close()
+
+        cache = SQLiteCache(self.path)
+        browser = MyCacheBrowser(cache=cache)
+        response = browser.open('http://cache.test/ttl/a')
+        self.assertEqual(browser.adapter.requests, [])
+        self.assertEqual(response.content, b'content of http://cache.test/ttl/a')
+        self.assertIsInstance(response.page, RawPage)
+        self.assertEqual(browser.cache_stats.bytes_saved, len(response.content))
+
+        browser.open('http://cache.test/etag/a')
+        browser.open('http://cache.test/etag/a')
+        self.assertEqual(browser.adapter.requests[-1].headers['If-None-Match'], '"foo"')
+        self.assertEqual(browser.cache_stats.revalidated, 1)
+        cache.close()
+
+    def test_eviction(self):
+        cache = SQLiteCache(self.path, max_entries=3, max_bytes=120)
+        browser = MyCacheBrowser(cache=cache)
+        for name in 'abcd':
+            browser.open('http://cache.test/ttl/%s' % name)
+        self.assertEqual(len(cache), 3)
+
+        # keep 'b' as recently used
+        browser.open('http://cache.test/ttl/b')
+        browser.open('http://cache.test/ttl/long/%s' % ('x' * 40))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(len(browser.adapter.requests), 5)
+        browser.open('http://cache.test/ttl/b')
+        self.assertEqual(len(browser.adapter.requests), 5)
+        cache.close()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from unittest import TestCase
+
+import lxml.html
+
+from weboob.browser.elements import DataError, DictElement, ElementEnv, ItemElement, ListElement, TableElement
+from weboob.browser.filters.html import TableCell
+from weboob.browser.filters.json import Dict
+from weboob.browser.filters.standard import CleanText, Env
+from weboob.capabilities.base import BaseObject
+
+
+class MyMockPage(object):
+    browser = None
+    logger = None
+
+    def __init__(self, html, params=None):
+        self.doc = lxml.html.fromstring(html)
+        self.params = params or {}
+
+
+class ElementEnvTest(TestCase):
+    def test_fork_copies_on_read(self):
+        parent = ElementEnv(label=u'foo', path=[1])
+        child = parent.fork()
+
+        child['path'].append(2)
+        self.assertEqual(parent['path'], [1])
+        self.assertEqual(child['path'], [1, 2])
+
+        parent['path'].append(3)
+        self.assertEqual(child['path'], [1, 2])
+        self.assertEqual(parent['path'], [1, 3])
+        self.assertEqual(sorted(child.items()), [('label', u'foo'), ('path', [1, 2])])
+
+    def test_write(self):
+        parent = ElementEnv(path=[1])
+        child = parent.fork()
+        child['path'] = [4]
+        self.assertEqual(parent['path'], [1])
+        self.assertEqual(child['path'], [4])
+
+
+class ListElementTest(TestCase):
+    HTML = u'''<html><body><table>
+               <tr><th>Name</th><th>Value</th></tr>
+               <tr><td>a</td><td>1</td></tr>
+               <tr><td>b</td><td>2</td></tr>
+               </table></body></html>'''
+
+    def test_table(self):
+        class iter_objects(TableElement):
+            head_xpath = '//tr/th'
+            item_xpath = '//tr[td]'
+
+            col_name = 'name'
+            col_value = [u'Amount', u'Value']
+
+            class item(ItemElement):
+                klass = BaseObject
+
+                obj_id = CleanText(TableCell('name'))
+                obj_url = Env('url')
+
+                def parse(self, el):
+                    self.env['seen'].append(el)
+
+        page = MyMockPage(self.HTML, {'url': u'http://weboob.org', 'seen': []})
+        for _ in range(2):
+            element = iter_objects(page)
+            objs = list(element())
+            self.assertEqual([obj.id for obj in objs], [u'a', u'b'])
+            self.assertEqual([obj.url for obj in objs], [u'http://weboob.org'] * 2)
+            self.assertEqual(element.get_colnum('value'), 1)
+            self.assertEqual(element.env['seen'], [])
+            self.assertEqual(page.params['seen'], [])
+
+    def test_loaders(self):
+        class iter_objects(ListElement):
+            item_xpath = '//tr[td]'
+
+            class item(ItemElement):
+                klass = BaseObject
+
+                def load_value(self):
+                    return CleanText('./td[2]')(self)
+
+                def obj_id(self):
+                    return self.loaders['value']
+
+        self.assertEqual([obj.id for obj in iter_objects(MyMockPage(self.HTML))()], [u'1', u'2'])
+
+    def test_streaming(self):
+        built = []
+
+        class iter_objects(ListElement):
+            item_xpath = '//tr[td]'
+            streaming = True
+
+            class item(ItemElement):
+                klass = BaseObject
+
+                obj_id = CleanText('./td[1]')
+
+                def condition(self):
+                    built.append(self.el)
+                    return True
+
+        element = iter_objects(MyMockPage(self.HTML))
+        objs = element()
+        self.assertEqual(next(objs).id, u'a')
+        self.assertEqual(len(set(built)), 1)
+        self.assertEqual([obj.id for obj in objs], [u'b'])
+        # objects are not kept
+        self.assertEqual(element.objects, {})
+        self.assertEqual(element.streamed_ids, {u'a', u'b'})
+
+    def test_streaming_duplicate(self):
+        class iter_objects(ListElement):
+            item_xpath = '//tr[td]'
+            streaming = True
+
+            class item(ItemElement):
+                klass = BaseObject
+
+                obj_id = CleanText('./td[2]', replace=[('2', '1')])
+
+        objs = iter_objects(MyMockPage(self.HTML))()
+        self.assertEqual(next(objs).id, u'1')
+        self.assertRaises(DataError, next, objs)
+
+        iter_objects.ignore_duplicate = True
+        self.assertEqual([obj.id for obj in iter_objects(MyMockPage(self.HTML))()], [u'1'])
+
+        # objects are kept to be yielded at the end
+        iter_objects.flush_at_end = True
+        element = iter_objects(MyMockPage(self.HTML))
+        self.assertEqual([obj.id for obj in element()], [u'1'])
+        self.assertEqual(list(element.objects), [u'1'])
+
+
+class DictElementTest(TestCase):
+    def test_wildcard(self):
+        class iter_objects(DictElement):
+            item_xpath = 'groups/*/items'
+            streaming = True
+
+            class item(ItemElement):
+                klass = BaseObject
+
+                obj_id = Dict('id')
+
+        page = MyMockPage(u'<html/>')
+        page.doc = {'groups': {'a': {'items': [{'id': u'1'}, {'id': u'2'}]}, 'b': {'items': [{'id': u'3'}]}}}
+        self.assertEqual(sorted(obj.id for obj in iter_objects(page)()), [u'1', u'2', u'3'])
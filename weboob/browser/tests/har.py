@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+import base64
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from weboob.browser import PagesBrowser, URL
+from weboob.browser.exceptions import HTTPNotFound
+from weboob.browser.har import HARReplayError, HARWriter, load_har
+from weboob.browser.pages import JsonPage, RawPage
+
+
+def make_entry(method, url, text, status=200, body=None, headers=()):
+    entry = {
+        'request': {'method': method, 'url': url, 'headers': []},
+        'response': {
+            'status': status,
+            'statusText': 'OK',
+            'headers': [{'name': k, 'value': v} for k, v in headers],
+            'content': {'encoding': 'base64', 'text': base64.b64encode(text.encode('utf-8')).decode('ascii')},
+        },
+    }
+    if body is not None:
+        entry['request']['postData'] = {'text': body}
+    return entry
+
+
+JSON_HEADERS = [('Content-Type', 'application/json')]
+HAR = {'log': {'entries': [
+    make_entry('GET', 'http://har.test/login', u'login', headers=[('Set-Cookie', 'session=42; Path=/')]),
+    make_entry('POST', 'http://har.test/login', u'logged', body='user=foo'),
+    make_entry('GET', 'http://har.test/list?page=1&ts=123', u'{"page": 1}', headers=JSON_HEADERS),
+    make_entry('GET', 'http://har.test/list?page=1&ts=124', u'{"page": 2}', headers=JSON_HEADERS),
+]}}
+
+
+class MyHARBrowser(PagesBrowser):
+    BASEURL = 'http://har.test/'
+
+    lst = URL(r'list', JsonPage)
+    login = URL(r'login', RawPage)
+
+
+class HARReplayTest(TestCase):
+    def test_replay(self):
+        browser = MyHARBrowser()
+        browser.session.replay_har(HAR, ignore_params=['ts'])
+
+        self.assertEqual(browser.login.go().doc, b'login')
+        self.assertEqual(browser.session.cookies.get('session'), '42')
+        self.assertEqual(browser.login.go(data={'user': 'foo'}).doc, b'logged')
+
+        # recorded responses are served in order
+        self.assertEqual(browser.lst.go(params={'page': 1, 'ts': 999}).doc, {'page': 1})
+        self.assertEqual(browser.lst.go(params={'ts': 1000, 'page': 1}).doc, {'page': 2})
+        self.assertRaises(HARReplayError, browser.lst.go, params={'page': 1})
+        self.assertRaises(HARReplayError, browser.location, 'http://har.test/unknown')
+
+    def test_match_body(self):
+        browser = MyHARBrowser()
+        browser.session.replay_har(HAR, match_body=True)
+        self.assertRaises(HARReplayError, browser.login.go, data={'user': 'bar'})
+        self.assertEqual(browser.login.go(data={'user': 'foo'}).doc, b'logged')
+
+    def test_lenient(self):
+        browser = MyHARBrowser()
+        browser.session.replay_har(HAR, strict=False)
+
+        self.assertEqual(browser.lst.go(params={'page': 1, 'ts': 123}).doc, {'page': 1})
+        self.assertEqual(browser.lst.go(params={'page': 1, 'ts': 123}).doc, {'page': 1})
+        self.assertEqual(browser.lst.go(params={'page': 3}).doc, {'page': 1})
+        self.assertRaises(HTTPNotFound, browser.open, 'http://har.test/unknown')
+
+    def test_record_and_replay(self):
+        tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+        try:
+            browser = MyHARBrowser(responses_dirname=tmpdir)
+            browser.session.replay_har(HAR)
+            browser.login.go()
+            browser.login.go(data={'user': 'foo'})
+            browser.deinit()
+
+            browser = MyHARBrowser()
+            browser.session.replay_har(os.path.join(tmpdir, 'bundle.har'), match_body=True)
+            self.assertEqual(browser.login.go().doc, b'login')
+            self.assertEqual(browser.login.go(data={'user': 'foo'}).doc, b'logged')
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class HARWriterTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_entry(self, anchor, mimetype):
+        return {
+            '$anchor': anchor,
+            'startedDateTime': '2020-01-01T00:00:00',
+            'request': {'method': 'GET', 'url': 'http://har.test/%s' % anchor, 'headers': []},
+            'response': {'status': 200, 'statusText': 'OK', 'headers': [], 'content': {'mimeType': mimetype}},
+        }
+
+    def write_entries(self, writer):
+        writer.add(self.make_entry('text', 'text/html'), u'é'.encode('utf-8'))
+        writer.add(self.make_entry('binary', 'application/pdf'), b'%PDF\xff')
+        writer.flush()
+        writer.add(self.make_entry('empty', 'text/plain'), b'')
+        writer.flush()
+
+    def test_formats(self):
+        for fmt in ('har', 'jsonl', 'jsonl.gz'):
+            writer = HARWriter(self.tmpdir, fmt)
+            self.write_entries(writer)
+
+            self.assertEqual(writer.path, os.path.join(self.tmpdir, 'bundle.%s' % fmt))
+            self.assertEqual(os.listdir(self.tmpdir), ['bundle.%s' % fmt])
+
+            har = load_har(writer.path)
+            self.assertEqual(har['log']['version'], '1.2')
+            contents = [entry['response']['content'] for entry in har['log']['entries']]
+            self.assertEqual(contents, [
+                {'mimeType': 'text/html', 'encoding': 'base64', 'text': 'w6k='},
+                {'mimeType': 'application/pdf', 'encoding': 'base64', 'text': 'JVBERv8='},
+                {'mimeType': 'text/plain', 'encoding': 'base64', 'text': ''},
+            ])
+            os.remove(writer.path)
+
+    def test_side_files(self):
+        writer = HARWriter(self.tmpdir, 'jsonl', side_files=True)
+        self.write_entries(writer)
+
+        with open(os.path.join(self.tmpdir, 'binary.pdf'), 'rb') as fd:
+            self.assertEqual(fd.read(), b'%PDF\xff')
+
+        har = load_har(writer.path)
+        contents = [entry['response']['content'] for entry in har['log']['entries']]
+        self.assertEqual(contents, [
+            {'mimeType': 'text/html', 'text': u'é'},
+            {'mimeType': 'application/pdf', 'encoding': 'base64', 'text': 'JVBERv8='},
+            {'mimeType': 'text/plain', 'text': u''},
+        ])
+
+    def test_replay(self):
+        browser = MyHARBrowser(responses_dirname=self.tmpdir)
+        browser.HAR_FORMAT = 'jsonl.gz'
+        browser.session.replay_har(HAR)
+        browser.login.go()
+        browser.deinit()
+
+        browser = MyHARBrowser()
+        browser.session.replay_har(os.path.join(self.tmpdir, 'bundle.jsonl.gz'))
+        self.assertEqual(browser.login.go().doc, b'login')
+
+    def test_shared(self):
+        self.assertIs(HARWriter.for_directory(self.tmpdir), HARWriter.for_directory(self.tmpdir + '/'))
+        self.assertIsNot(HARWriter.for_directory(self.tmpdir), HARWriter.for_directory(self.tmpdir, 'jsonl'))
+        self.assertRaises(ValueError, HARWriter, self.tmpdir, 'xml')
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from unittest import TestCase
+
+from weboob.tools.json import json
+
+from requests.models import Response
+
+from weboob.browser import PagesBrowser, URL, browsers
+from weboob.browser.elements import DictElement, ItemElement, method
+from weboob.browser.filters.json import Dict
+from weboob.browser.pages import HTMLPage, JsonPage, pagination, prefetch_pagination
+from weboob.capabilities.base import BaseObject
+from weboob.tools.log import getLogger
+
+from .har import make_entry
+
+
+class MyMockBrowser(object):
+    logger = getLogger('mockbrowser')
+
+
+def make_response(content, content_type='text/html'):
+    response = Response()
+    response.url = 'http://weboob.org/'
+    response.status_code = 200
+    response.headers['Content-Type'] = content_type
+    response.encoding = 'ISO-8859-1' if content_type == 'text/html' else None
+    response._content = content
+    return response
+
+
+class CountingPage(HTMLPage):
+    def build_doc(self, content):
+        self.builds = getattr(self, 'builds', 0) + 1
+        return super(CountingPage, self).build_doc(content)
+
+
+class LazyPage(CountingPage):
+    LAZY_DOC = True
+
+
+class MyFunctionsPage(HTMLPage):
+    calls = 0
+
+    def define_xpath_functions(self, ns):
+        super(MyFunctionsPage, self).define_xpath_functions(ns)
+        MyFunctionsPage.calls += 1
+        ns['weboob-test'] = lambda context: 'weboob'
+
+
+# Class that tests how documents of HTML pages are built
+class HTMLPageTest(TestCase):
+    def test_meta_charset(self):
+        content = u'<html><head><meta charset="utf-8"></head><body><p>é</p></body></html>'.encode('utf-8')
+        page = CountingPage(MyMockBrowser(), make_response(content))
+        self.assertEqual(page.encoding, 'utf-8')
+        self.assertEqual(page.doc.xpath('//p')[0].text, u'é')
+        self.assertEqual(page.builds, 1)
+
+    def test_meta_http_equiv(self):
+        content = (u'<html><head><!-- <meta charset="utf-16"> -->'
+                   u'<meta http-equiv="Content-Type" content="text/html; charset=iso-8859-15" />'
+                   u'</head><body><p>€</p><meta charset="utf-16"></body></html>').encode('iso-8859-15')
+        page = CountingPage(MyMockBrowser(), make_response(content))
+        self.assertEqual(page.encoding, 'iso-8859-15')
+        self.assertEqual(page.doc.xpath('//p')[0].text, u'€')
+
+    def test_charset_wins(self):
+        content = (b'<html><head><meta charset=utf-8/>'
+                   b'<meta http-equiv="content-type" content="text/html; charset=iso-8859-15">'
+                   b'</head></html>')
+        page = CountingPage(MyMockBrowser(), make_response(content))
+        self.assertEqual(page.encoding, 'utf-8')
+
+    def test_default_encoding(self):
+        page = CountingPage(MyMockBrowser(), make_response(b'<html><body></body></html>'))
+        self.assertEqual(page.encoding, 'windows-1252')
+
+        page = CountingPage(MyMockBrowser(), make_response(b'<html><body></body></html>'), encoding='utf-8')
+        self.assertEqual(page.encoding, 'utf-8')
+
+    def test_lazy_doc(self):
+        page = LazyPage(MyMockBrowser(), make_response(b'<html><body><p>foo</p></body></html>'))
+        self.assertFalse(hasattr(page, 'builds'))
+        self.assertEqual(page.doc.xpath('//p')[0].text, u'foo')
+        self.assertEqual(page.doc.xpath('//p')[0].text, u'foo')
+        self.assertEqual(page.builds, 1)
+
+        page.doc = None
+        self.assertIsNone(page.doc)
+
+    def test_xpath_functions(self):
+        for _ in range(3):
+            page = MyFunctionsPage(MyMockBrowser(), make_response(b'<html><body><p class="a b">foo</p></body></html>'))
+        self.assertEqual(MyFunctionsPage.calls, 1)
+        self.assertEqual(page.doc.xpath('weboob-test()'), 'weboob')
+        self.assertEqual(len(page.doc.xpath('//p[has-class("b")]')), 1)
+
+
+class ListPage(JsonPage):
+    @pagination
+    @method
+    class iter_objects(DictElement):
+        item_xpath = 'items'
+
+        def next_page(self):
+            if Dict('next', default=None)(self):
+                return 'list?page=%s' % Dict('next')(self)
+
+        class item(ItemElement):
+            klass = BaseObject
+
+            obj_id = Dict('id')
+
+    def on_load(self):
+        self.browser.loaded.append(self.url)
+
+
+def list_entry(num, last=5):
+    return make_entry('GET', 'http://pagination.test/list?page=%d' % num, json.dumps({
+        'items': [{'id': u'%d-%d' % (num, i)} for i in range(3)],
+        'next': num + 1 if num < last else None,
+    }), headers=[('Content-Type', 'application/json')])
+
+
+class MyPaginationBrowser(PagesBrowser):
+    BASEURL = 'http://pagination.test/'
+
+    lst = URL(r'list\?page=(?P<num>\d+)', ListPage)
+
+    def __init__(self, *args, **kwargs):
+        super(MyPaginationBrowser, self).__init__(*args, **kwargs)
+        self.loaded = []
+        entries = [list_entry(num) for num in range(1, 6)]
+        self.har = self.session.replay_har({'log': {'entries': entries}}, strict=False)
+
+
+class PaginationPrefetchTest(TestCase):
+    EXPECTED = [u'%d-%d' % (num, i) for num in range(1, 6) for i in range(3)]
+
+    def test_same_results(self):
+        for depth in (0, 1, 3):
+            browser = MyPaginationBrowser()
+            browser.PAGINATION_PREFETCH = depth
+            browser.lst.go(num=1)
+            self.assertEqual([obj.id for obj in browser.page.iter_objects()], self.EXPECTED)
+            self.assertEqual(browser.url, 'http://pagination.test/list?page=5')
+            self.assertEqual(browser.loaded, ['http://pagination.test/list?page=%d' % num for num in range(1, 6)])
+
+            browser.lst.go(num=1)
+            objs = browser.pagination(lambda: browser.page.iter_objects.__wrapped__(browser.page))
+            self.assertEqual([obj.id for obj in objs], self.EXPECTED)
+            self.assertEqual(browser.page.url, 'http://pagination.test/list?page=5')
+
+    def test_browser_depth(self):
+        depths = []
+
+        def my_prefetch_pagination(*args, **kwargs):
+            depths.append(kwargs['depth'])
+            return prefetch_pagination(*args, **kwargs)
+
+        browsers.prefetch_pagination = my_prefetch_pagination
+        self.addCleanup(setattr, browsers, 'prefetch_pagination', prefetch_pagination)
+
+        browser = MyPaginationBrowser()
+        browser.PAGINATION_PREFETCH = 3
+        browser.lst.go(num=1)
+        objs = browser.pagination(lambda: browser.page.iter_objects.__wrapped__(browser.page))
+        self.assertEqual([obj.id for obj in objs], self.EXPECTED)
+        self.assertEqual(depths, [3])
+
+    def test_stop(self):
+        browser = MyPaginationBrowser()
+        browser.PAGINATION_PREFETCH = 2
+        browser.lst.go(num=1)
+        objs = browser.page.iter_objects()
+        self.assertEqual(next(objs).id, u'1-0')
+        objs.close()
+
+        browser.session.executor.shutdown(wait=True)
+        # the current page, and at most 2 pages ahead
+        self.assertLessEqual(sum(1 for pending, last in browser.har.entries.values() if last), 3)
+        self.assertEqual(browser.url, 'http://pagination.test/list?page=1')
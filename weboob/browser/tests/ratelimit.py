@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from threading import Thread
+from unittest import TestCase
+
+from weboob.browser import Browser
+from weboob.browser.exceptions import ClientError
+from weboob.browser.ratelimit import RateLimiter, TokenBucket
+
+from .har import make_entry
+
+
+class FakeClockBucket(TokenBucket):
+    def __init__(self, *args, **kwargs):
+        self.now = 0.
+        super(FakeClockBucket, self).__init__(*args, **kwargs)
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.now += delay
+
+
+class TokenBucketTest(TestCase):
+    def test_rate(self):
+        bucket = FakeClockBucket(rate=2, burst=3)
+        self.assertEqual([bucket.acquire() for _ in range(5)], [0, 0, 0, .5, .5])
+
+        # the bucket refills while idle
+        bucket.now += 10
+        self.assertEqual([bucket.acquire() for _ in range(4)], [0, 0, 0, .5])
+
+    def test_unlimited(self):
+        bucket = FakeClockBucket()
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0, 0, 0])
+
+        bucket.pause(30)
+        self.assertEqual([bucket.acquire() for _ in range(2)], [30, 0])
+
+    def test_restrict(self):
+        bucket = FakeClockBucket()
+        bucket.restrict(4, 2)
+        bucket.restrict(None, 1)
+        self.assertEqual((bucket.rate, bucket.burst), (4, 2))
+        bucket.restrict(10, 1)
+        self.assertEqual((bucket.rate, bucket.burst), (4, 1))
+
+    def test_fifo(self):
+        bucket = FakeClockBucket(rate=10, burst=1)
+        delays = []
+
+        def run():
+            delays.append(bucket.reserve())
+
+        threads = [Thread(target=run) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # each caller gets its own slot, none is skipped
+        self.assertEqual(sorted(round(delay, 3) for delay in delays), [i / 10. for i in range(10)])
+
+
+class RateLimiterTest(TestCase):
+    def test_shared(self):
+        class MyBrowser(Browser):
+            RATE_LIMIT = 5
+            RATE_LIMIT_BURST = 2
+
+        b1 = MyBrowser()
+        b2 = MyBrowser()
+        bucket = b1.session.rate_limiter.bucket_for('http://ratelimit.test/foo')
+        self.assertIs(bucket, b2.session.rate_limiter.bucket_for('https://RATELIMIT.test/bar'))
+        self.assertIsNot(bucket, b1.session.rate_limiter.bucket_for('http://other.test/'))
+        self.assertIsNone(Browser().session.rate_limiter)
+
+    def test_retry_after(self):
+        class MyBrowser(Browser):
+            HONOR_RETRY_AFTER = True
+
+        browser = MyBrowser()
+        browser.session.replay_har({'log': {'entries': [
+            make_entry('GET', 'http://retry.test/', u'slow down', status=429, headers=[('Retry-After', '120')]),
+        ]}})
+        browser.session.rate_limiter.get_bucket('retry.test', None, 1).clock = lambda: 0.
+        self.assertRaises(ClientError, browser.location, 'http://retry.test/')
+
+        bucket = browser.session.rate_limiter.bucket_for('http://retry.test/')
+        self.assertEqual(bucket.reserve(), 120)
+        self.assertEqual(RateLimiter(max_retry_after=5).max_retry_after, 5)
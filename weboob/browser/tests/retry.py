@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from unittest import TestCase
+
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from weboob.browser import Browser
+from weboob.browser.exceptions import ClientError, ServerError
+from weboob.browser.har import HARReplayError
+from weboob.browser.exceptions import LoggedOut
+from weboob.browser.retry import RetryLoginBrowser, login_method, retry_on_logout
+from weboob.browser.retry_policy import RetryPolicy
+
+
+class FlakyAdapter(BaseAdapter):
+    """Fail with the given errors (status codes or exceptions), then succeed."""
+
+    def __init__(self, errors, headers=None):
+        super(FlakyAdapter, self).__init__()
+        self.errors = list(errors)
+        self.headers = headers or {}
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        error = self.errors.pop(0) if self.errors else 200
+        if isinstance(error, Exception):
+            raise error
+
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.status_code = error
+        response.headers = CaseInsensitiveDict(self.headers if error != 200 else {})
+        response._content = b'ok'
+        return response
+
+    def close(self):
+        pass
+
+
+class RetryPolicyTest(TestCase):
+    def get_browser(self, errors, headers=None, **kwargs):
+        policy = RetryPolicy(**kwargs)
+        policy.delays = []
+        policy.sleep = policy.delays.append
+
+        class MyBrowser(Browser):
+            RETRY_POLICY = policy
+
+        browser = MyBrowser()
+        browser.adapter = FlakyAdapter(errors, headers)
+        browser.session.mount('http://', browser.adapter)
+        return browser
+
+    def test_adapter_retries(self):
+        # retries of the adapter would be multiplied by the ones of the policy
+        browser = self.get_browser([])
+        self.assertEqual(browser.session.get_adapter('https://retry.test/').max_retries.total, 0)
+
+        class NoPolicyBrowser(Browser):
+            RETRY_POLICY = None
+
+        browser = NoPolicyBrowser()
+        self.assertEqual(browser.session.get_adapter('https://retry.test/').max_retries.total, browser.MAX_RETRIES)
+
+    def test_retry(self):
+        browser = self.get_browser([503, ConnectionError('reset')], jitter=False)
+        self.assertEqual(browser.open('http://retry.test/').text, u'ok')
+        self.assertEqual(len(browser.adapter.requests), 3)
+        self.assertEqual(browser.RETRY_POLICY.delays, [.5, 1])
+
+        stats = browser.session.retry_stats
+        self.assertEqual((stats.requests, stats.retries, stats.delay), (1, 2, 1.5))
+
+    def test_give_up(self):
+        browser = self.get_browser([503] * 3)
+        self.assertRaises(ServerError, browser.open, 'http://retry.test/')
+        self.assertEqual(len(browser.adapter.requests), 3)
+
+        browser = self.get_browser([503], max_retries=0)
+        self.assertRaises(ServerError, browser.open, 'http://retry.test/')
+
+        browser = self.get_browser([HARReplayError('not recorded')])
+        self.assertRaises(HARReplayError, browser.open, 'http://retry.test/')
+
+    def test_idempotent(self):
+        browser = self.get_browser([503, ConnectionError('reset')])
+        self.assertRaises(ServerError, browser.open, 'http://retry.test/', data={'a': 1})
+        self.assertRaises(ConnectionError, browser.open, 'http://retry.test/', data={'a': 1})
+        self.assertEqual(len(browser.adapter.requests), 2)
+
+    def test_retry_after(self):
+        browser = self.get_browser([429], headers={'Retry-After': '5'})
+        self.assertEqual(browser.open('http://retry.test/').text, u'ok')
+        self.assertEqual(browser.RETRY_POLICY.delays, [5])
+
+        browser = self.get_browser([429], headers={'Retry-After': '3600'})
+        self.assertRaises(ClientError, browser.open, 'http://retry.test/')
+        self.assertEqual(browser.RETRY_POLICY.delays, [])
+
+    def test_budget(self):
+        browser = self.get_browser([503] * 10, budget_min=2, budget_ratio=.5, max_retries=10)
+        self.assertRaises(ServerError, browser.open, 'http://retry.test/')
+        # 2 retries, plus half a retry for the only request
+        self.assertEqual(len(browser.adapter.requests), 4)
+        self.assertEqual(browser.session.retry_stats.denied, 1)
+
+        browser.adapter.errors = [503] * 10
+        self.assertRaises(ServerError, browser.open, 'http://retry.test/')
+        self.assertEqual(len(browser.adapter.requests), 5)
+        self.assertEqual(browser.session.retry_stats.denied, 2)
+
+
+class RetryOnLogoutTest(TestCase):
+    def test_retry_on_logout(self):
+        class MyBrowser(RetryLoginBrowser):
+            calls = 0
+
+            @login_method
+            def do_login(self):
+                pass
+
+            @retry_on_logout()
+            def iter_things(self):
+                self.calls += 1
+                yield 1
+                if self.calls == 1:
+                    raise LoggedOut()
+                yield 2
+
+        browser = MyBrowser('login', 'password')
+        self.assertEqual(list(browser.iter_things()), [1, 2])
+        self.assertEqual(browser.calls, 2)
@@ -19,7 +19,7 @@ from unittest import TestCase
 
 from weboob.browser import PagesBrowser, URL
 from weboob.browser.pages import Page
-from weboob.browser.url import UrlNotResolvable
+from weboob.browser.url import UrlNotResolvable, literal_prefix
 
 
 class MyMockBrowserWithoutBrowser(object):
@@ -135,3 +135,64 @@ class URLTest(TestCase):
         self.assertRaisesRegexp(AssertionError, "You can use this method" +
                                 " only if there is a Page class handler.",
                                 self.myBrowser.urlRegex.is_here, id=2)
+
+
+class MyRoutedBrowser(PagesBrowser):
+    BASEURL = "http://weboob.org/"
+
+    list = URL(r"items\?page=(?P<page>\d+)", MyMockPage)
+    item = URL(r"items/(?P<id>\d+)", MyMockPage)
+    other = URL(r"http://other\.org/", MyMockPage)
+    anything = URL(r"(?P<path>.*)", MyMockPage)
+    nopage = URL(r"items/nopage")
+
+
+# Class that tests the index used to find URL objects matching a response
+class URLRouterTest(TestCase):
+    def test_literal_prefix(self):
+        self.assertEqual(literal_prefix(r"http://weboob\.org/items\?page=\d+"), "http://weboob.org/items?page=")
+        self.assertEqual(literal_prefix(r"http://weboob\.org/(a|b)"), "http://weboob.org/")
+        self.assertEqual(literal_prefix(r"https?://weboob\.org/"), "http")
+        self.assertEqual(literal_prefix(r"(?i)http://weboob\.org/"), "")
+        self.assertEqual(literal_prefix(r"http://weboob\.org/[a|b]"), "http://weboob.org/")
+
+    def test_candidates(self):
+        browser = MyRoutedBrowser()
+        router = browser.get_router()
+        self.assertIs(router, MyRoutedBrowser().get_router())
+        self.assertEqual(router.candidates("http://weboob.org/items/1"), [1, 3])
+        self.assertEqual(router.candidates("http://weboob.org/items?page=1"), [0, 3])
+        self.assertEqual(router.candidates("http://other.org/"), [2])
+
+        browser.item.urls.insert(0, r"http://other\.org/items")
+        self.assertIsNot(browser.get_router(), router)
+        self.assertEqual(browser.get_router().candidates("http://other.org/items"), [1, 2])
+
+        browser.BASEURL = "http://weboob.com/"
+        self.assertEqual(browser.get_router().candidates("http://weboob.org/items/1"), [])
+        self.assertEqual(browser.get_router().candidates("http://weboob.com/items/1"), [1, 3])
+
+
+class MyChildBrowser(MyRoutedBrowser):
+    item = URL(r"item/(?P<id>\d+)", MyMockPage)
+    nopage = None
+
+
+# Class that tests how URL objects are bound to browser instances
+class URLRegistryTest(TestCase):
+    def test_registry(self):
+        self.assertEqual([name for name, _ in MyChildBrowser.get_url_registry()],
+                         ['list', 'other', 'anything', 'item'])
+        self.assertIs(MyChildBrowser.get_url_registry(), MyChildBrowser.get_url_registry())
+        self.assertEqual(list(MyChildBrowser()._urls.keys()), ['list', 'other', 'anything', 'item'])
+
+    def test_bind(self):
+        first = MyRoutedBrowser()
+        second = MyRoutedBrowser()
+        self.assertIsNot(first.item, MyRoutedBrowser.item)
+        self.assertIs(first.item.browser, first)
+        self.assertIs(first._urls['item'], first.item)
+
+        first.item.urls.insert(0, r"items/new/(?P<id>\d+)")
+        self.assertEqual(second.item.urls, [r"items/(?P<id>\d+)"])
+        self.assertEqual(MyRoutedBrowser.item.urls, [r"items/(?P<id>\d+)"])
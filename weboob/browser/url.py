@@ -17,6 +17,7 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
+from copy import copy
 from functools import wraps
 import re
 import requests
@@ -26,6 +27,151 @@ from weboob.tools.regex_helper import normalize
 from weboob.tools.misc import to_unicode
 
 
+_ABSOLUTE_URL_REGEXP = re.compile(r'^[\w\?]+://.*')
+_NAMED_SUBSTITUTION_REGEXP = re.compile(r'%\([A-z_]+\)s')
+_INLINE_FLAGS_REGEXP = re.compile(r'\(\?[aiLmsux]+\)')
+
+# Caches shared by all URL instances, as patterns are defined on browser
+# classes and there are only a few base URLs.
+_MAX_CACHE_SIZE = 10000
+_compiled_regexps = {}
+_build_templates = {}
+
+
+def _compile(regex, base):
+    key = (regex, base)
+    try:
+        return _compiled_regexps[key]
+    except KeyError:
+        pass
+
+    full_regex = regex
+    if not _ABSOLUTE_URL_REGEXP.match(regex):
+        full_regex = re.escape(base).rstrip('/') + '/' + regex.lstrip('/')
+
+    if len(_compiled_regexps) >= _MAX_CACHE_SIZE:
+        _compiled_regexps.clear()
+    compiled = _compiled_regexps[key] = re.compile(full_regex)
+    return compiled
+
+
+def _get_templates(regex):
+    try:
+        return _build_templates[regex]
+    except KeyError:
+        pass
+
+    if len(_build_templates) >= _MAX_CACHE_SIZE:
+        _build_templates.clear()
+    templates = _build_templates[regex] = normalize(regex)
+    return templates
+
+
+def literal_prefix(regex):
+    r"""
+    Get the literal string which starts every string matched by a regexp.
+
+    It is empty if it can't be found reliably.
+
+    >>> literal_prefix(r'https://weboob\.org/item/(?P<id>\d+)')
+    'https://weboob.org/item/'
+    >>> literal_prefix(r'https://weboob\.org/items?')
+    'https://weboob.org/item'
+    >>> literal_prefix(r'https://weboob\.org/a|https://weboob\.org/b')
+    ''
+    """
+    if _INLINE_FLAGS_REGEXP.search(regex):
+        return ''
+
+    # an alternative at top level is not preceded by the prefix
+    depth = 0
+    in_set = False
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c == '\\':
+            i += 1
+        elif in_set:
+            in_set = c != ']'
+        elif c == '[':
+            in_set = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return ''
+        i += 1
+
+    prefix = []
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c == '\\':
+            escaped = regex[i + 1:i + 2]
+            if not escaped or escaped.isalnum():
+                break
+            prefix.append(escaped)
+            i += 2
+        elif c in '.^$*+?{}[]()|':
+            if c in '*?{' and prefix:
+                # previous character is optional
+                prefix.pop()
+            break
+        else:
+            prefix.append(c)
+            i += 1
+
+    return ''.join(prefix)
+
+
+class URLRouter(object):
+    """
+    Index of the :class:`URL` objects of a browser, to find quickly which
+    ones may match an url.
+
+    URL objects are indexed by the literal prefix of their regexps, once
+    resolved with the base url.
+
+    :param urls: URL objects, in the order they are tried
+    :type urls: list
+    :param base: base url used to resolve relative patterns
+    :type base: str
+    """
+
+    def __init__(self, urls, base):
+        self.always = set()
+        prefixes = {}
+        for position, url in enumerate(urls):
+            for regex in url.urls:
+                try:
+                    prefix = literal_prefix(_compile(regex, base).pattern)
+                except TypeError:
+                    # relative pattern without base url, match() will fail
+                    prefix = ''
+                if prefix:
+                    prefixes.setdefault(len(prefix), {}).setdefault(prefix, set()).add(position)
+                else:
+                    self.always.add(position)
+
+        self.prefixes = sorted(prefixes.items())
+
+    def candidates(self, url):
+        """
+        Get positions of the URL objects which may match an url, in order.
+
+        :rtype: list
+        """
+        found = set(self.always)
+        for length, prefixes in self.prefixes:
+            if length > len(url):
+                break
+            positions = prefixes.get(url[:length])
+            if positions:
+                found.update(positions)
+        return sorted(found)
+
+
 class UrlNotResolvable(Exception):
     """
     Raised when trying to locate on an URL instance which url pattern is not resolvable as a real url.
@@ -54,6 +200,19 @@ class URL(object):
         self._creation_counter = URL._creation_counter
         URL._creation_counter += 1
 
+    def bind(self, browser):
+        """
+        Get a copy of this URL object for a browser instance.
+
+        Subclasses holding other mutable attributes have to copy them here.
+
+        :rtype: :class:`URL`
+        """
+        url = copy(self)
+        url.urls = list(self.urls)
+        url.browser = browser
+        return url
+
     def is_here(self, **kwargs):
         """
         Returns True if the current page of browser matches this URL.
@@ -129,7 +288,7 @@ class URL(object):
         params = kwargs.pop('params', None)
         patterns = []
         for url in self.urls:
-            patterns += normalize(url)
+            patterns += _get_templates(url)
 
         for pattern, _ in patterns:
             url = pattern
@@ -140,7 +299,7 @@ class URL(object):
                 if search in pattern:
                     url = url.replace(search, to_unicode(args.pop(key)))
             # if there are named substitutions left, ignore pattern
-            if re.search('%\([A-z_]+\)s', url):
+            if _NAMED_SUBSTITUTION_REGEXP.search(url):
                 continue
             # if not all args were used
             if len(args):
@@ -164,9 +323,7 @@ class URL(object):
             base = self.browser.BASEURL
 
         for regex in self.urls:
-            if not re.match(r'^[\w\?]+://.*', regex):
-                regex = re.escape(base).rstrip('/') + '/' + regex.lstrip('/')
-            m = re.match(regex, url)
+            m = _compile(regex, base).match(url)
             if m:
                 return m
 
@@ -19,6 +19,7 @@
 
 
 from binascii import crc32
+from datetime import datetime
 import re
 
 from weboob.capabilities.base import (
@@ -346,6 +347,13 @@ class CapBank(CapCollection):
     Capability of bank websites to see accounts and transactions.
     """
 
+    HISTORY_SORTED = False
+    """
+    True if :func:`iter_history` yields transactions from the most recent
+    to the oldest one, so :func:`iter_history_since` can stop at the first
+    older transaction, without fetching the next pages.
+    """
+
     def iter_resources(self, objs, split_path):
         """
         Iter resources.
@@ -394,6 +402,41 @@ class CapBank(CapCollection):
         """
         raise NotImplementedError()
 
+    def iter_history_since(self, account, since):
+        """
+        Iter history of transactions on a specific account, dated on or
+        after a date.
+
+        Modules can override it to only ask the website for these
+        transactions. The default implementation filters
+        :func:`iter_history`, and stops at the first older transaction if
+        :attr:`HISTORY_SORTED` is True. Transactions without date are kept.
+
+        :param account: account to get history
+        :type account: :class:`Account`
+        :param since: oldest date of transactions
+        :type since: :class:`datetime.date`
+        :rtype: iter[:class:`Transaction`]
+        :raises: :class:`AccountNotFound`
+        """
+        if isinstance(since, datetime):
+            since = since.date()
+
+        history = iter(self.iter_history(account))
+        try:
+            for tr in history:
+                if not empty(tr.date):
+                    date = tr.date.date() if isinstance(tr.date, datetime) else tr.date
+                    if date < since:
+                        if self.HISTORY_SORTED:
+                            return
+                        continue
+                yield tr
+        finally:
+            # stop pagination of the module now
+            if hasattr(history, 'close'):
+                history.close()
+
     def iter_coming(self, account):
         """
         Iter coming transactions on a specific account.
@@ -17,11 +17,12 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-from collections import OrderedDict
+from collections import OrderedDict, deque
 import warnings
 import re
 from decimal import Decimal
-from copy import deepcopy, copy
+from copy import deepcopy
+from datetime import date, time, datetime, timedelta
 import sys
 
 from weboob.tools.compat import unicode, long, with_metaclass, StrConv
@@ -256,11 +257,18 @@ class Field(object):
     """
     _creation_counter = 0
 
+    convert_is_identity = True
+    """
+    True if :func:`convert` returns values which are exactly of an accepted
+    type unchanged, so it can be skipped for them.
+    """
+
     def __init__(self, doc, *args, **kwargs):
         self.types = ()
-        self.value = kwargs.get('default', NotLoaded)
+        self.value = self.normalize(kwargs.get('default', NotLoaded))
         self.doc = doc
         self.mandatory = kwargs.get('mandatory', True)
+        self._resolved_types = None
 
         for arg in args:
             if isinstance(arg, type) or isinstance(arg, str):
@@ -277,6 +285,56 @@ class Field(object):
         """
         return value
 
+    def normalize(self, value):
+        """
+        Normalize a value which is going to be stored, after it has been
+        converted and checked.
+        """
+        return value
+
+    def get_types(self, refresh=False):
+        """
+        Get accepted types, with names of types resolved to classes.
+
+        Names are resolved the first time, and again if *refresh* is True, as
+        the named class may be defined after the field.
+
+        :rtype: tuple
+        """
+        if self._resolved_types is None or refresh:
+            actual_types = ()
+            for v in self.types:
+                if isinstance(v, str):
+                    actual_types += _find_subclasses(v)
+                else:
+                    actual_types += (v,)
+            self._resolved_types = actual_types
+            self._identity_types = frozenset(actual_types) if self.convert_is_identity else frozenset()
+        return self._resolved_types
+
+
+def _find_subclasses(name):
+    # the following is a (almost) copy/paste from
+    # https://stackoverflow.com/questions/11775460/lexical-cast-from-string-to-type
+    found = ()
+    q = deque([object])
+    while q:
+        t = q.popleft()
+        if t.__name__ == name:
+            found += (t,)
+        else:
+            try:
+                # keep looking!
+                q.extend(t.__subclasses__())
+            except TypeError:
+                # type.__subclasses__ needs an argument for
+                # whatever reason.
+                if t is type:
+                    continue
+                else:
+                    raise
+    return found
+
 
 class IntField(Field):
     """
@@ -367,6 +425,10 @@ class EnumField(Field):
         return value
 
 
+_IMMUTABLE_TYPES = (type(None), bool, int, long, float, Decimal, unicode, bytes, str, tuple, frozenset,
+                    date, time, datetime, timedelta, EmptyType, type)
+
+
 class _BaseObjectMeta(type):
     def __new__(cls, name, bases, attrs):
         fields = [(field_name, attrs.pop(field_name)) for field_name, obj in list(attrs.items()) if isinstance(obj, Field)]
@@ -379,6 +441,16 @@ class _BaseObjectMeta(type):
             new_class._fields = deepcopy(new_class._fields)
         new_class._fields.update(fields)
 
+        # Default values are computed once per class. Mutable ones are
+        # copied for every object.
+        new_class._defaults = {}
+        new_class._mutable_defaults = {}
+        for field_name, field in new_class._fields.items():
+            if isinstance(field.value, _IMMUTABLE_TYPES):
+                new_class._defaults[field_name] = field.value
+            else:
+                new_class._mutable_defaults[field_name] = field.value
+
         if new_class.__doc__ is None:
             new_class.__doc__ = ''
         for name, field in fields:
@@ -419,11 +491,26 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
     _fields = None
 
     def __init__(self, id=u'', url=NotLoaded, backend=None):
+        self._set_defaults()
         self.id = to_unicode(id) if id is not None else u''
         self.backend = backend
-        self._fields = deepcopy(self._fields)
         self.__setattr__('url', url)
 
+    def _set_defaults(self):
+        # Values of fields are stored in the instance dict.
+        d = self.__dict__
+        if d:
+            # a subclass may have set attributes before calling this constructor
+            for name, value in self._defaults.items():
+                d.setdefault(name, value)
+            for name, value in self._mutable_defaults.items():
+                if name not in d:
+                    d[name] = deepcopy(value)
+        else:
+            d.update(self._defaults)
+            for name, value in self._mutable_defaults.items():
+                d[name] = deepcopy(value)
+
     @property
     def fullid(self):
         """
@@ -447,12 +534,15 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
         return True
 
     def copy(self):
-        obj = copy(self)
-        obj._fields = copy(self._fields)
-        for k in obj._fields:
-            obj._fields[k] = copy(obj._fields[k])
+        obj = type(self).__new__(type(self))
+        obj.__dict__.update(self.__dict__)
+        if '_deleted_fields' in obj.__dict__:
+            obj.__dict__['_deleted_fields'] = set(obj.__dict__['_deleted_fields'])
         return obj
 
+    def __copy__(self):
+        return self.copy()
+
     def __deepcopy__(self, memo):
         return self.copy()
 
@@ -478,8 +568,12 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
 
         if hasattr(self, 'id') and self.id is not None:
             yield 'id', self.id
-        for name, field in self._fields.items():
-            yield name, field.value
+        d = self.__dict__
+        for name in self._fields:
+            if name in d:
+                yield name, d[name]
+            elif name not in d.get('_deleted_fields', ()):
+                yield name, getattr(self, name)
 
     def __eq__(self, obj):
         if isinstance(obj, BaseObject):
@@ -488,71 +582,62 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
             return False
 
     def __getattr__(self, name):
-        if self._fields is not None and name in self._fields:
-            return self._fields[name].value
+        # Only called when a field has no value in the instance dict, which
+        # happens when the constructor has not been called.
+        fields = type(self)._fields
+        if fields is not None and name in fields and name not in self.__dict__.get('_deleted_fields', ()):
+            return fields[name].value
         else:
             raise AttributeError("'%s' object has no attribute '%s'" % (
                 self.__class__.__name__, name))
 
     def __setattr__(self, name, value):
         try:
-            attr = (self._fields or {})[name]
+            attr = self._fields[name]
         except KeyError:
-            if name not in dir(self) and not name.startswith('_'):
+            if not name.startswith('_') and name not in self.__dict__ and not hasattr(type(self), name):
                 warnings.warn('Creating a non-field attribute %s. Please prefix it with _' % name,
                               AttributeCreationWarning, stacklevel=2)
             object.__setattr__(self, name, value)
         else:
             if not empty(value):
-                try:
-                    # Try to convert value to the wanted one.
-                    nvalue = attr.convert(value)
-                    # If the value was converted
-                    if nvalue is not value:
-                        warnings.warn('Value %s was converted from %s to %s' %
-                                      (name, type(value), type(nvalue)),
-                                      ConversionWarning, stacklevel=2)
-                    value = nvalue
-                except Exception:
-                    # error during conversion, it will probably not
-                    # match the wanted following types, so we'll
-                    # raise ValueError.
-                    pass
-            from collections import deque
-            actual_types = ()
-            for v in attr.types:
-                if isinstance(v, str):
-                    # the following is a (almost) copy/paste from
-                    # https://stackoverflow.com/questions/11775460/lexical-cast-from-string-to-type
-                    q = deque([object])
-                    while q:
-                        t = q.popleft()
-                        if t.__name__ == v:
-                            actual_types += (t,)
-                        else:
-                            try:
-                                # keep looking!
-                                q.extend(t.__subclasses__())
-                            except TypeError:
-                                # type.__subclasses__ needs an argument for
-                                # whatever reason.
-                                if t is type:
-                                    continue
-                                else:
-                                    raise
-                else:
-                    actual_types += (v,)
-
-            if not isinstance(value, actual_types) and not empty(value):
-                raise ValueError(
-                    'Value for "%s" needs to be of type %r, not %r' % (
-                        name, actual_types, type(value)))
-            attr.value = value
+                actual_types = attr.get_types()
+                if type(value) not in attr._identity_types:
+                    try:
+                        # Try to convert value to the wanted one.
+                        nvalue = attr.convert(value)
+                        # If the value was converted
+                        if nvalue is not value:
+                            warnings.warn('Value %s was converted from %s to %s' %
+                                          (name, type(value), type(nvalue)),
+                                          ConversionWarning, stacklevel=2)
+                        value = nvalue
+                    except Exception:
+                        # error during conversion, it will probably not
+                        # match the wanted following types, so we'll
+                        # raise ValueError.
+                        pass
+
+                    if not isinstance(value, actual_types):
+                        # a named type may have been defined since last resolution
+                        actual_types = attr.get_types(refresh=True)
+                        if not isinstance(value, actual_types):
+                            raise ValueError(
+                                'Value for "%s" needs to be of type %r, not %r' % (
+                                    name, actual_types, type(value)))
+
+                value = attr.normalize(value)
+
+            d = self.__dict__
+            d[name] = value
+            if '_deleted_fields' in d:
+                d['_deleted_fields'].discard(name)
 
     def __delattr__(self, name):
-        try:
-            self._fields.pop(name)
-        except KeyError:
+        if name in self._fields and name not in self.__dict__.get('_deleted_fields', ()):
+            self.__dict__.pop(name, None)
+            self.__dict__.setdefault('_deleted_fields', set()).add(name)
+        else:
             object.__delattr__(self, name)
 
     def to_dict(self):
@@ -580,13 +665,15 @@ class BaseObject(with_metaclass(_BaseObjectMeta, StrConv, object)):
         return self
 
     def __setstate__(self, state):
-        self._fields = deepcopy(self._fields)  # because yaml does not call __init__
+        self._set_defaults()  # because yaml does not call __init__
         for k in state:
             setattr(self, k, state[k])
+        for name in self.__dict__.get('_deleted_fields', ()):
+            self.__dict__.pop(name, None)
 
     if sys.version_info.major >= 3:
         def __dir__(self):
-            return list(super(BaseObject, self).__dir__()) + list(self._fields.keys())
+            return list(set(super(BaseObject, self).__dir__()) | set(self._fields))
 
 
 class Currency(object):
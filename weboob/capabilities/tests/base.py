@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+import datetime
+import pickle
+import warnings
+from unittest import TestCase
+
+from weboob.capabilities.base import (
+    BaseObject, ConversionWarning, EnumField, Enum, Field, NotLoaded, StringField,
+)
+from weboob.capabilities.date import DateField
+from weboob.tools.date import date as weboob_date
+
+
+class Color(Enum):
+    RED = 1
+    BLUE = 2
+
+
+class MyObject(BaseObject):
+    label = StringField('Label')
+    tags = Field('Tags', list, default=[])
+    date = DateField('Date')
+    color = EnumField('Color', Color, default=Color.RED)
+    other = Field('Other object', 'MyObject')
+
+
+class BaseObjectTest(TestCase):
+    def test_defaults(self):
+        a = MyObject()
+        b = MyObject()
+        self.assertIs(a.label, NotLoaded)
+        self.assertEqual(a.color, Color.RED)
+
+        a.tags.append(u'foo')
+        self.assertEqual(b.tags, [])
+        self.assertEqual(list(a.to_dict().keys()), ['id', 'url', 'label', 'tags', 'date', 'color', 'other'])
+
+    def test_conversion(self):
+        obj = MyObject()
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            obj.label = b'foo'
+        self.assertEqual(obj.label, u'foo')
+        self.assertEqual([x.category for x in w], [ConversionWarning])
+
+        obj.date = datetime.date(2020, 1, 2)
+        self.assertIs(type(obj.date), weboob_date)
+
+        obj.other = MyObject()
+        self.assertRaises(ValueError, setattr, obj, 'date', u'2020-01-02')
+
+    def test_copy(self):
+        obj = MyObject(u'1')
+        obj.label = u'foo'
+        copy = obj.copy()
+        del copy.label
+        copy.date = datetime.date(2020, 1, 2)
+
+        self.assertEqual(obj.label, u'foo')
+        self.assertIs(obj.date, NotLoaded)
+        self.assertRaises(AttributeError, getattr, copy, 'label')
+        self.assertNotIn('label', copy.to_dict())
+        self.assertIn('label', obj.to_dict())
+
+    def test_pickle(self):
+        obj = MyObject(u'1')
+        obj.label = u'foo'
+        obj.tags = [u'bar']
+        obj._private = 42
+
+        other = pickle.loads(pickle.dumps(obj))
+        self.assertEqual(other.label, u'foo')
+        self.assertEqual(other.tags, [u'bar'])
+        self.assertEqual(other._private, 42)
+        self.assertEqual(other.color, Color.RED)
+
+    def test_without_constructor(self):
+        obj = MyObject.__new__(MyObject)
+        self.assertIs(obj.label, NotLoaded)
+        obj.label = u'foo'
+        self.assertEqual(obj.label, u'foo')
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+import asyncio
+
+from weboob.core.bcall import BackendsCall, CallErrors
+
+
+__all__ = ['AsyncBackendsCall']
+
+
+try:
+    get_running_loop = asyncio.get_running_loop
+except AttributeError:
+    # python < 3.7, get_event_loop() returns the running loop in coroutines
+    get_running_loop = asyncio.get_event_loop
+
+
+class AsyncBackendsCall(BackendsCall):
+    """
+    Asyncio front-end of :class:`weboob.core.bcall.BackendsCall`.
+
+    Backends are still called on the executor threads, but results are
+    consumed from the event loop, without blocking it::
+
+        async for account in weboob.ado('iter_accounts', timeout=60):
+            ...
+
+    It is also possible to await the call to get the list of all results.
+
+    When the task consuming results is cancelled, backends are stopped.
+
+    Results are consumed from the event loop running the first iteration,
+    which can be another one than the loop running when the call is created.
+    """
+
+    def __init__(self, backends, function, *args, **kwargs):
+        self.loop = None
+        self.wakeup = None
+        self.waiting = False
+        self.finished = False
+
+        super(AsyncBackendsCall, self).__init__(backends, function, *args, **kwargs)
+
+    def _notify(self):
+        super(AsyncBackendsCall, self)._notify()
+
+        if self.waiting:
+            self.waiting = False
+            try:
+                self.loop.call_soon_threadsafe(self.wakeup.set)
+            except RuntimeError:
+                # loop is closed, nobody is listening anymore
+                pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.loop is None:
+            self.loop = get_running_loop()
+            self.wakeup = asyncio.Event()
+            self._start_consuming()
+
+        try:
+            while True:
+                with self.cond:
+                    delay = self._check_timeouts()
+
+                    if self.stop_event.is_set():
+                        break
+
+                    if self.responses:
+                        response = self.responses.popleft()
+                        self._notify()
+                        return response
+
+                    if not self.pending:
+                        break
+
+                    self.waiting = True
+                    self.wakeup.clear()
+
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            self.stop()
+            raise
+
+        if self.errors and not self.finished:
+            self.finished = True
+            raise CallErrors(self.errors)
+
+        raise StopAsyncIteration
+
+    async def results(self):
+        """
+        Wait until all backends are finished.
+
+        :returns: list of results
+        :raises: :class:`weboob.core.bcall.CallErrors`
+        """
+        results = []
+        async for result in self:
+            results.append(result)
+        return results
+
+    def __await__(self):
+        return self.results().__await__()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, t, v, tb):
+        self.stop()
@@ -32,31 +32,87 @@ except ImportError:
     from collections import MutableMapping
 from logging import warning
 from subprocess import check_output, CalledProcessError
+from threading import Lock
+import time
 
 from weboob.tools.compat import unicode
 
 
-__all__ = ['BackendsConfig', 'BackendAlreadyExists']
+__all__ = ['BackendsConfig', 'BackendAlreadyExists', 'CredentialResolver']
+
+
+_monotonic = getattr(time, 'monotonic', time.time)
 
 
 class BackendAlreadyExists(Exception):
     pass
 
 
+class CredentialResolver(object):
+    """
+    Run the commands giving values of options, such as password manager
+    lookups, and cache their output.
+
+    The output is only kept in memory, during *ttl* seconds, or for the
+    whole process if *ttl* is None. A command which fails is run again next
+    time.
+
+    :param ttl: seconds to keep the output of a command
+    :type ttl: float
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        # also prevents several threads from asking for the same secret at once
+        self.lock = Lock()
+        self.cache = {}
+
+    def resolve(self, command):
+        """
+        Get the first line of the output of a shell command.
+
+        :raises: :class:`ValueError` if the command fails
+        """
+        with self.lock:
+            if command in self.cache:
+                value, expire_at = self.cache[command]
+                if expire_at is None or _monotonic() < expire_at:
+                    return value
+
+            try:
+                value = check_output(command, shell=True)
+            except CalledProcessError as e:
+                raise ValueError(u'The call to the external tool failed: %s' % e)
+
+            value = value.decode('utf-8').partition('\n')[0].strip('\r\n\t')
+            self.cache[command] = (value, None if self.ttl is None else _monotonic() + self.ttl)
+            return value
+
+    def clear(self):
+        """
+        Forget all outputs.
+        """
+        with self.lock:
+            self.cache.clear()
+
+
 class DictWithCommands(MutableMapping):
+    resolver = CredentialResolver()
+    """
+    Resolver of commands shared by the process.
+    """
+
     def __init__(self, *args, **kwargs):
+        resolver = kwargs.pop('resolver', None)
         super(DictWithCommands, self).__init__()
         self._raw = dict(*args, **kwargs)
+        if resolver is not None:
+            self.resolver = resolver
 
     def __getitem__(self, key):
         value = self._raw[key]
         if value.startswith('`') and value.endswith('`'):
-            try:
-                value = check_output(value[1:-1], shell=True)
-            except CalledProcessError as e:
-                raise ValueError(u'The call to the external tool failed: %s' % e)
-            else:
-                value = value.decode('utf-8').partition('\n')[0].strip('\r\n\t')
+            value = self.resolver.resolve(value[1:-1])
 
         return value
 
@@ -79,13 +135,28 @@ class BackendsConfig(object):
 
     A backend is an instance of a module with a config.
     A module can thus have multiple instances.
+
+    The file is only parsed again when it has been modified.
+
+    Option values between backquotes are the output of a command, run at
+    most once per process, or once every *credentials_ttl* seconds.
+
+    :param confpath: path of the config file
+    :type confpath: str
+    :param credentials_ttl: seconds to keep the output of commands
+    :type credentials_ttl: float
     """
 
     class WrongPermissions(Exception):
         pass
 
-    def __init__(self, confpath):
+    def __init__(self, confpath, credentials_ttl=None):
         self.confpath = confpath
+        self._cache = None
+        if credentials_ttl is None:
+            self.resolver = DictWithCommands.resolver
+        else:
+            self.resolver = CredentialResolver(credentials_ttl)
         try:
             mode = os.stat(confpath).st_mode
         except OSError:
@@ -108,10 +179,29 @@ class BackendsConfig(object):
                     raise self.WrongPermissions(
                         u'Weboob will not start as long as config file %s is readable by group or other users.' % confpath)
 
-    def _read_config(self):
+    def _read_config(self, cached=True):
+        """
+        Parse the config file.
+
+        :param cached: return the parsed config of the previous call if the
+                       file has not changed. It must not be modified.
+        :type cached: bool
+        """
+        st = os.stat(self.confpath)
+        key = (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino)
+        if cached and self._cache is not None and self._cache[0] == key:
+            return self._cache[1]
+
         config = RawConfigParser()
         with codecs.open(self.confpath, 'r', encoding='utf-8') as fd:
             config.readfp(fd)
+
+        # a file modified less than a second ago may be modified again
+        # without any visible change of its mtime and size
+        if cached and time.time() - st.st_mtime > 1:
+            self._cache = (key, config)
+        else:
+            self._cache = None
         return config
 
     def _write_config(self, config):
@@ -128,6 +218,7 @@ class BackendsConfig(object):
             f = codecs.open(self.confpath, 'wb', encoding='utf-8')
         with f:
             config.write(f)
+        self._cache = None
 
     def iter_backends(self):
         """
@@ -140,12 +231,15 @@ class BackendsConfig(object):
         config = self._read_config()
         changed = False
         for backend_name in config.sections():
-            params = DictWithCommands(config.items(backend_name))
+            params = DictWithCommands(config.items(backend_name), resolver=self.resolver)
             try:
                 module_name = params.pop('_module')
             except KeyError:
                 try:
                     module_name = params.pop('_backend')
+                    if not changed:
+                        # don't modify the cached config
+                        config = self._read_config(cached=False)
                     config.set(backend_name, '_module', module_name)
                     config.remove_option(backend_name, '_backend')
                     changed = True
@@ -175,7 +269,7 @@ class BackendsConfig(object):
         """
         if not backend_name:
             raise ValueError(u'Please give a name to the configured backend.')
-        config = self._read_config()
+        config = self._read_config(cached=False)
         try:
             config.add_section(backend_name)
         except DuplicateSectionError:
@@ -194,7 +288,7 @@ class BackendsConfig(object):
         :param params: params to change
         :type params: :class:`dict`
         """
-        config = self._read_config()
+        config = self._read_config(cached=False)
         if not config.has_section(backend_name):
             raise KeyError(u'Configured backend "%s" not found' % backend_name)
 
@@ -231,8 +325,72 @@ class BackendsConfig(object):
     def remove_backend(self, backend_name):
         """Remove a backend from config."""
 
-        config = self._read_config()
+        config = self._read_config(cached=False)
         if not config.remove_section(backend_name):
             return False
         self._write_config(config)
         return True
+
+
+def test_cache():
+    import shutil
+    import tempfile
+
+    tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+    try:
+        config = BackendsConfig(os.path.join(tmpdir, 'backends'))
+        config.add_backend('a', 'mod', {'login': 'foo'})
+        assert config.backend_exists('a')
+        # recently modified, not cached
+        assert config._read_config() is not config._read_config()
+
+        os.utime(config.confpath, (time.time() - 10, time.time() - 10))
+        parsed = config._read_config()
+        assert config._read_config() is parsed
+        assert config.get_backend('a') == ('mod', {'login': 'foo'})
+
+        config.add_backend('b', 'mod', {})
+        assert config._read_config() is not parsed
+        assert [name for name, _, _ in config.iter_backends()] == ['a', 'b']
+
+        # modified by another process
+        other = BackendsConfig(config.confpath)
+        other.edit_backend('a', {'login': 'bar'})
+        assert config.get_backend('a') == ('mod', {'login': 'bar'})
+        other.remove_backend('b')
+        assert not config.backend_exists('b')
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_credentials():
+    import shutil
+    import tempfile
+
+    tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+    try:
+        counter = os.path.join(tmpdir, 'counter')
+        command = 'echo x >> %s; grep -c x %s' % (counter, counter)
+
+        resolver = CredentialResolver()
+        params = DictWithCommands({'password': '`%s`' % command}, resolver=resolver)
+        assert params['password'] == '1'
+        assert params['password'] == '1'
+        assert DictWithCommands({'password': '`%s`' % command}, resolver=resolver)['password'] == '1'
+        resolver.clear()
+        assert params['password'] == '2'
+
+        resolver = CredentialResolver(ttl=0)
+        params = DictWithCommands({'password': '`%s`' % command}, resolver=resolver)
+        assert params['password'] == '3'
+        assert params['password'] == '4'
+
+        try:
+            resolver.resolve('exit 1')
+        except ValueError:
+            pass
+        else:
+            assert False, 'ValueError not raised'
+        assert 'exit 1' not in resolver.cache
+    finally:
+        shutil.rmtree(tmpdir)
@@ -18,20 +18,19 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+from collections import deque
 from copy import copy
-from threading import Thread, Event
-try:
-    import Queue
-except ImportError:
-    import queue as Queue
+from threading import Condition, Event, Thread
+from time import monotonic, time
 
 from weboob.capabilities.base import BaseObject
+from weboob.core.executor import ThreadExecutor
 from weboob.tools.compat import basestring
 from weboob.tools.misc import get_backtrace
 from weboob.tools.log import getLogger
 
 
-__all__ = ['BackendsCall', 'CallErrors']
+__all__ = ['BackendsCall', 'CallErrors', 'BackendTimeout']
 
 
 class CallErrors(Exception):
@@ -47,45 +46,157 @@ class CallErrors(Exception):
         return self.errors.__iter__()
 
 
+class BackendTimeout(Exception):
+    """
+    Raised (in a :class:`CallErrors`) when a backend has been abandoned
+    because it took too long to answer.
+    """
+
+
 class BackendsCall(object):
+    RESULTS_QUEUE_SIZE = 100
+    """
+    Maximum number of results waiting to be consumed, once a consumer
+    iterates on them. When it is reached, backends are paused until the
+    consumer catches up. 0 means no limit.
+    """
+
     def __init__(self, backends, function, *args, **kwargs):
         """
         :param backends: List of backends to call
         :type backends: list[:class:`Module`]
         :param function: backends' method name, or callable object.
         :type function: :class:`str` or :class:`callable`
+        :param executor: executor on which backends are called; default is
+                         to start a thread per backend
+        :type executor: :class:`weboob.core.executor.IExecutor`
+        :param timeout: maximum time, in seconds, given to each backend
+        :type timeout: float
+        :param deadline: timestamp after which every backend still queued or
+                         running is abandoned
+        :type deadline: float
         """
+        self.executor = executor = kwargs.pop('executor', None) or ThreadExecutor()
+        self.timeout = kwargs.pop('timeout', None)
+        deadline = kwargs.pop('deadline', None)
+        if deadline is not None:
+            # use a monotonic clock internally
+            deadline = monotonic() + deadline - time()
+        self.deadline = deadline
+
         self.logger = getLogger('bcall')
 
-        self.responses = Queue.Queue()
+        self.responses = deque()
         self.errors = []
-        self.tasks = Queue.Queue()
         self.stop_event = Event()
-        self.threads = []
+        # backends are only paused while someone consumes results, see
+        # _start_consuming
+        self.maxsize = 0
+        self.cond = Condition()
+        self.pending = len(backends)
+        self.queued = set(backends)
+        # backend -> time when it has been started
+        self.running = {}
 
         for backend in backends:
-            t = Thread(target=self.backend_process, args=(function, args, kwargs))
-            t.start()
-            self.threads.append(t)
-            self.tasks.put(backend)
+            executor.submit(self.backend_process, backend, function, args, kwargs)
+
+    def _notify(self):
+        """
+        Wake up everyone waiting on the call state. Must be called with the
+        condition held.
+        """
+        self.cond.notify_all()
 
     def store_result(self, backend, result):
-        """Store the result when a backend task finished."""
+        """
+        Store the result when a backend task finished.
+
+        :returns: False if the backend has to stop
+        :rtype: bool
+        """
         if result is None:
-            return
+            return True
 
         if isinstance(result, BaseObject):
             result.backend = backend.name
-        self.responses.put(result)
 
-    def backend_process(self, function, args, kwargs):
+        with self.cond:
+            if self._is_full(backend):
+                # let the executor start other tasks, which the consumer may
+                # be waiting for
+                with self.executor.blocking():
+                    while self._is_full(backend):
+                        self.cond.wait()
+
+            if self.stop_event.is_set() or backend not in self.running:
+                return False
+
+            self.responses.append(result)
+            self._notify()
+            return True
+
+    def _is_full(self, backend):
+        return self.maxsize and len(self.responses) >= self.maxsize and \
+            not self.stop_event.is_set() and backend in self.running
+
+    def _start_consuming(self):
+        """
+        Pause backends when too many results are waiting. This is only done
+        once results are consumed, otherwise backends of calls whose results
+        are never read would stay blocked.
+        """
+        with self.cond:
+            self.maxsize = self.RESULTS_QUEUE_SIZE
+
+    def store_error(self, backend, error):
+        """Store an error raised by a backend."""
+        with self.cond:
+            if backend in self.running:
+                self.errors.append((backend, error, get_backtrace(error)))
+
+    def abandon(self, backend, error):
+        """
+        Stop waiting for a backend. If it is not started yet, it will never
+        be. Otherwise, its next results and errors are ignored, and it is
+        stopped as soon as it yields a result.
+
+        :param error: error to report for this backend
+        :type error: :class:`Exception`
+        """
+        with self.cond:
+            if backend in self.queued:
+                self.queued.remove(backend)
+            elif self.running.pop(backend, None) is None:
+                return
+
+            self.logger.debug('%s: Abandoned: %r', backend, error)
+            self.errors.append((backend, error, None))
+            self.pending -= 1
+            self._notify()
+
+    def backend_process(self, backend, function, args, kwargs):
         """
         Internal method to run a method of a backend.
 
-        As this method may be blocking, it should be run on its own thread.
+        As this method may be blocking, it should be run by an executor.
         """
-        backend = self.tasks.get()
-        with backend:
+        with self.cond:
+            if backend not in self.queued:
+                # abandoned before being started
+                return
+
+            self.queued.remove(backend)
+            if self.stop_event.is_set():
+                self.pending -= 1
+                self._notify()
+                return
+
+            self.running[backend] = monotonic()
+            self._notify()
+
+        # results memoized by the backend are shared during the whole call
+        with backend, backend.sync_scope(call=True):
             try:
                 # Call method on backend
                 try:
@@ -96,7 +207,7 @@ class BackendsCall(object):
                         result = getattr(backend, function)(*args, **kwargs)
                 except Exception as error:
                     self.logger.debug('%s: Called function %s raised an error: %r', backend, function, error)
-                    self.errors.append((backend, error, get_backtrace(error)))
+                    self.store_error(backend, error)
                 else:
                     self.logger.debug('%s: Called function %s returned: %r', backend, function, result)
 
@@ -104,25 +215,78 @@ class BackendsCall(object):
                         # Loop on iterator
                         try:
                             for subresult in result:
-                                self.store_result(backend, subresult)
-                                if self.stop_event.is_set():
+                                if not self.store_result(backend, subresult):
                                     break
                         except Exception as error:
-                            self.errors.append((backend, error, get_backtrace(error)))
+                            self.store_error(backend, error)
                     else:
                         self.store_result(backend, result)
             finally:
-                self.tasks.task_done()
+                with self.cond:
+                    if self.running.pop(backend, None) is not None:
+                        self.pending -= 1
+                        self._notify()
+
+    def _check_timeouts(self):
+        """
+        Abandon backends which missed the deadline or which have been running
+        for too long. Must be called with the condition held.
+
+        :returns: delay before the next backend expires, or None
+        """
+        if self.timeout is None and self.deadline is None:
+            return None
+
+        now = monotonic()
+        delay = None
+
+        if self.deadline is not None:
+            delay = self.deadline - now
+            if delay <= 0:
+                for backend in list(self.queued) + list(self.running):
+                    self.abandon(backend, BackendTimeout('Call deadline exceeded'))
+                return None
+
+        if self.timeout is not None:
+            for backend, started in list(self.running.items()):
+                remaining = started + self.timeout - now
+                if remaining <= 0:
+                    self.abandon(backend, BackendTimeout('No answer after %s seconds' % self.timeout))
+                elif delay is None or remaining < delay:
+                    delay = remaining
+
+        return delay
+
+    def _get_response(self):
+        """
+        Wait for the next result.
+
+        :returns: the result, or None when every backend is finished or when
+                  the call is stopped.
+        """
+        with self.cond:
+            while True:
+                delay = self._check_timeouts()
+                if self.stop_event.is_set() or not self.pending or self.responses:
+                    break
+                self.cond.wait(delay)
+
+            if self.stop_event.is_set() or not self.responses:
+                return None
+
+            response = self.responses.popleft()
+            self._notify()
+            return response
 
     def _callback_thread_run(self, callback, errback, finishback):
-        while not self.stop_event.is_set() and (self.tasks.unfinished_tasks or not self.responses.empty()):
-            try:
-                response = self.responses.get(timeout=0.1)
-            except Queue.Empty:
-                continue
-            else:
-                if callback:
-                    callback(response)
+        self._start_consuming()
+        while True:
+            response = self._get_response()
+            if response is None:
+                break
+
+            if callback:
+                callback(response)
 
         # Raise errors
         while errback and self.errors:
@@ -151,8 +315,17 @@ class BackendsCall(object):
 
     def wait(self):
         """Wait until all tasks are finished."""
-        for thread in self.threads:
-            thread.join()
+        with self.cond:
+            # Results are not consumed while waiting, so backends must not be
+            # paused.
+            self.maxsize = 0
+            self._notify()
+
+            while True:
+                delay = self._check_timeouts()
+                if not self.pending:
+                    break
+                self.cond.wait(delay)
 
         if self.errors:
             raise CallErrors(self.errors)
@@ -166,17 +339,21 @@ class BackendsCall(object):
         """
 
         self.stop_event.set()
+        with self.cond:
+            self._notify()
 
         if wait:
             self.wait()
 
     def __iter__(self):
+        self._start_consuming()
         try:
-            while not self.stop_event.is_set() and (self.tasks.unfinished_tasks or not self.responses.empty()):
-                try:
-                    yield self.responses.get(timeout=0.1)
-                except Queue.Empty:
-                    continue
+            while True:
+                response = self._get_response()
+                if response is None:
+                    break
+
+                yield response
         except:
             self.stop()
             raise
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 Romain Bignon
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from threading import Condition, Thread, Lock, current_thread
+
+
+__all__ = ['IExecutor', 'ThreadExecutor', 'WorkerPool']
+
+
+class IExecutor(object):
+    """Interface of an executor, used to run backend calls."""
+
+    def submit(self, function, *args):
+        """
+        Run a function asynchronously.
+
+        :param function: function to call
+        :type function: callable
+        :param args: arguments to give to function
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        raise NotImplementedError()
+
+    @contextmanager
+    def blocking(self):
+        """
+        Context manager around a wait of a running task for something which
+        may need other tasks to run, like a consumer of its results.
+        """
+        yield
+
+    def shutdown(self, wait=True):
+        """
+        Stop the executor. No task can be submitted afterwards.
+
+        :param wait: if True, wait until running tasks are finished
+        :type wait: bool
+        """
+        raise NotImplementedError()
+
+
+def _run_task(future, function, args):
+    if not future.set_running_or_notify_cancel():
+        return
+
+    try:
+        result = function(*args)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+
+
+class ThreadExecutor(IExecutor):
+    """Executor starting a new thread for every task."""
+
+    def submit(self, function, *args):
+        future = Future()
+        Thread(target=_run_task, args=(future, function, args)).start()
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class WorkerPool(IExecutor):
+    """
+    Executor running tasks on a bounded pool of long-lived threads.
+
+    Workers are started lazily, when a task is submitted and no worker is
+    idle, until *max_workers* threads are running. Next tasks are queued,
+    and run by the first workers to finish their tasks.
+
+    A task submitted from a worker of the pool (for example a backend calling
+    :func:`weboob.core.ouiboube.WebNip.do`) is run on its own thread, as the
+    worker would otherwise wait for a slot it occupies itself.
+
+    Likewise, workers waiting in :meth:`blocking` (for example a backend
+    waiting for its results to be consumed) don't count in *max_workers*,
+    so queued tasks are still started.
+
+    :param max_workers: maximum number of threads
+    :type max_workers: int
+    """
+
+    DEFAULT_MAX_WORKERS = 32
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or self.DEFAULT_MAX_WORKERS
+        self.tasks = deque()
+        self.mutex = Lock()
+        self.cond = Condition(self.mutex)
+        self.workers = set()
+        # workers waiting for a task
+        self.idle = 0
+        self.blocked = 0
+        self.stopped = False
+
+    def submit(self, function, *args):
+        with self.mutex:
+            if self.stopped:
+                raise RuntimeError('Unable to submit a task to a stopped pool')
+
+            if current_thread() in self.workers:
+                return ThreadExecutor().submit(function, *args)
+
+            future = Future()
+            self.tasks.append((future, function, args))
+            self._start_workers()
+            self.cond.notify()
+
+            return future
+
+    def _start_workers(self):
+        """
+        Start workers for the queued tasks which no idle worker will take,
+        while the limit is not reached. Must be called with the mutex held.
+        """
+        while len(self.tasks) > self.idle and len(self.workers) - self.blocked < self.max_workers:
+            worker = Thread(target=self._worker_run, name='weboob-worker-%d' % len(self.workers))
+            worker.daemon = True
+            self.workers.add(worker)
+            # counted as idle until it takes its first task
+            self.idle += 1
+            worker.start()
+
+    @contextmanager
+    def blocking(self):
+        if current_thread() not in self.workers:
+            yield
+            return
+
+        with self.mutex:
+            self.blocked += 1
+            if not self.stopped:
+                self._start_workers()
+        try:
+            yield
+        finally:
+            with self.mutex:
+                self.blocked -= 1
+
+    def _worker_run(self):
+        worker = current_thread()
+        while True:
+            with self.mutex:
+                while not self.tasks and not self.stopped:
+                    self.cond.wait()
+                self.idle -= 1
+                if not self.tasks:
+                    self.workers.discard(worker)
+                    return
+                task = self.tasks.popleft()
+
+            _run_task(*task)
+            del task
+
+            with self.mutex:
+                # workers started while others were blocked are not needed
+                # anymore
+                if len(self.workers) - self.blocked > self.max_workers:
+                    self.workers.discard(worker)
+                    return
+                self.idle += 1
+
+    def shutdown(self, wait=True):
+        with self.mutex:
+            if self.stopped:
+                return
+            self.stopped = True
+            workers = list(self.workers)
+            self.cond.notify_all()
+
+        if wait:
+            for worker in workers:
+                if worker is not current_thread():
+                    worker.join()
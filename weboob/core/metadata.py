@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+import ast
+import importlib
+import os
+
+from weboob.tools.backend import AbstractModule, BackendConfig, Module
+
+
+__all__ = ['MetadataError', 'ModuleMetadata', 'read_module_metadata']
+
+
+class MetadataError(Exception):
+    """
+    Raised when metadata of a module can't be read without importing it.
+    """
+
+
+# attributes read from the module class, with their default values
+ATTRIBUTES = ('NAME', 'MAINTAINER', 'EMAIL', 'VERSION', 'DESCRIPTION', 'LICENSE', 'ICON')
+
+# packages from which classes can be used by a module class
+TRUSTED_PACKAGES = ('weboob.capabilities', 'weboob.tools.backend', 'weboob.tools.value')
+
+
+class ModuleMetadata(object):
+    """
+    Metadata of a module read from its sources.
+
+    :param path: directory containing the module package
+    :type path: str
+    :param package_name: name of the module package
+    :type package_name: str
+    """
+
+    def __init__(self, path, package_name):
+        self.path = path
+        self.package_name = package_name
+        self.class_name = None
+        self.attributes = {}
+
+        self.stub = None
+        """
+        Class with the same bases as the module class, to find its
+        capabilities.
+        """
+
+        self.config = None
+        """
+        :class:`weboob.tools.backend.BackendConfig` of the module, or None if
+        it can't be built statically.
+        """
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['attributes'][name.upper()]
+        except KeyError:
+            raise AttributeError(name)
+
+    def iter_caps(self):
+        return self.stub.iter_caps()
+
+
+class _Imports(object):
+    """
+    Names imported by a source file.
+    """
+
+    def __init__(self, tree):
+        self.names = {}
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom):
+                for alias in node.names:
+                    self.names[alias.asname or alias.name] = (node.level, node.module, alias.name)
+
+    def resolve(self, node):
+        """
+        Get the object referenced by a name node, if it comes from a trusted
+        package.
+        """
+        if not isinstance(node, ast.Name) or node.id not in self.names:
+            raise MetadataError('unable to resolve %s' % ast.dump(node))
+
+        level, module, name = self.names[node.id]
+        if level or not module or not module.startswith(TRUSTED_PACKAGES):
+            raise MetadataError('%s is imported from %s' % (name, module))
+
+        return getattr(importlib.import_module(module), name)
+
+
+def _parse(filename):
+    with open(filename, 'rb') as f:
+        return ast.parse(f.read(), filename)
+
+
+def _find_module_class(path, package_name):
+    """
+    Find the class of a module, imported in the __init__.py of its package.
+
+    :returns: source tree of the file defining it, and its definition
+    """
+    package_dir = os.path.join(path, package_name)
+    candidates = []
+    for node in _parse(os.path.join(package_dir, '__init__.py')).body:
+        if isinstance(node, ast.ImportFrom) and node.level == 1 and node.module:
+            filename = os.path.join(package_dir, *node.module.split('.'))
+            if os.path.isdir(filename):
+                filename = os.path.join(filename, '__init__.py')
+            else:
+                filename += '.py'
+            names = set(alias.name for alias in node.names)
+
+            tree = _parse(filename)
+            for classdef in tree.body:
+                if isinstance(classdef, ast.ClassDef) and classdef.name in names:
+                    candidates.append((tree, classdef))
+        elif isinstance(node, ast.ClassDef):
+            raise MetadataError('classes defined in __init__.py')
+
+    modules = []
+    for tree, classdef in candidates:
+        imports = _Imports(tree)
+        bases = [imports.resolve(base) for base in classdef.bases]
+        if any(isinstance(base, type) and issubclass(base, Module) for base in bases):
+            modules.append((tree, classdef, bases))
+
+    if len(modules) != 1:
+        raise MetadataError('found %d module classes' % len(modules))
+    return modules[0]
+
+
+def _build_config(imports, node):
+    if not isinstance(node, ast.Call) or imports.resolve(node.func) is not BackendConfig:
+        raise MetadataError('CONFIG is not a BackendConfig')
+
+    values = []
+    for call in node.args:
+        if not isinstance(call, ast.Call) or getattr(call, 'starargs', None) or getattr(call, 'kwargs', None):
+            raise MetadataError('value is not a simple call')
+        klass = imports.resolve(call.func)
+        try:
+            args = [ast.literal_eval(arg) for arg in call.args]
+            kwargs = dict((kw.arg, ast.literal_eval(kw.value)) for kw in call.keywords)
+        except ValueError as e:
+            raise MetadataError('non literal argument of value: %s' % e)
+        if None in kwargs:
+            raise MetadataError('value is not a simple call')
+        values.append(klass(*args, **kwargs))
+    return BackendConfig(*values)
+
+
+def read_module_metadata(path, package_name):
+    """
+    Read metadata of a module without importing it, by looking at the
+    abstract syntax tree of its sources.
+
+    This only works for the usual layout: the module class is imported in
+    __init__.py, all its bases are imported from :mod:`weboob.capabilities`
+    or :mod:`weboob.tools.backend`, and its attributes are literals.
+    Capabilities are found by importing the :mod:`weboob.capabilities`
+    modules, which are light.
+
+    :param path: directory containing the module package
+    :type path: str
+    :param package_name: name of the module package
+    :type package_name: str
+    :rtype: :class:`ModuleMetadata`
+    :raises: :class:`MetadataError` if it can't be done
+    """
+    try:
+        tree, classdef, bases = _find_module_class(path, package_name)
+    except (IOError, OSError, SyntaxError, ImportError, AttributeError) as e:
+        raise MetadataError(e)
+
+    metadata = ModuleMetadata(path, package_name)
+    metadata.class_name = classdef.name
+    metadata.stub = type(str(classdef.name), tuple(bases), {})
+    for attr in ATTRIBUTES:
+        metadata.attributes[attr] = getattr(metadata.stub, attr)
+
+    imports = _Imports(tree)
+    config_node = None
+    static_config = True
+    for node in classdef.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
+            continue
+        attr = node.targets[0].id
+        if attr in ATTRIBUTES:
+            try:
+                metadata.attributes[attr] = ast.literal_eval(node.value)
+            except ValueError:
+                raise MetadataError('%s is not a literal' % attr)
+        elif attr == 'CONFIG':
+            config_node = node.value
+        elif attr == 'ADDITIONAL_CONFIG':
+            static_config = False
+
+    # the config of abstract modules depends on their parent
+    if static_config and not issubclass(metadata.stub, AbstractModule):
+        try:
+            metadata.config = BackendConfig() if config_node is None else _build_config(imports, config_node)
+        except (MetadataError, ImportError, AttributeError, TypeError):
+            metadata.config = None
+
+    return metadata
@@ -20,26 +20,51 @@
 import os
 import imp
 import logging
+from threading import RLock
 
+from weboob.core.metadata import MetadataError, read_module_metadata
 from weboob.tools.backend import Module, BackendConfig
 from weboob.tools.compat import basestring
 from weboob.tools.log import getLogger
 from weboob.exceptions import ModuleLoadError
 
-__all__ = ['LoadedModule', 'ModulesLoader', 'RepositoryModulesLoader']
+__all__ = ['LoadedModule', 'LazyLoadedModule', 'ModulesLoader', 'RepositoryModulesLoader', 'import_module_package',
+           'open_module']
+
+
+def import_module_package(module_name, path):
+    """
+    Import the package of a module.
+
+    :param module_name: name of the module
+    :type module_name: str
+    :param path: directory containing the module package
+    :type path: str
+    """
+    fp, pathname, description = imp.find_module(module_name, [path])
+    try:
+        return imp.load_module(module_name, fp, pathname, description)
+    finally:
+        if fp:
+            fp.close()
+
+
+def find_module_class(package):
+    klass = None
+    for attrname in dir(package):
+        attr = getattr(package, attrname)
+        if isinstance(attr, type) and issubclass(attr, Module) and attr != Module:
+            klass = attr
+    if not klass:
+        raise ImportError('%s is not a backend (no Module class found)' % package)
+    return klass
 
 
 class LoadedModule(object):
     def __init__(self, package):
         self.logger = getLogger('backend')
         self.package = package
-        self.klass = None
-        for attrname in dir(self.package):
-            attr = getattr(self.package, attrname)
-            if isinstance(attr, type) and issubclass(attr, Module) and attr != Module:
-                self.klass = attr
-        if not self.klass:
-            raise ImportError('%s is not a backend (no Module class found)' % package)
+        self.klass = find_module_class(package)
 
     @property
     def name(self):
@@ -98,6 +123,123 @@ class LoadedModule(object):
         return backend_instance
 
 
+class LazyLoadedModule(LoadedModule):
+    """
+    Module whose metadata are read from its sources, see
+    :func:`weboob.core.metadata.read_module_metadata`.
+
+    The package is only imported when the module class is needed, for
+    example to create a backend, so listing modules, their capabilities or
+    their configuration does not import them and their dependencies.
+
+    :param metadata: metadata of the module
+    :type metadata: :class:`weboob.core.metadata.ModuleMetadata`
+    """
+
+    def __init__(self, metadata):
+        self.logger = getLogger('backend')
+        self.metadata = metadata
+        self.lock = RLock()
+        self._package = None
+        self._klass = None
+
+    def load(self):
+        """
+        Import the module package.
+
+        :raises: :class:`weboob.exceptions.ModuleLoadError`
+        """
+        with self.lock:
+            if self._klass is not None:
+                return
+
+            module_name = self.metadata.package_name
+            try:
+                package = import_module_package(module_name, self.metadata.path)
+                klass = find_module_class(package)
+            except Exception as e:
+                if logging.root.level <= logging.DEBUG:
+                    self.logger.exception(e)
+                raise ModuleLoadError(module_name, e)
+
+            self._package, self._klass = package, klass
+            self.logger.debug('Imported module "%s" from %s' % (module_name, self.metadata.path))
+
+    @property
+    def loaded(self):
+        return self._klass is not None
+
+    @property
+    def package(self):
+        self.load()
+        return self._package
+
+    @property
+    def klass(self):
+        self.load()
+        return self._klass
+
+    @property
+    def name(self):
+        return self.metadata.name
+
+    @property
+    def maintainer(self):
+        return u'%s <%s>' % (self.metadata.maintainer, self.metadata.email)
+
+    @property
+    def version(self):
+        return self.metadata.version
+
+    @property
+    def description(self):
+        return self.metadata.description
+
+    @property
+    def license(self):
+        return self.metadata.license
+
+    @property
+    def config(self):
+        if self.metadata.config is None:
+            return super(LazyLoadedModule, self).config
+        return self.metadata.config
+
+    @property
+    def icon(self):
+        return self.metadata.icon
+
+    def iter_caps(self):
+        return self.metadata.iter_caps()
+
+    def has_caps(self, *caps):
+        """Return True if module implements at least one of the caps."""
+        for c in caps:
+            if (isinstance(c, basestring) and c in [cap.__name__ for cap in self.iter_caps()]) or \
+               (isinstance(c, type) and issubclass(self.metadata.stub, c)):
+                return True
+        return False
+
+
+def open_module(module_name, path, logger=None):
+    """
+    Get a module, without importing it if its metadata can be read from its
+    sources.
+
+    :param module_name: name of the module
+    :type module_name: str
+    :param path: directory containing the module package
+    :type path: str
+    :rtype: :class:`LoadedModule`
+    """
+    try:
+        return LazyLoadedModule(read_module_metadata(path, module_name))
+    except MetadataError as e:
+        if logger is not None:
+            logger.debug('Importing module "%s" to read its metadata: %s' % (module_name, e))
+        return LoadedModule(import_module_package(module_name, path))
+
+
 class ModulesLoader(object):
     """
     Load modules.
@@ -140,19 +282,19 @@ class ModulesLoader(object):
                 self.logger.warning('could not load module %s: %s', existing_module_name, e)
 
     def load_module(self, module_name):
+        """
+        Load a module, reading its metadata from its sources when possible,
+        in which case the package is only imported on first use (see
+        :class:`LazyLoadedModule`). Otherwise it is imported now.
+        """
         if module_name in self.loaded:
-            self.logger.debug('Module "%s" is already loaded from %s' % (module_name, self.loaded[module_name].package.__path__[0]))
+            self.logger.debug('Module "%s" is already loaded' % module_name)
             return
 
         path = self.get_module_path(module_name)
 
         try:
-            fp, pathname, description = imp.find_module(module_name, [path])
-            try:
-                module = LoadedModule(imp.load_module(module_name, fp, pathname, description))
-            finally:
-                if fp:
-                    fp.close()
+            module = open_module(module_name, path, self.logger)
         except Exception as e:
             if logging.root.level <= logging.DEBUG:
                 self.logger.exception(e)
@@ -163,7 +305,7 @@ class ModulesLoader(object):
                                                % (module.version, self.version))
 
         self.loaded[module_name] = module
-        self.logger.debug('Loaded module "%s" from %s' % (module_name, module.package.__path__[0]))
+        self.logger.debug('Loaded module "%s" from %s' % (module_name, path))
 
     def get_module_path(self, module_name):
         return self.path
@@ -190,3 +332,91 @@ class RepositoryModulesLoader(ModulesLoader):
             raise ModuleLoadError(module_name, 'Module %s is not installed' % module_name)
 
         return minfo.path
+
+
+def test_lazy_loading():
+    import shutil
+    import sys
+    import tempfile
+    from weboob.capabilities.bank import CapBank
+    from weboob.capabilities.bill import CapDocument
+    from weboob.capabilities.paste import CapPaste
+
+    sources = {
+        'static': (
+            'import weboob_test_missing_dependency\n'
+            'from weboob.capabilities.bank import CapBank\n'
+            'from weboob.tools.backend import Module, BackendConfig\n'
+            'from weboob.tools.value import Value, ValueBackendPassword\n'
+            '\n'
+            'class StaticModule(Module, CapBank):\n'
+            '    NAME = "static"\n'
+            '    DESCRIPTION = u"Static"\n'
+            '    VERSION = "1.6"\n'
+            '    CONFIG = BackendConfig(Value("login", label="Login", regexp=r"\\d+"),\n'
+            '                           ValueBackendPassword("password", label="Password"))\n'
+        ),
+        'dynamic': (
+            'from weboob.capabilities.bill import CapDocument\n'
+            'from weboob.tools.backend import Module, BackendConfig\n'
+            'from weboob.tools.value import Value\n'
+            '\n'
+            'class DynamicModule(Module, CapDocument):\n'
+            '    NAME = "dynamic"\n'
+            '    VERSION = "1.6"\n'
+            '    CONFIG = BackendConfig(*[Value(name) for name in ("login", "password")])\n'
+        ),
+        'other': (
+            'from weboob.tools.backend import Module\n'
+            'from weboob.tools.capabilities.paste import BasePasteModule\n'
+            '\n'
+            'class OtherModule(Module, BasePasteModule):\n'
+            '    NAME = "other"\n'
+            '    VERSION = "1.6"\n'
+        ),
+    }
+
+    tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+    try:
+        for name, source in sources.items():
+            os.mkdir(os.path.join(tmpdir, name))
+            with open(os.path.join(tmpdir, name, '__init__.py'), 'w') as f:
+                f.write('from .module import %sModule\n' % name.capitalize())
+            with open(os.path.join(tmpdir, name, 'module.py'), 'w') as f:
+                f.write(source)
+
+        loader = ModulesLoader(tmpdir, '1.6')
+        loader.load_all()
+        assert sorted(loader.loaded) == ['dynamic', 'other', 'static']
+
+        static = loader.loaded['static']
+        assert isinstance(static, LazyLoadedModule)
+        assert static.description == u'Static'
+        assert CapBank in static.iter_caps()
+        assert static.has_caps('CapBank') and static.has_caps(CapBank) and not static.has_caps(CapDocument)
+        assert list(static.config) == ['login', 'password']
+        assert static.config['login'].regexp == r'^\d+$' and static.config['password'].masked
+        assert not static.loaded and 'static' not in sys.modules
+        try:
+            static.klass
+        except ModuleLoadError:
+            pass
+        else:
+            assert False, 'ModuleLoadError not raised'
+
+        dynamic = loader.loaded['dynamic']
+        assert isinstance(dynamic, LazyLoadedModule) and dynamic.metadata.config is None
+        assert not dynamic.loaded and dynamic.has_caps(CapDocument)
+        # CONFIG can't be built statically, the module is imported to get it
+        assert list(dynamic.config) == ['login', 'password']
+        assert dynamic.loaded and dynamic.klass.__name__ == 'DynamicModule'
+        assert dynamic.klass.NAME == dynamic.name
+
+        # base class out of capabilities: imported to read metadata
+        other = loader.loaded['other']
+        assert type(other) is LoadedModule and other.has_caps(CapPaste)
+    finally:
+        for name in sources:
+            sys.modules.pop(name, None)
+            sys.modules.pop('%s.module' % name, None)
+        shutil.rmtree(tmpdir)
@@ -18,11 +18,13 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+from contextlib import ExitStack, contextmanager
 import os
 
 from weboob.core.bcall import BackendsCall
 from weboob.core.modules import ModulesLoader, RepositoryModulesLoader
 from weboob.core.backendscfg import BackendsConfig
+from weboob.core.executor import WorkerPool
 from weboob.core.requests import RequestsManager
 from weboob.core.repositories import Repositories, PrintProgress
 from weboob.core.scheduler import Scheduler
@@ -59,10 +61,12 @@ class WebNip(object):
     :type storage: :class:`weboob.tools.storage.IStorage`
     :param scheduler: what scheduler to use; default is :class:`weboob.core.scheduler.Scheduler`
     :type scheduler: :class:`weboob.core.scheduler.IScheduler`
+    :param executor: what executor to use to call backends; default is :class:`weboob.core.executor.WorkerPool`
+    :type executor: :class:`weboob.core.executor.IExecutor`
     """
     VERSION = '2.1'
 
-    def __init__(self, modules_path=None, storage=None, scheduler=None):
+    def __init__(self, modules_path=None, storage=None, scheduler=None, executor=None):
         self.logger = getLogger('weboob')
         self.backend_instances = {}
         self.requests = RequestsManager()
@@ -83,6 +87,10 @@ class WebNip(object):
             scheduler = Scheduler()
         self.scheduler = scheduler
 
+        if executor is None:
+            executor = WorkerPool()
+        self.executor = executor
+
         self.storage = storage
 
     def __deinit__(self):
@@ -94,6 +102,7 @@ class WebNip(object):
         properly unload all correctly.
         """
         self.unload_backends()
+        self.executor.shutdown()
 
     def build_backend(self, module_name, params=None, storage=None, name=None, nofail=False, logger=None):
         """
@@ -228,26 +237,12 @@ class WebNip(object):
             return self.do(name, *args, **kwargs)
         return caller
 
-    def do(self, function, *args, **kwargs):
-        r"""
-        Do calls on loaded backends with specified arguments, in separated
-        threads.
-
-        This function has two modes:
-
-        - If *function* is a string, it calls the method with this name on
-          each backends with the specified arguments;
-        - If *function* is a callable, it calls it in a separated thread with
-          the locked backend instance at first arguments, and \*args and
-          \*\*kwargs.
+    def _pop_backends(self, kwargs):
+        """
+        Select backends to call from the 'backends' and 'caps' keyword
+        arguments of :func:`do`, and remove them from *kwargs*.
 
-        :param function: backend's method name, or a callable object
-        :type function: :class:`str`
-        :param backends: list of backends to iterate on
-        :type backends: list[:class:`str`]
-        :param caps: iterate on backends which implement this caps
-        :type caps: list[:class:`weboob.capabilities.base.Capability`]
-        :rtype: A :class:`weboob.core.bcall.BackendsCall` object (iterable)
+        :rtype: list[:class:`weboob.tools.backend.Module`]
         """
         backends = list(self.backend_instances.values())
         _backends = kwargs.pop('backends', None)
@@ -277,11 +272,96 @@ class WebNip(object):
             caps = kwargs.pop('caps')
             backends = [backend for backend in backends if backend.has_caps(caps)]
 
+        return backends
+
+    def do(self, function, *args, **kwargs):
+        r"""
+        Do calls on loaded backends with specified arguments, on the
+        executor threads.
+
+        This function has two modes:
+
+        - If *function* is a string, it calls the method with this name on
+          each backends with the specified arguments;
+        - If *function* is a callable, it calls it in a separated thread with
+          the locked backend instance at first arguments, and \*args and
+          \*\*kwargs.
+
+        Backends which miss the *timeout* or the *deadline* are reported as
+        :class:`weboob.core.bcall.BackendTimeout` errors, and their further
+        results are dropped. Results already yielded are kept.
+
+        :param function: backend's method name, or a callable object
+        :type function: :class:`str`
+        :param backends: list of backends to iterate on
+        :type backends: list[:class:`str`]
+        :param caps: iterate on backends which implement this caps
+        :type caps: list[:class:`weboob.capabilities.base.Capability`]
+        :param timeout: maximum time, in seconds, given to each backend
+        :type timeout: float
+        :param deadline: timestamp after which backends still queued or running
+                         are abandoned
+        :type deadline: float
+        :rtype: A :class:`weboob.core.bcall.BackendsCall` object (iterable)
+        """
+        backends = self._pop_backends(kwargs)
+
         # The return value MUST BE the BackendsCall instance. Please never iterate
         # here on this object, because caller might want to use other methods, like
         # wait() on callback_thread().
         # Thanks a lot.
-        return BackendsCall(backends, function, *args, **kwargs)
+        return BackendsCall(backends, function, *args, executor=self.executor, **kwargs)
+
+    def ado(self, function, *args, **kwargs):
+        r"""
+        Asyncio version of :func:`do`.
+
+        Backends are called on the executor threads, and results are
+        consumed from the event loop::
+
+            async for video in weboob.ado('search_videos', 'foo', timeout=30):
+                print(video)
+
+            videos = await weboob.ado('search_videos', 'foo')
+
+        :param function: backend's method name, or a callable object
+        :type function: :class:`str`
+        :param backends: list of backends to iterate on
+        :type backends: list[:class:`str`]
+        :param caps: iterate on backends which implement this caps
+        :type caps: list[:class:`weboob.capabilities.base.Capability`]
+        :param timeout: maximum time, in seconds, given to each backend
+        :type timeout: float
+        :param deadline: timestamp after which backends still queued or running
+                         are abandoned
+        :type deadline: float
+        :rtype: A :class:`weboob.core.abcall.AsyncBackendsCall` object (async iterable and awaitable)
+        """
+        from weboob.core.abcall import AsyncBackendsCall
+
+        backends = self._pop_backends(kwargs)
+        return AsyncBackendsCall(backends, function, *args, executor=self.executor, **kwargs)
+
+    @contextmanager
+    def sync_scope(self, **kwargs):
+        """
+        Open a synchronization scope on backends, so that results they memoize
+        are shared by all the calls made inside it (see
+        :meth:`weboob.tools.backend.Module.sync_scope`)::
+
+            with weboob.sync_scope(backends=account.backend):
+                coming = list(weboob.do('iter_coming', account, backends=account.backend))
+                history = list(weboob.do('iter_history', account, backends=account.backend))
+
+        :param backends: list of backends to open a scope on
+        :type backends: list[:class:`str`]
+        :param caps: open a scope on backends which implement this caps
+        :type caps: list[:class:`weboob.capabilities.base.Capability`]
+        """
+        with ExitStack() as stack:
+            for backend in self._pop_backends(kwargs):
+                stack.enter_context(backend.sync_scope())
+            yield
 
     def schedule(self, interval, function, *args):
         """
@@ -348,11 +428,13 @@ class Weboob(WebNip):
     :type backends_filename: str
     :param storage: provide a storage where backends can save data
     :type storage: :class:`weboob.tools.storage.IStorage`
+    :param executor: what executor to use to call backends
+    :type executor: :class:`weboob.core.executor.IExecutor`
     """
     BACKENDS_FILENAME = 'backends'
 
-    def __init__(self, workdir=None, datadir=None, backends_filename=None, scheduler=None, storage=None):
-        super(Weboob, self).__init__(modules_path=False, scheduler=scheduler, storage=storage)
+    def __init__(self, workdir=None, datadir=None, backends_filename=None, scheduler=None, storage=None, executor=None):
+        super(Weboob, self).__init__(modules_path=False, scheduler=scheduler, storage=storage, executor=executor)
 
         # Create WORKDIR
         if workdir is None:
@@ -491,6 +573,9 @@ class Weboob(WebNip):
             except Module.ConfigError as e:
                 if errors is not None:
                     errors.append(self.LoadError(backend_name, e))
+            except ModuleLoadError as e:
+                # the module is only imported now, see LazyLoadedModule
+                self.logger.error(u'Unable to load module "%s": %s', module_name, e)
             else:
                 self.backend_instances[backend_name] = loaded[backend_name] = backend_instance
         return loaded
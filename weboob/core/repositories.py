@@ -19,7 +19,6 @@
 
 
 from __future__ import print_function
-import imp
 import posixpath
 import shutil
 import re
@@ -27,14 +26,17 @@ import sys
 import os
 import subprocess
 import hashlib
+import json
 from compileall import compile_dir
 from contextlib import closing, contextmanager
 from datetime import datetime
-from io import BytesIO, StringIO
-from tempfile import NamedTemporaryFile
+from io import StringIO
+from tempfile import NamedTemporaryFile, TemporaryFile, mkdtemp
+from threading import RLock
 
 from weboob.exceptions import BrowserHTTPError, BrowserHTTPNotFound, ModuleInstallError
-from .modules import LoadedModule
+from .executor import WorkerPool
+from .modules import open_module
 from weboob.tools.log import getLogger
 from weboob.tools.misc import get_backtrace, to_unicode, find_exe
 from weboob.tools.compat import basestring, unicode
@@ -42,6 +44,22 @@ try:
     from ConfigParser import RawConfigParser, DEFAULTSECT
 except ImportError:
     from configparser import RawConfigParser, DEFAULTSECT
+try:
+    from os import scandir
+except ImportError:
+    class _DirEntry(object):
+        def __init__(self, dirpath, name):
+            self.name = name
+            self.path = os.path.join(dirpath, name)
+
+        def is_dir(self):
+            return os.path.isdir(self.path)
+
+        def stat(self):
+            return os.stat(self.path)
+
+    def scandir(path):
+        return [_DirEntry(path, name) for name in os.listdir(path)]
 
 
 @contextmanager
@@ -130,6 +148,13 @@ class Repository(object):
     KEYDIR = '.keys'
     KEYRING = 'trusted.gpg'
 
+    MANIFEST = '.modules.manifest'
+    """
+    Cache of information about modules, used by :meth:`build_index`.
+    """
+
+    MANIFEST_FORMAT = 1
+
     def __init__(self, url):
         self.url = url
         self.name = u''
@@ -281,6 +306,10 @@ class Repository(object):
         """
         Rebuild index of modules of repository.
 
+        Information about modules are kept in a manifest next to the index,
+        with a fingerprint of their tree (see :meth:`scan_tree`), so only
+        modules which changed since the last build are read again.
+
         :param path: path of the repository
         :type path: str
         :param filename: file to save index
@@ -297,18 +326,26 @@ class Repository(object):
             self.signed = False
             self.key_update = 0
 
+        manifest_path = os.path.join(os.path.dirname(filename), self.MANIFEST)
+        manifest = self.load_manifest(manifest_path)
+        new_manifest = {}
+
         for name in sorted(os.listdir(path)):
             module_path = os.path.join(path, name)
             if not os.path.isdir(module_path) or '.' in name or name == self.KEYDIR or not os.path.exists(os.path.join(module_path, '__init__.py')):
                 continue
 
+            fingerprint = list(self.scan_tree(module_path))
+            entry = manifest.get(name)
+            if entry is not None and entry['fingerprint'] == fingerprint:
+                m = ModuleInfo(entry['name'])
+                m.load(entry['info'])
+                self.modules[m.name] = m
+                new_manifest[name] = entry
+                continue
+
             try:
-                fp, pathname, description = imp.find_module(name, [path])
-                try:
-                    module = LoadedModule(imp.load_module(name, fp, pathname, description))
-                finally:
-                    if fp:
-                        fp.close()
+                module = open_module(name, path, self.logger)
             except Exception as e:
                 self.logger.warning('Unable to build module %s: [%s] %s' % (name, type(e).__name__, e))
                 bt = get_backtrace(e)
@@ -316,30 +353,74 @@ class Repository(object):
                 self.errors[name] = bt
             else:
                 m = ModuleInfo(module.name)
-                m.version = self.get_tree_mtime(module_path)
-                m.capabilities = list(set([c.__name__ for c in module.iter_caps()]))
+                m.version = self.mtime2version(fingerprint[0])
+                m.capabilities = sorted(set([c.__name__ for c in module.iter_caps()]))
                 m.description = module.description
                 m.maintainer = module.maintainer
                 m.license = module.license
                 m.icon = module.icon or ''
                 self.modules[module.name] = m
+                new_manifest[name] = {'fingerprint': fingerprint, 'name': m.name, 'info': dict(m.dump())}
 
         self.update = int(datetime.now().strftime('%Y%m%d%H%M'))
         self.save(filename)
+        if new_manifest != manifest:
+            self.save_manifest(manifest_path, new_manifest)
+
+    def load_manifest(self, filename):
+        try:
+            with open(filename, 'r') as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get('format') != self.MANIFEST_FORMAT:
+            return {}
+        return manifest['modules']
+
+    def save_manifest(self, filename, modules):
+        try:
+            with open_for_config(filename) as f:
+                json.dump({'format': self.MANIFEST_FORMAT, 'modules': modules}, f, sort_keys=True)
+        except (IOError, OSError) as e:
+            self.logger.warning('Unable to save manifest %s: %s', filename, e)
 
     @staticmethod
-    def get_tree_mtime(path, include_root=False):
-        mtime = 0
-        if include_root:
-            mtime = int(datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y%m%d%H%M'))
-        for root, dirs, files in os.walk(path):
-            for f in files:
-                if f.endswith('.pyc'):
-                    continue
-                m = int(datetime.fromtimestamp(os.path.getmtime(os.path.join(root, f))).strftime('%Y%m%d%H%M'))
-                mtime = max(mtime, m)
+    def mtime2version(mtime):
+        if not mtime:
+            return 0
+        return int(datetime.fromtimestamp(mtime).strftime('%Y%m%d%H%M'))
+
+    @staticmethod
+    def scan_tree(path):
+        """
+        Get a fingerprint of a tree, ignoring compiled files.
 
-        return mtime
+        :returns: last modification time of files, number of files, and
+                  last modification time of directories, which changes when
+                  files are added or removed
+        :rtype: tuple[float, int, float]
+        """
+        mtime = dirs_mtime = 0
+        count = 0
+        stack = [path]
+        while stack:
+            dirpath = stack.pop()
+            dirs_mtime = max(dirs_mtime, os.stat(dirpath).st_mtime)
+            for entry in scandir(dirpath):
+                if entry.is_dir():
+                    if entry.name != '__pycache__':
+                        stack.append(entry.path)
+                elif not entry.name.endswith('.pyc'):
+                    mtime = max(mtime, entry.stat().st_mtime)
+                    count += 1
+        return mtime, count, dirs_mtime
+
+    @classmethod
+    def get_tree_mtime(cls, path, include_root=False):
+        mtime = cls.scan_tree(path)[0]
+        if include_root:
+            mtime = max(mtime, os.path.getmtime(path))
+        return cls.mtime2version(mtime)
 
     def save(self, filename, private=False):
         """
@@ -378,6 +459,7 @@ class Versions(object):
     def __init__(self, path):
         self.path = path
         self.versions = {}
+        self.lock = RLock()
 
         try:
             with open(os.path.join(self.path, self.VERSIONS_LIST), 'r') as fp:
@@ -394,16 +476,18 @@ class Versions(object):
         return self.versions.get(name, None)
 
     def set(self, name, version):
-        self.versions[name] = int(version)
-        self.save()
+        with self.lock:
+            self.versions[name] = int(version)
+            self.save()
 
     def save(self):
-        config = RawConfigParser()
-        for name, version in self.versions.items():
-            config.set(DEFAULTSECT, name, version)
+        with self.lock:
+            config = RawConfigParser()
+            for name, version in self.versions.items():
+                config.set(DEFAULTSECT, name, version)
 
-        with open_for_config(os.path.join(self.path, self.VERSIONS_LIST)) as fp:
-            config.write(fp)
+            with open_for_config(os.path.join(self.path, self.VERSIONS_LIST)) as fp:
+                config.write(fp)
 
 
 class IProgress(object):
@@ -456,6 +540,12 @@ class Repositories(object):
 
     SHARE_DIRS = [MODULES_DIR, REPOS_DIR, KEYRINGS_DIR, ICONS_DIR]
 
+    INSTALL_WORKERS = 8
+    """
+    Number of modules installed at once by :meth:`update`. They share the
+    connection pool of the browser, which must be at least as large.
+    """
+
     def __init__(self, workdir, datadir, version):
         self.logger = getLogger('repositories')
         self.version = version
@@ -674,14 +764,45 @@ class Repositories(object):
             def progress(self, percent, message):
                 progress.progress(float(self.n)/len(to_update) + 1.0/len(to_update)*percent, message)
 
+        # modules are downloaded and extracted in parallel, then compiled at once
+        self.load_browser()
+        pool = WorkerPool(min(self.INSTALL_WORKERS, self.browser.MAX_WORKERS, len(to_update)))
+        tasks = []
         for n, info in enumerate(to_update):
             inst_progress = InstallProgress(n)
-            try:
-                self.install(info, inst_progress)
-            except ModuleInstallError as e:
-                inst_progress.progress(1.0, unicode(e))
+            tasks.append((info, inst_progress, pool.submit(self.install, info, inst_progress, False)))
+
+        installed = []
+        try:
+            for info, inst_progress, future in tasks:
+                try:
+                    future.result()
+                except ModuleInstallError as e:
+                    inst_progress.progress(1.0, unicode(e))
+                else:
+                    installed.append(info.name)
+        finally:
+            pool.shutdown()
+            self.compile_modules(installed)
+
+    def compile_modules(self, names):
+        """
+        Byte-compile installed modules, on several processes when possible.
+
+        :param names: names of modules
+        :type names: list[str]
+        """
+        if not names:
+            return
+
+        if sys.version_info >= (3, 5):
+            # up-to-date files of other modules are skipped
+            compile_dir(self.modules_dir, quiet=True, workers=0)
+        else:
+            for name in names:
+                compile_dir(os.path.join(self.modules_dir, name), quiet=True)
 
-    def install(self, module, progress=PrintProgress()):
+    def install(self, module, progress=PrintProgress(), precompile=True):
         """
         Install a module.
 
@@ -689,8 +810,9 @@ class Repositories(object):
         :type module: :class:`str` or :class:`ModuleInfo`
         :param progress: observer object
         :type progress: :class:`IProgress`
+        :param precompile: byte-compile the module, see :meth:`compile_modules`
+        :type precompile: bool
         """
-        import tarfile
         self.load_browser()
 
         if isinstance(module, ModuleInfo):
@@ -718,32 +840,24 @@ class Repositories(object):
             raise ModuleInstallError('The latest version of %s is already installed' % module.name)
 
         progress.progress(0.3, 'Downloading module...')
-        try:
-            tardata = self.browser.open(module.url).content
-        except BrowserHTTPError as e:
-            raise ModuleInstallError('Unable to fetch module: %s' % e)
-
-        # Check signature
-        if module.signed and (Keyring.find_gpg() or Keyring.find_gpgv()):
-            progress.progress(0.5, 'Checking module authenticity...')
-            sig_data = self.browser.open(posixpath.join(module.url + '.sig')).content
-            keyring_path = os.path.join(self.keyrings_dir, self.url2filename(module.repo_url))
-            keyring = Keyring(keyring_path)
-            if not keyring.exists():
-                raise ModuleInstallError('No keyring found, please update repos.')
-            if not keyring.is_valid(tardata, sig_data):
-                raise ModuleInstallError('Invalid signature for %s.' % module.name)
-
-        # Extract module from tarball.
-        if os.path.isdir(module_dir):
-            shutil.rmtree(module_dir)
-        progress.progress(0.7, 'Setting up module...')
-        with closing(tarfile.open('', 'r:gz', BytesIO(tardata))) as tar:
-            tar.extractall(self.modules_dir)
-        if not os.path.isdir(module_dir):
-            raise ModuleInstallError('The archive for %s looks invalid.' % module.name)
-        # Precompile
-        compile_dir(module_dir, quiet=True)
+        with closing(self.download(module.url)) as tarfp:
+            # Check signature
+            if module.signed and (Keyring.find_gpg() or Keyring.find_gpgv()):
+                progress.progress(0.5, 'Checking module authenticity...')
+                sig_data = self.browser.open(posixpath.join(module.url + '.sig')).content
+                keyring_path = os.path.join(self.keyrings_dir, self.url2filename(module.repo_url))
+                keyring = Keyring(keyring_path)
+                if not keyring.exists():
+                    raise ModuleInstallError('No keyring found, please update repos.')
+                if not keyring.is_valid(tarfp, sig_data):
+                    raise ModuleInstallError('Invalid signature for %s.' % module.name)
+                tarfp.seek(0)
+
+            progress.progress(0.7, 'Setting up module...')
+            self.extract_module(module.name, tarfp)
+
+        if precompile:
+            compile_dir(module_dir, quiet=True)
 
         self.versions.set(module.name, module.version)
 
@@ -752,6 +866,56 @@ class Repositories(object):
 
         progress.progress(1.0, 'Module %s has been installed!' % module.name)
 
+    def download(self, url):
+        """
+        Download a module archive to a temporary file, without keeping it in
+        memory.
+
+        :rtype: file
+        """
+        try:
+            response = self.browser.open(url, stream=True)
+        except BrowserHTTPError as e:
+            raise ModuleInstallError('Unable to fetch module: %s' % e)
+
+        fp = TemporaryFile()
+        try:
+            with closing(response):
+                for chunk in response.iter_content(64 * 1024):
+                    fp.write(chunk)
+        except BaseException:
+            fp.close()
+            raise
+        fp.seek(0)
+        return fp
+
+    def extract_module(self, name, fp):
+        """
+        Extract a module from its archive, while reading it, and replace the
+        installed one.
+
+        The archive is extracted in a temporary directory first, so the
+        previous version is kept if it is invalid.
+        """
+        import tarfile
+
+        module_dir = os.path.join(self.modules_dir, name)
+        tmpdir = mkdtemp(prefix='.%s.' % name, dir=self.modules_dir)
+        try:
+            try:
+                with closing(tarfile.open(fileobj=fp, mode='r|gz')) as tar:
+                    tar.extractall(tmpdir)
+            except tarfile.TarError as e:
+                raise ModuleInstallError('The archive for %s looks invalid: %s' % (name, e))
+            if not os.path.isdir(os.path.join(tmpdir, name)):
+                raise ModuleInstallError('The archive for %s looks invalid.' % name)
+
+            if os.path.isdir(module_dir):
+                shutil.rmtree(module_dir)
+            os.rename(os.path.join(tmpdir, name), module_dir)
+        finally:
+            shutil.rmtree(tmpdir)
+
     @staticmethod
     def url2filename(url):
         """
@@ -825,7 +989,7 @@ class Keyring(object):
     def is_valid(self, data, sigdata):
         """
         Check if the data is signed by an accepted key.
-        data and sigdata should be strings.
+        data should be bytes or a file, and sigdata bytes.
         """
         gpg = self.find_gpg()
         gpgv = self.find_gpgv()
@@ -849,14 +1013,18 @@ class Keyring(object):
                 sigfile.write(sigdata)
                 sigfile.flush()  # very important
                 sigfile.close()
-                assert isinstance(data, bytes)
+                if isinstance(data, bytes):
+                    stdin, data = subprocess.PIPE, data
+                else:
+                    # read by gpg from the file itself
+                    stdin, data = data, None
                 # Yes, all of it is necessary
                 proc = subprocess.Popen(verify_command + [
                         '--status-fd', '1',
                         '--keyring', os.path.realpath(self.path),
                         os.path.realpath(sigfile.name),
                         '-'],
-                    stdin=subprocess.PIPE,
+                    stdin=stdin,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE)
                 out, err = proc.communicate(data)
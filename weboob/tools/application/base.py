@@ -291,11 +291,45 @@ class Application(object):
             obj = backend.fillobj(obj, fields) or obj
         return obj
 
+    def _do_complete_objs(self, backend, fields, objs):
+        to_fill = []
+        for obj in objs:
+            if obj and isinstance(obj, BaseObject):
+                obj.backend = backend.name
+                to_fill.append(obj)
+
+        if not to_fill or (fields is not None and len(fields) == 0):
+            return objs
+
+        filled = iter(backend.fillobj_many(to_fill, fields))
+        result = []
+        for obj in objs:
+            if obj and isinstance(obj, BaseObject):
+                obj = next(filled) or obj
+            result.append(obj)
+        return result
+
+    def _iter_complete_objs(self, backend, fields, res):
+        batch_size = getattr(backend, 'FILLOBJ_BATCH_SIZE', 1)
+        if batch_size <= 1:
+            for sub in res:
+                yield self._do_complete_obj(backend, fields, sub)
+            return
+
+        batch = []
+        for sub in res:
+            batch.append(sub)
+            if len(batch) >= batch_size:
+                for obj in self._do_complete_objs(backend, fields, batch):
+                    yield obj
+                batch = []
+        for obj in self._do_complete_objs(backend, fields, batch):
+            yield obj
+
     def _do_complete_iter(self, backend, count, fields, res):
         modif = 0
 
-        for i, sub in enumerate(res):
-            sub = self._do_complete_obj(backend, fields, sub)
+        for i, sub in enumerate(self._iter_complete_objs(backend, fields, res)):
             if self.condition and self.condition.limit and \
                self.condition.limit == i:
                 return
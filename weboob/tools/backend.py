@@ -25,6 +25,7 @@ from weboob.capabilities.base import BaseObject, Capability, FieldNotFound, NotA
 from weboob.exceptions import ModuleInstallError
 from weboob.tools.compat import basestring, getproxies
 from weboob.tools.log import getLogger
+from weboob.tools.memo import SyncCache
 from weboob.tools.json import json
 from weboob.tools.misc import iter_fields
 from weboob.tools.value import ValuesDict
@@ -270,6 +271,22 @@ class Module(object):
     NOT yet filled.
     """
 
+    FILLOBJ_BATCH_SIZE = 1
+    """Number of objects given at once to :func:`fillobj_many` by applications.
+
+    Raise it when :func:`fillobj_many` is overridden with a bulk
+    implementation, or with :attr:`FILLOBJ_MAX_WORKERS`.
+    """
+
+    FILLOBJ_MAX_WORKERS = 1
+    """Maximum number of objects filled at once by :func:`fillobj_many`.
+
+    Objects are filled in threads, sharing the browser, so raise it only if
+    fill methods are thread-safe: for example, if they use
+    :meth:`weboob.browser.browsers.Browser.open` but not the current page of
+    the browser.
+    """
+
     class ConfigError(Exception):
         """
         Raised when the config can't be loaded.
@@ -299,6 +316,7 @@ class Module(object):
         self.weboob = weboob
         self.name = name
         self.lock = RLock()
+        self.sync_cache = SyncCache()
         if config is None:
             config = {}
 
@@ -311,6 +329,23 @@ class Module(object):
         self.storage = BackendStorage(self.name, storage)
         self.storage.load(self.STORAGE)
 
+    def sync_scope(self, call=False):
+        """
+        Context manager around a logical operation (for example the
+        synchronization of accounts), during which results of methods
+        decorated by :func:`weboob.tools.memo.sync_memoized`, on the module
+        and on its browser, are cached.
+
+        >>> with backend.sync_scope():  # doctest: +SKIP
+        ...     accounts = list(backend.iter_accounts())
+        ...     account = backend.get_account(accounts[0].id)
+
+        :param call: the scope only covers a single call, see
+                     :meth:`weboob.tools.memo.SyncCache.scope`
+        :type call: bool
+        """
+        return self.sync_cache.scope(call=call)
+
     def dump_state(self):
         if hasattr(self.browser, 'dump_state'):
             self.storage.set('browser_state', self.browser.dump_state())
@@ -320,6 +355,10 @@ class Module(object):
         """
         This abstract method is called when the backend is unloaded.
         """
+        if self._fillobj_pool is not None:
+            self._fillobj_pool.shutdown(wait=False)
+            self._fillobj_pool = None
+
         if self._browser is None:
             return
 
@@ -330,6 +369,7 @@ class Module(object):
                 self.browser.deinit()
 
     _browser = None
+    _fillobj_pool = None
 
     @property
     def browser(self):
@@ -381,6 +421,7 @@ class Module(object):
             kwargs.setdefault('highlight_el', bool(int(self._private_config['_highlight_el'])))
 
         browser = klass(*args, **kwargs)
+        browser.sync_cache = self.sync_cache
 
         if hasattr(browser, 'load_state'):
             browser.load_state(self.storage.get('browser_state', default={}))
@@ -489,6 +530,41 @@ class Module(object):
 
         return obj
 
+    def fillobj_many(self, objs, fields=None):
+        """
+        Fill several objects with the wanted fields.
+
+        The default implementation calls :func:`fillobj` for every object,
+        with up to :attr:`FILLOBJ_MAX_WORKERS` objects at once, in a pool of
+        workers kept until :func:`deinit`. Modules can override it to fill
+        many objects with a single request.
+
+        :param objs: objects to fill
+        :type objs: :class:`list`
+        :param fields: what fields to fill; if None, all fields are filled
+        :type fields: :class:`list`
+        :returns: filled objects, in the same order
+        :rtype: :class:`list`
+        """
+        objs = list(objs)
+        if min(self.FILLOBJ_MAX_WORKERS, len(objs)) <= 1:
+            return [self.fillobj(obj, fields) for obj in objs]
+
+        with self.lock:
+            if self._fillobj_pool is None:
+                # weboob.core imports this module
+                from weboob.core.executor import WorkerPool
+
+                self._fillobj_pool = WorkerPool(self.FILLOBJ_MAX_WORKERS)
+            pool = self._fillobj_pool
+
+        futures = [pool.submit(self.fillobj, obj, fields) for obj in objs]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
 
 class AbstractModuleMissingParentError(Exception):
     pass
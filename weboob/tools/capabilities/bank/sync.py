@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from datetime import datetime, timedelta
+
+from weboob.capabilities.base import empty
+
+
+__all__ = ['HistorySync']
+
+
+class HistorySync(object):
+    """
+    Incremental synchronization of the history of accounts.
+
+    A watermark is kept for every account in the storage of the backend:
+    the date of its most recent transaction, and the unique IDs (see
+    :func:`weboob.capabilities.bank.Transaction.unique_id`) of transactions
+    dated less than *margin* days before it.
+
+    The next synchronization only asks the backend for transactions since
+    this date minus *margin* days (see
+    :func:`weboob.capabilities.bank.CapBank.iter_history_since`), and skips
+    the ones already seen. Transactions appearing late with an older date
+    are then still found.
+
+    The watermark is only moved once the history has been entirely
+    iterated.
+
+    :param backend: backend implementing :class:`weboob.capabilities.bank.CapBank`
+    :type backend: :class:`weboob.tools.backend.Module`
+    :param margin: number of days before the watermark to fetch again
+    :type margin: int
+    """
+
+    STORAGE_KEY = 'history_watermarks'
+
+    def __init__(self, backend, margin=7):
+        self.backend = backend
+        self.margin = timedelta(days=margin)
+
+    def get_watermark(self, account):
+        """
+        Get the watermark of an account.
+
+        :returns: date of the most recent transaction and IDs of the last
+                  transactions, or None if the account was never synchronized
+        :rtype: tuple[:class:`datetime.date`, set[str]] or None
+        """
+        watermark = self.backend.storage.get(self.STORAGE_KEY, account.id, default=None)
+        if not watermark:
+            return None
+        return datetime.strptime(watermark['date'], '%Y-%m-%d').date(), set(watermark['ids'])
+
+    def set_watermark(self, account, last_date, ids):
+        self.backend.storage.set(self.STORAGE_KEY, account.id, {
+            'date': last_date.strftime('%Y-%m-%d'),
+            'ids': sorted(ids),
+        })
+        self.backend.storage.save()
+
+    def reset(self, account):
+        """
+        Forget the watermark of an account, to synchronize it entirely again.
+        """
+        self.backend.storage.delete(self.STORAGE_KEY, account.id)
+        self.backend.storage.save()
+
+    def iter_new_history(self, account):
+        """
+        Iter transactions of an account not seen by the previous
+        synchronization.
+
+        :param account: account to synchronize
+        :type account: :class:`weboob.capabilities.bank.Account`
+        :rtype: iter[:class:`weboob.capabilities.bank.Transaction`]
+        """
+        watermark = self.get_watermark(account)
+        if watermark is None:
+            last_date, known = None, set()
+            history = self.backend.iter_history(account)
+        else:
+            last_date, known = watermark
+            history = self.backend.iter_history_since(account, last_date - self.margin)
+
+        seen = set()
+        dates = {}
+        for tr in history:
+            unique_id = tr.unique_id(seen, account_id=account.id)
+            dates[unique_id] = None
+            if not empty(tr.date):
+                tr_date = dates[unique_id] = tr.date.date() if isinstance(tr.date, datetime) else tr.date
+                if last_date is None or tr_date > last_date:
+                    last_date = tr_date
+
+            if unique_id not in known:
+                yield tr
+
+        if last_date is not None:
+            oldest = last_date - self.margin
+            # transactions without date are always fetched again
+            self.set_watermark(account, last_date, [unique_id for unique_id, tr_date in dates.items()
+                                                    if tr_date is None or tr_date >= oldest])
@@ -64,15 +64,19 @@ class BankStandardTest(object):
         for account in accounts:
             self.check_account(account)
 
-            try:
-                self.check_history(account)
-            except NotImplementedError:
-                self.assertTrue(self.allow_notimplemented_history, 'iter_history should not raise NotImplementedError')
-
-            try:
-                self.check_coming(account)
-            except NotImplementedError:
-                self.assertTrue(self.allow_notimplemented_coming, 'iter_coming should not raise NotImplementedError')
+            # history and coming are often scraped from the same pages
+            with self.backend.sync_scope():
+                try:
+                    self.check_history(account)
+                except NotImplementedError:
+                    self.assertTrue(self.allow_notimplemented_history,
+                                    'iter_history should not raise NotImplementedError')
+
+                try:
+                    self.check_coming(account)
+                except NotImplementedError:
+                    self.assertTrue(self.allow_notimplemented_coming,
+                                    'iter_coming should not raise NotImplementedError')
 
             try:
                 self.check_investments(account)
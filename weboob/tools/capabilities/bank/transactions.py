@@ -17,14 +17,13 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-from collections import OrderedDict
 from decimal import Decimal, InvalidOperation
 import datetime
 import re
 
 from weboob.capabilities.bank import Transaction, Account
 from weboob.capabilities import NotAvailable, NotLoaded
-from weboob.tools.misc import to_unicode
+from weboob.tools.misc import merge_sorted, to_unicode
 from weboob.tools.log import getLogger
 from weboob.tools.date import new_datetime
 
@@ -308,35 +307,33 @@ class AmericanTransaction(Transaction):
         return Decimal(amnt) if amnt else Decimal('0')
 
 
+def _transaction_key(tr):
+    return (tr.date, new_datetime(tr.rdate) if tr.rdate else datetime.datetime.min)
+
+
 def sorted_transactions(iterable):
     """Sort an iterable of transactions in reverse chronological order"""
-    return sorted(iterable, reverse=True, key=lambda tr: (tr.date, new_datetime(tr.rdate) if tr.rdate else datetime.datetime.min))
+    return sorted(iterable, reverse=True, key=_transaction_key)
 
 
-def merge_iterators(*iterables):
+def merge_iterators(*iterables, **kwargs):
     """Merge transactions iterators keeping sort order.
 
     Each iterator must already be sorted in reverse chronological order.
-    """
 
-    def keyfunc(kv):
-        return (kv[1].date, kv[1].rdate)
-
-    its = OrderedDict((iter(it), None) for it in iterables)
-    for k in list(its):
-        try:
-            its[k] = next(k)
-        except StopIteration:
-            del its[k]
-
-    while its:
-        k, v = max(its.items(), key=keyfunc)
-        yield v
-
-        try:
-            its[k] = next(k)
-        except StopIteration:
-            del its[k]
+    :param unique: yield transactions found in several iterators, for
+                   example from two sources of the same account, only once.
+                   They are identified by :func:`Transaction.unique_id`.
+    :type unique: bool
+    """
+    unique = kwargs.pop('unique', False)
+    if kwargs:
+        raise TypeError('unexpected keyword arguments: %s' % ', '.join(kwargs))
+
+    return merge_sorted(
+        iterables, key=_transaction_key, reverse=True,
+        unique_key=(lambda tr: tr.unique_id()) if unique else None,
+    )
 
 
 def keep_only_card_transactions(it, match_func=None):
@@ -17,7 +17,7 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
-from collections import OrderedDict
+from weboob.tools.misc import merge_sorted
 
 
 __all__ = ['sorted_documents', 'merge_iterators']
@@ -28,27 +28,20 @@ def sorted_documents(iterable):
     return sorted(iterable, reverse=True, key=lambda doc: doc.date)
 
 
-def merge_iterators(*iterables):
+def merge_iterators(*iterables, **kwargs):
     """Merge documents iterators keeping sort order.
 
     Each iterator must already be sorted in reverse chronological order.
-    """
-
-    def keyfunc(kv):
-        return kv[1].date
-
-    its = OrderedDict((iter(it), None) for it in iterables)
-    for k in list(its):
-        try:
-            its[k] = next(k)
-        except StopIteration:
-            del its[k]
 
-    while its:
-        k, v = max(its.items(), key=keyfunc)
-        yield v
-
-        try:
-            its[k] = next(k)
-        except StopIteration:
-            del its[k]
+    :param unique: yield documents found in several iterators only once.
+                   They are identified by their ID.
+    :type unique: bool
+    """
+    unique = kwargs.pop('unique', False)
+    if kwargs:
+        raise TypeError('unexpected keyword arguments: %s' % ', '.join(kwargs))
+
+    return merge_sorted(
+        iterables, key=lambda doc: doc.date, reverse=True,
+        unique_key=(lambda doc: doc.id) if unique else None,
+    )
@@ -21,11 +21,16 @@
 import os
 import sqlite3
 import tempfile
-from collections import Mapping, MutableMapping
+try:
+    # Python 3.3 and above
+    from collections.abc import Mapping, MutableMapping
+except ImportError:
+    from collections import Mapping, MutableMapping
 
 import yaml
 
-from weboob.tools.compat import unicode
+from weboob.tools.compat import basestring, long, unicode
+from weboob.tools.json import json
 
 from .iconfig import ConfigError, IConfig
 from .util import replace, time_buffer
@@ -40,6 +45,57 @@ except ImportError:
 __all__ = ['SQLiteConfig']
 
 
+def _is_json_safe(value):
+    """
+    Whether a value is read back identical after a JSON round-trip.
+    Tuples, sets, dates or dicts with non-string keys are not.
+    """
+    if value is None or isinstance(value, (basestring, bool, int, long, float)):
+        return True
+    if type(value) is list:
+        return all(_is_json_safe(v) for v in value)
+    if type(value) is dict:
+        return all(isinstance(k, basestring) and _is_json_safe(v) for k, v in value.items())
+    return False
+
+
+def encode_value(value):
+    r"""
+    Encode a value to store it in the database: as JSON when possible, which
+    is much faster to load, or as YAML.
+
+    >>> encode_value({'a': [1, 'b']})
+    '{"a":[1,"b"]}'
+    >>> encode_value((1, 2)) == '!!python/tuple\n- 1\n- 2\n'
+    True
+    """
+    if _is_json_safe(value):
+        try:
+            return json.dumps(value, separators=(',', ':'))
+        except (TypeError, ValueError):
+            pass
+    return yaml.dump(value, None, Dumper=WeboobDumper, default_flow_style=False)
+
+
+def decode_value(strvalue):
+    r"""
+    Decode a value stored by :func:`encode_value`, or with YAML by previous
+    versions.
+
+    A document produced by the YAML dumper is only valid JSON if it has the
+    same meaning in both languages (like ``{}``), so JSON is tried first.
+
+    >>> decode_value('{"a":[1,"b"]}') == {'a': [1, 'b']}
+    True
+    >>> decode_value("a:\n- 1\n- '2'\n") == {'a': [1, '2']}
+    True
+    """
+    try:
+        return json.loads(strvalue)
+    except ValueError:
+        return yaml.load(strvalue, Loader=Loader)
+
+
 class VirtualRootDict(Mapping):
     def __init__(self, config):
         self.config = config
@@ -83,7 +139,7 @@ class VirtualDict(MutableMapping):
 
     def __delitem__(self, key):
         try:
-            self.config.delete(self, self.base, key)
+            self.config.delete(self.base, key)
         except ConfigError:
             raise KeyError('%s key in %s table not found' % (key, self.base))
 
@@ -92,8 +148,28 @@ class VirtualDict(MutableMapping):
 
 
 class SQLiteConfig(IConfig):
+    """
+    Config stored in a SQLite database, with a table per first level key.
+
+    The database is used in WAL mode, and every write is committed at once,
+    so other processes using the same file are not locked out. Commits are
+    appended to a journal without syncing it to disk, and :meth:`save` folds
+    the journal back into the database at most every *commit_since_seconds*
+    seconds.
+
+    Maintenance is never run on load, see :meth:`vacuum`. A SQL dump of the
+    database can be made every *dump_since_seconds* seconds, as a backup.
+    """
+
     commit_since_seconds = 3600
-    dump_since_seconds = 600
+    dump_since_seconds = 0
+
+    if sqlite3.sqlite_version_info >= (3, 24):
+        # don't touch the row, and the pages holding it, if the value has not changed
+        UPSERT = '''INSERT INTO %(table)s VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value WHERE value != excluded.value;'''
+    else:
+        UPSERT = '''INSERT OR REPLACE INTO %(table)s VALUES (?, ?);'''
 
     def __init__(self, path, commit_since_seconds=None, dump_since_seconds=None, last_run=True, logger=None):
         self.path = path
@@ -106,14 +182,18 @@ class SQLiteConfig(IConfig):
         if self.dump_since_seconds:
             self.dump = time_buffer(since_seconds=self.dump_since_seconds, last_run=last_run, logger=logger)(self.dump)
 
-    def load(self, default={}, optimize=True):
-        self.storage = sqlite3.connect(self.path)
+    def load(self, default={}, optimize=False):
+        # autocommit: a write transaction must not stay open until save()
+        self.storage = sqlite3.connect(self.path, isolation_level=None)
         self.storage.execute('PRAGMA page_size = 4096')
-        if optimize:
-            self.storage.execute('VACUUM')
-            self.storage.execute('REINDEX')
+        self.storage.execute('PRAGMA journal_mode = WAL')
+        # in WAL mode, a commit is still atomic and consistent without
+        # syncing, only durability after a power loss is affected
+        self.storage.execute('PRAGMA synchronous = NORMAL')
         self._tables = set(self.tables())
         self.values = VirtualRootDict(self)
+        if optimize:
+            self.vacuum()
 
     def save(self, commit_since_seconds=None, dump_since_seconds=None):
         self.commit(since_seconds=commit_since_seconds)
@@ -130,7 +210,18 @@ class SQLiteConfig(IConfig):
 
     def commit(self, **kwargs):
         kwargs.pop('since_seconds', None)
-        self.storage.commit()
+        # writes are already committed, sync them to the database
+        self.storage.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def vacuum(self):
+        """
+        Rebuild the database to reclaim free space, and fold the journal back
+        into it. This can take a while on a large database, so it is only run
+        when asked.
+        """
+        self.storage.execute('VACUUM')
+        self.storage.execute('REINDEX')
+        self.storage.execute('PRAGMA wal_checkpoint(TRUNCATE)')
 
     def dump(self, **kwargs):
         kwargs.pop('since_seconds', None)
@@ -165,7 +256,7 @@ class SQLiteConfig(IConfig):
         items = cur.fetchmany(size)
         while items:
             for key, strvalue in items:
-                yield key, yaml.load(strvalue, Loader=Loader)
+                yield key, decode_value(strvalue)
             items = cur.fetchmany(size)
 
     def keys(self, table, size=200):
@@ -202,8 +293,7 @@ class SQLiteConfig(IConfig):
                 else:
                     raise ConfigError()
             else:
-                strvalue = row[0]
-                value = yaml.load(strvalue, Loader=Loader)
+                value = decode_value(row[0])
         except TypeError:
             raise ConfigError()
         return value
@@ -216,9 +306,9 @@ class SQLiteConfig(IConfig):
         value = args[-1]
         self.ensure_table(table)
         try:
-            strvalue = yaml.dump(value, None, Dumper=WeboobDumper, default_flow_style=False)
+            strvalue = encode_value(value)
             cur = self.storage.cursor()
-            cur.execute('''INSERT OR REPLACE INTO %s VALUES (?, ?)''' % table, (key, strvalue))
+            cur.execute(self.UPSERT % {'table': table}, (key, strvalue))
         except KeyError:
             raise ConfigError()
         except TypeError:
@@ -231,6 +321,7 @@ class SQLiteConfig(IConfig):
             if table in self._tables:
                 cur = self.storage.cursor()
                 cur.execute('DROP TABLE %s;' % table)
+                self._tables.remove(table)
             else:
                 raise ConfigError()
         else:
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+
+from contextlib import contextmanager
+from functools import wraps
+from threading import RLock
+import types
+
+from weboob.capabilities.base import BaseObject
+
+
+__all__ = ['SyncCache', 'sync_memoized']
+
+
+class SyncCache(object):
+    """
+    Cache of results of methods decorated by :func:`sync_memoized`, kept
+    while a scope is open.
+
+    A module and its browser share the same cache, see
+    :meth:`weboob.tools.backend.Module.sync_scope`.
+    """
+
+    def __init__(self):
+        self.lock = RLock()
+        self.depth = 0
+        self.shared_depth = 0
+        self.entries = {}
+
+    @property
+    def active(self):
+        return self.depth > 0
+
+    @property
+    def shared(self):
+        """
+        Whether results are shared by several calls, because a caller opened a
+        scope around them. Methods can then fetch more than asked, knowing it
+        will be reused.
+        """
+        return self.shared_depth > 0
+
+    @contextmanager
+    def scope(self, call=False):
+        """
+        Open a scope, which can be nested. Results are forgotten when the
+        outermost scope is closed, or when an exception is raised.
+
+        :param call: the scope only covers a single call, and doesn't set
+                     :attr:`shared`
+        :type call: bool
+        """
+        with self.lock:
+            self.depth += 1
+            if not call:
+                self.shared_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.clear()
+            raise
+        finally:
+            with self.lock:
+                self.depth -= 1
+                if not call:
+                    self.shared_depth -= 1
+                if not self.depth:
+                    self.entries.clear()
+
+    def clear(self):
+        """
+        Forget all results, for example when the session is lost.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def get(self, key):
+        """
+        :returns: a tuple (found, value)
+        """
+        with self.lock:
+            if key in self.entries:
+                return True, self.entries[key]
+            return False, None
+
+    def set(self, key, value):
+        with self.lock:
+            if self.depth:
+                self.entries[key] = value
+
+
+def _make_key(value):
+    if isinstance(value, BaseObject):
+        # objects are not hashable, and are identified by their ID
+        return (type(value).__name__, value.id)
+    if isinstance(value, (list, tuple)):
+        return tuple(_make_key(v) for v in value)
+    return value
+
+
+def sync_memoized(func):
+    """
+    Decorator to cache results of a method of a module or a browser while a
+    synchronization scope is open.
+
+    Arguments are compared by value, and objects by ID. Outside of a scope,
+    or if arguments are not hashable, the method is always called.
+
+    Generators are only cached once entirely iterated: a caller stopping
+    early does not leave a half-consumed generator behind, which could have
+    been resumed after the browser moved to another page.
+
+    Cached objects are shared by callers, which should not modify them.
+
+    >>> from weboob.tools.backend import Module
+    >>> class MyModule(Module):
+    ...     calls = 0
+    ...     @sync_memoized
+    ...     def iter_things(self, arg):
+    ...         self.calls += 1
+    ...         yield arg
+    >>> module = MyModule(None, 'test')
+    >>> with module.sync_scope():
+    ...     _ = list(module.iter_things(1)), list(module.iter_things(1))
+    >>> module.calls
+    1
+    """
+
+    @wraps(func)
+    def inner(self, *args, **kwargs):
+        cache = getattr(self, 'sync_cache', None)
+        if cache is None or not cache.active:
+            return func(self, *args, **kwargs)
+
+        try:
+            key = (func, _make_key(args), _make_key(tuple(sorted(kwargs.items()))))
+            found, value = cache.get(key)
+        except TypeError:
+            # unhashable arguments
+            return func(self, *args, **kwargs)
+
+        if found:
+            if isinstance(value, _CachedIterable):
+                return iter(value.items)
+            return value
+
+        try:
+            value = func(self, *args, **kwargs)
+        except BaseException:
+            cache.clear()
+            raise
+
+        if isinstance(value, types.GeneratorType):
+            return _record(cache, key, value)
+
+        cache.set(key, value)
+        return value
+
+    return inner
+
+
+class _CachedIterable(object):
+    def __init__(self, items):
+        self.items = items
+
+
+def _record(cache, key, generator):
+    items = []
+    try:
+        for item in generator:
+            items.append(item)
+            yield item
+    except GeneratorExit:
+        generator.close()
+        raise
+    except BaseException:
+        cache.clear()
+        raise
+
+    cache.set(key, _CachedIterable(items))
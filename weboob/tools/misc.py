@@ -18,6 +18,7 @@
 # along with weboob. If not, see <http://www.gnu.org/licenses/>.
 
 
+from heapq import heapify, heappop, heapreplace
 from time import time, sleep
 import locale
 import os
@@ -29,7 +30,7 @@ from .compat import unicode
 
 
 __all__ = ['get_backtrace', 'get_bytes_size', 'iter_fields',
-           'to_unicode', 'input', 'limit', 'find_exe']
+           'to_unicode', 'input', 'limit', 'merge_sorted', 'find_exe']
 
 
 def get_backtrace(empty="Empty backtrace."):
@@ -140,6 +141,86 @@ def limit(iterator, lim):
         count += 1
 
 
+class _Reversed(object):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def merge_sorted(iterables, key=None, reverse=False, unique_key=None):
+    """
+    Merge iterables which are already sorted, lazily, in O(n log k) for k
+    iterables.
+
+    Equal elements are yielded in the order of the iterables.
+
+    >>> list(merge_sorted([[1, 3, 5], [2, 3, 4]]))
+    [1, 2, 3, 3, 4, 5]
+    >>> list(merge_sorted([['b', 'a'], ['B', 'A']], key=str.lower, reverse=True))
+    ['b', 'B', 'a', 'A']
+
+    With *unique_key*, elements found in several iterables are yielded once.
+    Duplicates inside an iterable are kept, as long as another iterable has
+    less of them:
+
+    >>> list(merge_sorted([[1, 2, 2], [2, 3], [1, 2, 2, 2]], unique_key=lambda x: x))
+    [1, 2, 2, 2, 3]
+
+    :param iterables: iterables sorted by *key*
+    :param key: function returning the comparison key of an element
+    :param reverse: iterables are sorted in descending order
+    :type reverse: bool
+    :param unique_key: function returning an identifier of elements, to
+                       yield elements found in several iterables only once
+    """
+    if key is None:
+        key = _identity
+    wrap = _Reversed if reverse else _identity
+
+    heap = []
+    for index, it in enumerate(iterables):
+        it = iter(it)
+        for value in it:
+            heap.append([wrap(key(value)), index, value, it])
+            break
+    heapify(heap)
+
+    # identifier -> (number of elements yielded, elements seen per iterable)
+    seen = {}
+    while heap:
+        entry = heap[0]
+        _, index, value, it = entry
+
+        if unique_key is None:
+            yield value
+        else:
+            uid = unique_key(value)
+            yielded, counts = seen.setdefault(uid, (0, {}))
+            counts[index] = counts.get(index, 0) + 1
+            if counts[index] > yielded:
+                seen[uid] = (counts[index], counts)
+                yield value
+
+        for value in it:
+            entry[0] = wrap(key(value))
+            entry[2] = value
+            heapreplace(heap, entry)
+            break
+        else:
+            heappop(heap)
+
+
+def _identity(value):
+    return value
+
+
 def ratelimit(group, delay):
     """
     Simple rate limiting.
@@ -154,6 +235,7 @@ def ratelimit(group, delay):
 
     This function is not thread-safe. For reasonably non-critical rate
     limiting (like accessing a website), it should be sufficient nevertheless.
+    Browsers should rather use their `RATE_LIMIT` attribute.
 
     @param group [string]  rate limiting group name, alphanumeric
     @param delay [int]  delay in seconds between each call
@@ -19,7 +19,15 @@
 
 
 from copy import deepcopy
-
+import io
+import os
+import shutil
+import tempfile
+from threading import Lock
+
+from .compat import quote
+from .config.sqliteconfig import decode_value, encode_value
+from .config.util import LOGGER, replace
 from .config.yamlconfig import YamlConfig
 
 
@@ -56,28 +64,117 @@ class IStorage(object):
 
 
 class StandardStorage(IStorage):
+    """
+    Storage sharded by backend (or application): the data of each one is
+    kept in its own file, in the *path*.d directory, and loaded only when
+    needed.
+
+    Saving writes atomically only the file of this backend, and only if its
+    data changed. Files are JSON when data can be represented without loss,
+    or YAML otherwise, so they are all readable as YAML.
+
+    The first time, data from the former single YAML file at *path* is
+    split into the directory, and this file is renamed with a ``.bak``
+    suffix.
+
+    :param path: path of the storage
+    :type path: str
+    """
+
     def __init__(self, path):
+        self.path = path
+        self.dirname = path + '.d'
+        # only used to hold the loaded shards, it is never saved as a whole
         self.config = YamlConfig(path)
-        self.config.load()
+        self.loaded = set()
+        # last content written or read, to skip useless writes
+        self.saved = {}
+        self.lock = Lock()
 
-    def load(self, what, name, default={}):
-        d = {}
-        if what not in self.config.values:
-            self.config.values[what] = {}
+        if not os.path.isdir(self.dirname) and os.path.isfile(self.path):
+            self.migrate()
+
+    def shard_path(self, what, name, dirname=None):
+        return os.path.join(dirname or self.dirname, quote(what, safe=''), quote(name, safe='') + '.yml')
+
+    def write_shard(self, path, content):
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        # write in a temporary file to avoid corruption problems
+        with tempfile.NamedTemporaryFile(dir=dirname, prefix='.tmp-', delete=False) as f:
+            f.write(content.encode('utf-8'))
+        replace(f.name, path)
+
+    def migrate(self):
+        """
+        Split the former single YAML file into shards.
+        """
+        LOGGER.info(u'Migrating storage %s to %s', self.path, self.dirname)
+        config = YamlConfig(self.path)
+        config.load()
+
+        tmpdir = tempfile.mkdtemp(prefix='.migrate-', dir=os.path.dirname(os.path.abspath(self.path)))
+        for what, names in config.values.items():
+            for name, values in names.items():
+                self.write_shard(self.shard_path(what, name, tmpdir), encode_value(values))
+
+        # the directory appears at once, with all the data
+        try:
+            replace(tmpdir, self.dirname)
+        except OSError:
+            if not os.path.isdir(self.dirname):
+                raise
+            # migrated by another process meanwhile
+            shutil.rmtree(tmpdir)
         else:
-            d = self.config.values[what].get(name, {})
+            replace(self.path, self.path + '.bak')
+
+    def _ensure_loaded(self, what, name):
+        with self.lock:
+            names = self.config.values.setdefault(what, {})
+            if (what, name) in self.loaded:
+                return
+            self.loaded.add((what, name))
+
+            try:
+                with io.open(self.shard_path(what, name), encoding='utf-8') as f:
+                    content = f.read()
+            except IOError:
+                return
+            self.saved[(what, name)] = content
+            names[name] = decode_value(content)
+
+    def load(self, what, name, default={}):
+        self._ensure_loaded(what, name)
+        d = self.config.values[what].get(name, {})
 
         self.config.values[what][name] = deepcopy(default)
         self.config.values[what][name].update(d)
 
     def save(self, what, name):
-        self.config.save()
+        path = self.shard_path(what, name)
+        with self.lock:
+            if name not in self.config.values.get(what, {}):
+                # deleted
+                if self.saved.pop((what, name), None) is not None and os.path.exists(path):
+                    os.remove(path)
+                return
+
+            content = encode_value(self.config.values[what][name])
+            if content != self.saved.get((what, name)):
+                self.write_shard(path, content)
+                self.saved[(what, name)] = content
 
     def set(self, what, name, *args):
+        self._ensure_loaded(what, name)
         self.config.set(what, name, *args)
 
     def delete(self, what, name, *args):
+        self._ensure_loaded(what, name)
         self.config.delete(what, name, *args)
 
     def get(self, what, name, *args, **kwargs):
+        self._ensure_loaded(what, name)
         return self.config.get(what, name, *args, **kwargs)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+from time import sleep
+from unittest import TestCase
+
+from weboob.core.abcall import AsyncBackendsCall
+from weboob.core.bcall import BackendTimeout, CallErrors
+from weboob.core.executor import WorkerPool
+from weboob.tools.tests.bcall import GatedBackend, MyBackend
+
+
+class DelayedBackend(MyBackend):
+    def __init__(self, name, results, delay):
+        super(DelayedBackend, self).__init__(name, results)
+        self.delay = delay
+
+    def iter_results(self):
+        for result in self.results:
+            sleep(self.delay)
+            yield result
+
+
+class SmallAsyncBackendsCall(AsyncBackendsCall):
+    RESULTS_QUEUE_SIZE = 10
+
+
+class AsyncBackendsCallTest(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(asyncio.wait_for(coroutine, 10))
+
+    def test_iter(self):
+        pool = WorkerPool(max_workers=2)
+        self.addCleanup(pool.shutdown)
+        backends = [MyBackend('b%d' % i, range(i * 10, i * 10 + 10)) for i in range(5)]
+
+        async def consume():
+            results = []
+            async for result in AsyncBackendsCall(backends, 'iter_results', executor=pool):
+                results.append(result)
+            return results
+
+        async def gather():
+            return await AsyncBackendsCall(backends, 'iter_results', executor=pool)
+
+        self.assertEqual(sorted(self.run_async(consume())), list(range(50)))
+        self.assertEqual(sorted(self.run_async(gather())), list(range(50)))
+
+    def test_timeout(self):
+        backends = [DelayedBackend('fast', [1, 2], 0), DelayedBackend('slow', [3, 4], 0.2)]
+
+        async def consume():
+            results = []
+            with self.assertRaises(CallErrors) as cm:
+                async for result in AsyncBackendsCall(backends, 'iter_results', timeout=0.3):
+                    results.append(result)
+            self.assertEqual([(backend.name, type(error)) for backend, error, _ in cm.exception],
+                             [('slow', BackendTimeout)])
+            return results
+
+        self.assertEqual(sorted(self.run_async(consume())), [1, 2, 3])
+
+    def test_backpressure(self):
+        backend = GatedBackend('a', list(range(1000)))
+        call = SmallAsyncBackendsCall([backend], 'iter_results')
+
+        async def consume():
+            results = []
+            async with call:
+                async for result in call:
+                    backend.started.set()
+                    self.assertEqual(call.maxsize, 10)
+                    self.assertLessEqual(len(call.responses), call.maxsize)
+                    results.append(result)
+            return results
+
+        self.assertEqual(self.run_async(consume()), list(range(1000)))
+
+    def test_loop(self):
+        # the call is created out of the loop consuming results
+        call = AsyncBackendsCall([DelayedBackend('a', [1, 2], 0.1)], 'iter_results')
+        self.assertEqual(self.run_async(call.results()), [1, 2])
+        self.assertIs(call.loop, self.loop)
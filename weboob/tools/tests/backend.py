@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from threading import Lock
+import time
+from unittest import TestCase
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+from weboob.browser import Browser
+from weboob.capabilities.base import BaseObject, BytesField, NotAvailable, StringField
+from weboob.tools.application.base import Application
+from weboob.tools.backend import Module
+
+
+class MyObject(BaseObject):
+    label = StringField('Label')
+    extra = StringField('Extra')
+    data = BytesField('Data')
+
+
+class SlowAdapter(BaseAdapter):
+    """Serve responses without network, slowly, counting concurrent requests."""
+
+    def __init__(self):
+        super(SlowAdapter, self).__init__()
+        self.lock = Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(.05)
+        with self.lock:
+            self.running -= 1
+
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.status_code = 200
+        response._content = request.url.encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+class MyBrowser(Browser):
+    def __init__(self, *args, **kwargs):
+        super(MyBrowser, self).__init__(*args, **kwargs)
+        self.adapter = SlowAdapter()
+        self.session.mount('http://', self.adapter)
+
+
+class MyModule(Module):
+    NAME = 'mymodule'
+
+    def __init__(self, *args, **kwargs):
+        super(MyModule, self).__init__(*args, **kwargs)
+        self.lock_running = Lock()
+        self.running = 0
+        self.max_running = 0
+        self.calls = []
+
+    def fill_object(self, obj, fields):
+        with self.lock_running:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(.01)
+        with self.lock_running:
+            self.running -= 1
+
+        self.calls.append(obj.id)
+        if 'label' in fields:
+            obj.label = u'label of %s' % obj.id
+        return obj
+
+    OBJECTS = {MyObject: fill_object}
+
+
+class MyDownloadModule(Module):
+    NAME = 'mydownload'
+    BROWSER = MyBrowser
+
+    FILLOBJ_MAX_WORKERS = 4
+
+    def fill_object(self, obj, fields):
+        if 'data' in fields:
+            obj.data = self.browser.open('http://fillobj.test/%s' % obj.id).content
+        return obj
+
+    OBJECTS = {MyObject: fill_object}
+
+
+class MyBulkModule(MyModule):
+    FILLOBJ_BATCH_SIZE = 3
+
+    def fillobj_many(self, objs, fields=None):
+        self.calls.append([obj.id for obj in objs])
+        for obj in objs:
+            obj.label = u'bulk %s' % obj.id
+            obj.extra = NotAvailable
+        return objs
+
+
+class FillobjManyTest(TestCase):
+    def make_objects(self):
+        return [MyObject(str(i)) for i in range(6)]
+
+    def test_sequential(self):
+        module = MyModule(None, 'test')
+        objs = module.fillobj_many(self.make_objects(), ['label'])
+        self.assertEqual([obj.label for obj in objs], [u'label of %d' % i for i in range(6)])
+        self.assertEqual(module.max_running, 1)
+
+    def test_concurrent(self):
+        module = MyModule(None, 'test')
+        module.FILLOBJ_MAX_WORKERS = 3
+        objs = module.fillobj_many(self.make_objects(), ['label'])
+        self.assertEqual([obj.label for obj in objs], [u'label of %d' % i for i in range(6)])
+        self.assertGreater(module.max_running, 1)
+        self.assertLessEqual(module.max_running, 3)
+
+    def test_requests(self):
+        module = MyDownloadModule(None, 'test')
+        objs = module.fillobj_many(self.make_objects(), ['data'])
+        self.assertEqual([obj.data for obj in objs], [b'http://fillobj.test/%d' % i for i in range(6)])
+        self.assertEqual(module.browser.adapter.max_running, 4)
+
+        pool = module._fillobj_pool
+        module.fillobj_many(self.make_objects()[:2], ['data'])
+        self.assertIs(module._fillobj_pool, pool)
+
+        module.deinit()
+        self.assertIsNone(module._fillobj_pool)
+        self.assertTrue(pool.stopped)
+
+    def test_application(self):
+        app = Application.__new__(Application)
+        app.condition = None
+        app._is_default_count = False
+
+        module = MyBulkModule(None, 'test')
+        objs = self.make_objects()
+        res = list(app._do_complete_iter(module, None, ['label'], iter(objs[:2] + [None] + objs[2:])))
+        self.assertEqual(module.calls, [['0', '1'], ['2', '3', '4'], ['5']])
+        self.assertEqual(res[2], None)
+        self.assertEqual([obj.label for obj in res if obj], [u'bulk %d' % i for i in range(6)])
+        self.assertEqual(res[0].backend, 'test')
+
+        module = MyModule(None, 'test')
+        res = list(app._do_complete_iter(module, 2, ['label'], iter(self.make_objects())))
+        self.assertEqual([obj.id for obj in res], ['0', '1'])
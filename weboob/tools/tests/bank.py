@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from datetime import date, timedelta
+from decimal import Decimal
+import os
+import shutil
+import tempfile
+from threading import Thread
+from time import sleep
+from unittest import TestCase
+
+from weboob.applications.boobank.boobank import Boobank
+from weboob.capabilities.bank import Account, CapBank, Transaction
+from weboob.capabilities.bill import Document
+from weboob.core.executor import WorkerPool
+from weboob.core.ouiboube import WebNip
+from weboob.tools.backend import Module
+from weboob.tools.capabilities.bank.sync import HistorySync
+from weboob.tools.capabilities.bank.transactions import merge_iterators, sorted_transactions
+from weboob.tools.capabilities.bill.documents import merge_iterators as merge_documents
+from weboob.tools.storage import StandardStorage
+
+
+def make_transaction(day, label, amount='-10'):
+    tr = Transaction()
+    tr.date = date(2020, 1, day)
+    tr.label = tr.raw = label
+    tr.amount = Decimal(amount)
+    return tr
+
+
+class MyBankModule(Module, CapBank):
+    NAME = 'mybank'
+    HISTORY_SORTED = True
+
+    def __init__(self, *args, **kwargs):
+        super(MyBankModule, self).__init__(*args, **kwargs)
+        # most recent first
+        self.history = [make_transaction(day, u'SHOP %d' % day) for day in (20, 15, 10, 5)]
+        self.fetched = 0
+
+    def iter_history(self, account):
+        for tr in self.history:
+            self.fetched += 1
+            yield tr
+
+
+class HistorySinceTest(TestCase):
+    def test_sorted(self):
+        module = MyBankModule(None, 'test')
+        labels = [tr.label for tr in module.iter_history_since(Account('1'), date(2020, 1, 10))]
+        self.assertEqual(labels, [u'SHOP 20', u'SHOP 15', u'SHOP 10'])
+        # stopped at the first older transaction
+        self.assertEqual(module.fetched, 4)
+
+        module.history.append(make_transaction(12, u'LATE'))
+        module.HISTORY_SORTED = False
+        labels = [tr.label for tr in module.iter_history_since(Account('1'), date(2020, 1, 10))]
+        self.assertEqual(labels, [u'SHOP 20', u'SHOP 15', u'SHOP 10', u'LATE'])
+
+
+class HistorySyncTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+        storage = StandardStorage(os.path.join(self.tmpdir, 'storage.yml'))
+        self.module = MyBankModule(None, 'test', storage=storage)
+        self.account = Account('1')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_sync(self):
+        sync = HistorySync(self.module, margin=7)
+        self.assertEqual(len(list(sync.iter_new_history(self.account))), 4)
+        last_date, ids = sync.get_watermark(self.account)
+        self.assertEqual(last_date, date(2020, 1, 20))
+        self.assertEqual(len(ids), 2)
+
+        # nothing new, and older pages are not fetched
+        self.module.fetched = 0
+        self.assertEqual(list(sync.iter_new_history(self.account)), [])
+        self.assertEqual(self.module.fetched, 3)
+
+        # new transactions, and one added late with an older date
+        self.module.history[:0] = [make_transaction(22, u'NEW'), make_transaction(22, u'NEW')]
+        self.module.history.insert(3, make_transaction(16, u'LATE'))
+        self.assertEqual([tr.label for tr in sync.iter_new_history(self.account)], [u'NEW', u'NEW', u'LATE'])
+        self.assertEqual(list(sync.iter_new_history(self.account)), [])
+
+        # the watermark is saved in the storage
+        storage = StandardStorage(os.path.join(self.tmpdir, 'storage.yml'))
+        module = MyBankModule(None, 'test', storage=storage)
+        self.assertEqual(HistorySync(module).get_watermark(self.account)[0], date(2020, 1, 22))
+
+        sync.reset(self.account)
+        self.assertIsNone(sync.get_watermark(self.account))
+
+    def test_interrupted(self):
+        sync = HistorySync(self.module)
+        next(sync.iter_new_history(self.account))
+        self.assertIsNone(sync.get_watermark(self.account))
+
+
+class MergeIteratorsTest(TestCase):
+    def test_transactions(self):
+        first = [make_transaction(day, u'FIRST %d' % day) for day in (20, 10, 5)]
+        second = [make_transaction(day, u'SECOND %d' % day) for day in (15, 10, 1)]
+        second[0].rdate = date(2020, 1, 14)
+
+        merged = list(merge_iterators(iter(first), iter(second), []))
+        self.assertEqual([tr.label for tr in merged],
+                         [u'FIRST 20', u'SECOND 15', u'FIRST 10', u'SECOND 10', u'FIRST 5', u'SECOND 1'])
+        self.assertEqual(merged, sorted_transactions(first + second))
+
+    def test_unique(self):
+        history = [make_transaction(day, u'SHOP') for day in (20, 10, 10, 5)]
+        other = [make_transaction(day, u'SHOP') for day in (25, 10)]
+
+        merged = list(merge_iterators(history, other, unique=True))
+        self.assertEqual([tr.date.day for tr in merged], [25, 20, 10, 10, 5])
+        self.assertEqual(len(list(merge_iterators(history, other))), 6)
+
+        with self.assertRaises(TypeError):
+            merge_iterators(history, other, uniq=True)
+
+    def test_documents(self):
+        def make_document(id, day):
+            doc = Document(id)
+            doc.date = date(2020, 1, day)
+            return doc
+
+        merged = merge_documents([make_document('a', 3), make_document('b', 1)],
+                                 [make_document('c', 2), make_document('b', 1)], unique=True)
+        self.assertEqual([doc.id for doc in merged], ['a', 'c', 'b'])
+
+
+class MyLongBankModule(MyBankModule):
+    def iter_history(self, account):
+        for i in range(300):
+            # slow enough for the consumer to start before the end
+            sleep(.001)
+            tr = make_transaction(1, u'%s %d' % (account.id, i))
+            tr.date -= timedelta(days=3 * i + int(account.id))
+            yield tr
+
+
+class MyApplication(object):
+    iter_merged_history = Boobank.iter_merged_history
+
+    def __init__(self, weboob):
+        self.do = weboob.do
+
+
+class MergedHistoryTest(TestCase):
+    def setUp(self):
+        pool = WorkerPool()
+        # don't wait for backends still running if the test failed
+        self.addCleanup(pool.shutdown, wait=False)
+        self.weboob = WebNip(modules_path=False, executor=pool)
+        for name in ('a', 'b'):
+            self.weboob.backend_instances[name] = MyLongBankModule(self.weboob, name)
+
+    def test_same_backend(self):
+        accounts = []
+        for _id, backend in (('0', 'a'), ('1', 'a'), ('2', 'b')):
+            account = Account(_id)
+            account.backend = backend
+            accounts.append(account)
+
+        # calls paused until their results are consumed must not wait for
+        # each other
+        app = MyApplication(self.weboob)
+        history = []
+        thread = Thread(target=lambda: history.extend(app.iter_merged_history('iter_history', accounts)))
+        thread.daemon = True
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), 'merged histories are stuck')
+        self.assertEqual(len(history), 900)
+        self.assertEqual([tr.label for tr in history[:4]], [u'0 0', u'1 0', u'2 0', u'0 1'])
+        self.assertEqual(history, sorted_transactions(history))
+
+    def make_account(self, _id, backend):
+        account = Account(_id)
+        account.backend = backend
+        return account
+
+    def test_since(self):
+        module = self.weboob.backend_instances['a'] = MyBankModule(self.weboob, 'a')
+        app = MyApplication(self.weboob)
+        history = list(app.iter_merged_history('iter_history_since', [self.make_account('1', 'a')], date(2020, 1, 12)))
+        self.assertEqual([tr.label for tr in history], [u'SHOP 20', u'SHOP 15'])
+        self.assertEqual(module.fetched, 3)
+
+    def test_sync(self):
+        tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+        self.addCleanup(shutil.rmtree, tmpdir)
+        storage = StandardStorage(os.path.join(tmpdir, 'storage.yml'))
+        module = self.weboob.backend_instances['a'] = MyBankModule(self.weboob, 'a', storage=storage)
+
+        app = MyApplication(self.weboob)
+        accounts = [self.make_account('1', 'a'), self.make_account('2', 'a')]
+        self.assertEqual(len(list(app.iter_merged_history('iter_new_history', accounts))), 8)
+        self.assertEqual(list(app.iter_merged_history('iter_new_history', accounts)), [])
+
+        module.history.insert(0, make_transaction(22, u'NEW'))
+        history = list(app.iter_merged_history('iter_new_history', accounts))
+        self.assertEqual([tr.label for tr in history], [u'NEW', u'NEW'])
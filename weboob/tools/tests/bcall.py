@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from threading import Event
+from time import sleep, time
+from unittest import TestCase
+
+from weboob.core.bcall import BackendsCall, BackendTimeout, CallErrors
+from weboob.core.executor import WorkerPool
+from weboob.tools.memo import SyncCache
+from weboob.tools.misc import merge_sorted
+
+
+class MyBackend(object):
+    def __init__(self, name, results):
+        self.name = name
+        self.results = results
+        self.sync_cache = SyncCache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, v, tb):
+        pass
+
+    def sync_scope(self, call=False):
+        return self.sync_cache.scope(call=call)
+
+    def iter_results(self):
+        for result in self.results:
+            if isinstance(result, Exception):
+                raise result
+            yield result
+
+
+class GatedBackend(MyBackend):
+    """Yield the first result, then wait for the consumer to start."""
+
+    def __init__(self, name, results):
+        super(GatedBackend, self).__init__(name, results)
+        self.started = Event()
+
+    def iter_results(self):
+        yield self.results[0]
+        self.started.wait()
+        for result in self.results[1:]:
+            yield result
+
+
+class SlowBackend(MyBackend):
+    def iter_results(self):
+        for result in self.results:
+            sleep(0.2)
+            yield result
+
+
+class SmallBackendsCall(BackendsCall):
+    RESULTS_QUEUE_SIZE = 10
+
+
+class BackendsCallTest(TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(max_workers=4)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def wait_blocked(self, count):
+        for _ in range(500):
+            if self.pool.blocked == count:
+                break
+            sleep(.01)
+        self.assertEqual(self.pool.blocked, count)
+
+    def test_iter(self):
+        backends = [MyBackend('b%d' % i, range(i * 10, i * 10 + 10)) for i in range(5)]
+
+        self.assertEqual(sorted(BackendsCall(backends, 'iter_results', executor=self.pool)), list(range(50)))
+        self.assertEqual(sorted(BackendsCall(backends, 'iter_results')), list(range(50)))
+
+    def test_backpressure(self):
+        backend = GatedBackend('a', list(range(1000)))
+        call = SmallBackendsCall([backend], 'iter_results')
+        results = []
+        for result in call:
+            backend.started.set()
+            self.assertLessEqual(len(call.responses), call.maxsize)
+            results.append(result)
+        self.assertEqual(results, list(range(1000)))
+
+        # results never read don't block backends
+        call = SmallBackendsCall([MyBackend('a', range(1000))], 'iter_results')
+        with call.cond:
+            while call.pending:
+                self.assertIsNot(call.cond.wait(5), False)
+        self.assertEqual(len(call.responses), 1000)
+
+        # nothing is consumed while waiting
+        call = SmallBackendsCall([MyBackend('a', range(1000))], 'iter_results')
+        call.wait()
+        self.assertEqual(list(call), list(range(1000)))
+
+    def check_nested_calls(self):
+        backends = [GatedBackend('b%d' % i, list(range(200))) for i in range(4)]
+
+        # backends of the first call wait for their results to be consumed,
+        # which doesn't prevent the second call from running on the pool
+        results = []
+        for result in BackendsCall(backends, 'iter_results', executor=self.pool):
+            if not results:
+                for backend in backends:
+                    backend.started.set()
+                self.wait_blocked(len(backends))
+                nested = BackendsCall(backends, 'iter_results', executor=self.pool, deadline=time() + 10)
+                self.assertEqual(len(list(nested)), 800)
+            results.append(result)
+        self.assertEqual(len(results), 800)
+
+    def test_nested_calls(self):
+        self.check_nested_calls()
+
+        # more calls than workers, read together
+        calls = [BackendsCall([MyBackend('b%d' % i, range(i, 5000, 10))], 'iter_results', executor=self.pool)
+                 for i in range(10)]
+        self.assertEqual(list(merge_sorted(calls)), list(range(5000)))
+
+    def test_nested_calls_warm_pool(self):
+        # workers which ran queued tasks are not counted as idle twice
+        backends = [MyBackend('b%d' % i, range(10)) for i in range(40)]
+        self.assertEqual(len(list(BackendsCall(backends, 'iter_results', executor=self.pool))), 400)
+        self.check_nested_calls()
+
+    def test_sync_scope(self):
+        class ScopedBackend(MyBackend):
+            def iter_results(self):
+                for result in self.results:
+                    yield self.sync_cache.active, self.sync_cache.shared
+
+        backend = ScopedBackend('a', range(3))
+        self.assertEqual(list(BackendsCall([backend], 'iter_results')), [(True, False)] * 3)
+        self.assertFalse(backend.sync_cache.active)
+        with backend.sync_scope():
+            self.assertEqual(list(BackendsCall([backend], 'iter_results')), [(True, True)] * 3)
+
+    def test_errors(self):
+        call = BackendsCall([MyBackend('a', [1, ValueError('a')]), MyBackend('b', [2])], 'iter_results')
+        results = []
+        with self.assertRaises(CallErrors) as cm:
+            for result in call:
+                results.append(result)
+        self.assertEqual([backend.name for backend, _, _ in cm.exception], ['a'])
+        self.assertEqual(sorted(results), [1, 2])
+
+    def test_callback_thread(self):
+        results = []
+        errors = []
+        finished = Event()
+        call = BackendsCall([MyBackend('a', range(10)), MyBackend('b', [ValueError('b')])], 'iter_results')
+        call.callback_thread(results.append, lambda *err: errors.append(err), finished.set)
+        self.assertTrue(finished.wait(5))
+        self.assertEqual(sorted(results), list(range(10)))
+        self.assertEqual([backend.name for backend, _, _ in errors], ['b'])
+
+    def test_timeouts(self):
+        backends = [MyBackend('fast', [1, 2]), SlowBackend('slow', [3, 4])]
+        results = []
+        with self.assertRaises(CallErrors) as cm:
+            for result in BackendsCall(backends, 'iter_results', timeout=0.3):
+                results.append(result)
+        self.assertEqual([(backend.name, type(error)) for backend, error, _ in cm.exception],
+                         [('slow', BackendTimeout)])
+        self.assertEqual(sorted(results), [1, 2, 3])
+
+        # backends still queued are abandoned too
+        pool = WorkerPool(max_workers=1)
+        call = BackendsCall([SlowBackend('a', [1, 2]), SlowBackend('b', [3])], 'iter_results',
+                            executor=pool, deadline=time() + 0.3)
+        with self.assertRaises(CallErrors) as cm:
+            call.wait()
+        self.assertEqual(sorted(backend.name for backend, error, _ in cm.exception), ['a', 'b'])
+        self.assertEqual(list(call.responses), [1])
+        pool.shutdown()
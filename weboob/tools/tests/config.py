@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from datetime import date
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from weboob.tools.config.iconfig import ConfigError
+from weboob.tools.config.sqliteconfig import SQLiteConfig
+
+
+class SQLiteConfigTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+        self.path = os.path.join(self.tmpdir, 'storage.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def open(self):
+        config = SQLiteConfig(self.path)
+        config.load()
+        return config
+
+    def test_values(self):
+        config = self.open()
+        self.assertEqual(config.storage.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+        values = {
+            'dict': {'a': [1, 2.5, None, True], u'é': u'ü'},
+            'tuple': (1, 2),
+            'date': date(2020, 1, 1),
+            'int_keys': {1: 'a'},
+            'bytes': b'\x00\xff',
+        }
+        for key, value in values.items():
+            config.set('things', key, value)
+        config.force_save()
+
+        config = self.open()
+        for key, value in values.items():
+            self.assertEqual(config.get('things', key), value)
+        self.assertEqual(dict(config.items('things')), values)
+        self.assertEqual(config.get('things', 'nope', default=42), 42)
+        with self.assertRaises(ConfigError):
+            config.get('things', 'nope')
+
+        del config.values['things']['tuple']
+        self.assertNotIn('tuple', config.values['things'])
+        config.delete('things')
+        self.assertNotIn('things', config.values)
+
+    def test_yaml_compatibility(self):
+        config = self.open()
+        config.ensure_table('things')
+        config.storage.execute("INSERT INTO things VALUES ('old', ?)", (u"a:\n- 1\n- '2'\nb: 2020-01-01\n",))
+        config.storage.execute("INSERT INTO things VALUES ('empty', ?)", (u'{}\n',))
+        self.assertEqual(config.get('things', 'old'), {'a': [1, '2'], 'b': date(2020, 1, 1)})
+        self.assertEqual(config.get('things', 'empty'), {})
+
+    def test_unchanged(self):
+        config = self.open()
+        config.set('things', 'key', {'a': 1})
+        changes = config.storage.total_changes
+        config.set('things', 'key', {'a': 1})
+        if SQLiteConfig.UPSERT.startswith('INSERT INTO'):
+            self.assertEqual(config.storage.total_changes, changes)
+        config.set('things', 'key', {'a': 2})
+        self.assertEqual(config.get('things', 'key'), {'a': 2})
+
+    def test_concurrent(self):
+        first = self.open()
+        second = self.open()
+        first.set('things', 'a', 1)
+        # no write transaction is kept open until the next save
+        second.set('things', 'b', 2)
+        self.assertEqual(first.get('things', 'b'), 2)
+        self.assertEqual(second.get('things', 'a'), 1)
+        first.force_save()
+        second.force_save()
+
+    def test_vacuum(self):
+        config = self.open()
+        for i in range(100):
+            config.set('things', str(i), 'x' * 1000)
+        config.delete('things')
+        config.force_save()
+
+        def size():
+            return sum(os.path.getsize(path) for path in (self.path, self.path + '-wal') if os.path.exists(path))
+
+        before = size()
+        config.vacuum()
+        self.assertLess(size(), before)
+        self.assertFalse(os.path.exists(os.path.splitext(self.path)[0] + '.sql'))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from unittest import TestCase
+
+from weboob.browser.browsers import LoginBrowser
+from weboob.capabilities.bank import Account
+from weboob.tools.backend import Module
+from weboob.tools.memo import sync_memoized
+
+
+class MyBrowser(LoginBrowser):
+    def __init__(self, *args, **kwargs):
+        super(MyBrowser, self).__init__('user', 'pass', *args, **kwargs)
+        self.calls = []
+        self.fail = False
+
+    @sync_memoized
+    def get_accounts(self):
+        self.calls.append('accounts')
+        return [Account('1'), Account('2')]
+
+    @sync_memoized
+    def get_history(self, account):
+        self.calls.append(('history', account.id))
+        for i in range(3):
+            if self.fail:
+                raise ValueError('website is down')
+            yield i
+
+
+class MyModule(Module):
+    NAME = 'test'
+    BROWSER = MyBrowser
+
+    @sync_memoized
+    def get_account(self, _id):
+        self.browser.calls.append(('account', _id))
+        return Account(_id)
+
+
+class SyncMemoizedTest(TestCase):
+    def setUp(self):
+        self.module = MyModule(None, 'test')
+        self.browser = self.module.browser
+
+    def test_scope(self):
+        self.browser.get_accounts()
+        self.browser.get_accounts()
+        self.assertEqual(self.browser.calls, ['accounts', 'accounts'])
+
+        del self.browser.calls[:]
+        with self.module.sync_scope():
+            accounts = self.browser.get_accounts()
+            self.assertIs(self.browser.get_accounts(), accounts)
+            with self.module.sync_scope():
+                self.module.get_account('1')
+                self.module.get_account('1')
+            # still open
+            self.module.get_account('1')
+            self.module.get_account(_id='2')
+        self.assertEqual(self.browser.calls, ['accounts', ('account', '1'), ('account', '2')])
+
+        # cache was emptied when the scope was closed
+        with self.module.sync_scope():
+            self.browser.get_accounts()
+        self.assertEqual(self.browser.calls[-1], 'accounts')
+
+    def test_shared(self):
+        cache = self.module.sync_cache
+        with self.module.sync_scope(call=True):
+            self.assertTrue(cache.active)
+            self.assertFalse(cache.shared)
+            with self.module.sync_scope():
+                self.assertTrue(cache.shared)
+            self.assertFalse(cache.shared)
+        self.assertFalse(cache.active)
+
+    def test_generator(self):
+        with self.module.sync_scope():
+            self.assertEqual(next(self.browser.get_history(Account('1'))), 0)
+            # partially iterated, not cached
+            self.assertEqual(list(self.browser.get_history(Account('1'))), [0, 1, 2])
+            self.assertEqual(list(self.browser.get_history(Account('1'))), [0, 1, 2])
+            self.assertEqual(list(self.browser.get_history(Account('2'))), [0, 1, 2])
+        self.assertEqual(self.browser.calls, [('history', '1'), ('history', '1'), ('history', '2')])
+
+    def test_invalidation(self):
+        with self.module.sync_scope():
+            self.browser.get_accounts()
+            self.browser.do_logout()
+            self.browser.get_accounts()
+            self.assertEqual(self.browser.calls, ['accounts', 'accounts'])
+
+            self.browser.fail = True
+            with self.assertRaises(ValueError):
+                list(self.browser.get_history(Account('1')))
+            self.browser.get_accounts()
+            self.assertEqual(self.browser.calls[-1], 'accounts')
+
+        # an error raised through the scope empties it
+        with self.assertRaises(ValueError):
+            with self.module.sync_scope():
+                self.browser.get_accounts()
+                with self.module.sync_scope():
+                    raise ValueError()
+        self.assertEqual(self.module.sync_cache.entries, {})
+        self.assertFalse(self.module.sync_cache.active)
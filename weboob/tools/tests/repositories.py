@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from contextlib import closing
+from io import BytesIO
+import os
+import shutil
+import tarfile
+import tempfile
+from unittest import TestCase
+
+from weboob.core import repositories
+from weboob.core.repositories import IProgress, ModuleInfo, Repositories, Repository
+from weboob.exceptions import BrowserHTTPNotFound, ModuleInstallError
+
+
+def make_module(path, name, description):
+    os.mkdir(os.path.join(path, name))
+    with open(os.path.join(path, name, '__init__.py'), 'w') as f:
+        f.write('from .module import %sModule\n' % name.capitalize())
+    with open(os.path.join(path, name, 'module.py'), 'w') as f:
+        f.write('from weboob.capabilities.bank import CapBank\n'
+                'from weboob.tools.backend import Module\n'
+                '\n'
+                'class %sModule(Module, CapBank):\n'
+                '    NAME = "%s"\n'
+                '    DESCRIPTION = u"%s"\n'
+                '    VERSION = "2.1"\n' % (name.capitalize(), name, description))
+
+
+class MyResponse(object):
+    def __init__(self, content):
+        self.content = content
+
+    def iter_content(self, size):
+        for i in range(0, len(self.content), size):
+            yield self.content[i:i + size]
+
+    def close(self):
+        pass
+
+
+class MyBrowser(object):
+    MAX_WORKERS = 10
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def open(self, url, stream=False):
+        if url.endswith('.png'):
+            raise BrowserHTTPNotFound()
+        return MyResponse(self.archive if 'first' in url else b'garbage')
+
+
+class SilentProgress(IProgress):
+    def progress(self, percent, message):
+        pass
+
+
+class RepositoryTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+        self.opened = []
+
+        original = repositories.open_module
+
+        def open_module(name, *args):
+            self.opened.append(name)
+            return original(name, *args)
+
+        repositories.open_module = open_module
+        self.addCleanup(setattr, repositories, 'open_module', original)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_build_index(self):
+        filename = os.path.join(self.tmpdir, Repository.INDEX)
+        make_module(self.tmpdir, 'first', 'First')
+        make_module(self.tmpdir, 'second', 'Second')
+        repository = Repository('file://%s' % self.tmpdir)
+        repository.name = 'test'
+
+        repository.build_index(self.tmpdir, filename)
+        self.assertEqual(sorted(self.opened), ['first', 'second'])
+        self.assertEqual(repository.modules['first'].capabilities, ['CapBank', 'CapCollection'])
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, Repository.MANIFEST)))
+
+        del self.opened[:]
+        repository.build_index(self.tmpdir, filename)
+        self.assertEqual(self.opened, [])
+        self.assertEqual(sorted(repository.modules), ['first', 'second'])
+        self.assertEqual(repository.modules['first'].description, u'First')
+
+        # a new file is found even if it is older
+        path = os.path.join(self.tmpdir, 'second', 'pages.py')
+        with open(path, 'w'):
+            pass
+        os.utime(path, (0, 0))
+        repository.build_index(self.tmpdir, filename)
+        self.assertEqual(self.opened, ['second'])
+
+        shutil.rmtree(os.path.join(self.tmpdir, 'second'))
+        repository.build_index(self.tmpdir, filename)
+        self.assertEqual(sorted(repository.modules), ['first'])
+        with open(filename) as f:
+            repository.parse_index(f)
+        self.assertEqual(repository.modules['first'].version,
+                         Repository.get_tree_mtime(os.path.join(self.tmpdir, 'first')))
+
+
+class InstallTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+        with open(os.path.join(self.tmpdir, Repositories.SOURCES_LIST), 'w'):
+            pass
+        self.repositories = Repositories(self.tmpdir, self.tmpdir, '2.1')
+
+        make_module(self.tmpdir, 'first', 'First')
+        archive = BytesIO()
+        with closing(tarfile.open(fileobj=archive, mode='w:gz')) as tar:
+            tar.add(os.path.join(self.tmpdir, 'first'), arcname='first')
+        self.repositories.browser = MyBrowser(archive.getvalue())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_install(self):
+        info = ModuleInfo('first')
+        info.url = 'http://example.org/first.tar.gz'
+        info.signed = False
+        info.version = 201901010000
+        self.repositories.install(info, SilentProgress())
+        self.assertTrue(os.path.exists(os.path.join(self.repositories.modules_dir, 'first', 'module.py')))
+        self.assertEqual(self.repositories.versions.get('first'), 201901010000)
+
+    def test_install_error(self):
+        info = ModuleInfo('second')
+        info.url = 'http://example.org/second.tar.gz'
+        info.signed = False
+        with self.assertRaises(ModuleInstallError):
+            self.repositories.install(info, SilentProgress())
+        self.assertIsNone(self.repositories.versions.get('second'))
+        # temporary directories are removed
+        self.assertEqual(os.listdir(self.repositories.modules_dir), [])
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright(C) 2020 weboob project
+#
+# This file is part of weboob.
+#
+# weboob is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# weboob is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with weboob. If not, see <http://www.gnu.org/licenses/>.
+from datetime import datetime
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import yaml
+
+from weboob.tools.config.yamlconfig import YamlConfig
+from weboob.tools.storage import StandardStorage
+
+
+class StandardStorageTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='weboob_test_')
+        self.path = os.path.join(self.tmpdir, 'boobank.storage')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shards(self):
+        storage = StandardStorage(self.path)
+        storage.load('backends', 'bank1', {'browser_state': {}})
+        storage.load('backends', 'bank/2', {})
+        self.assertEqual(storage.get('backends', 'bank1', 'browser_state'), {})
+
+        storage.set('backends', 'bank1', 'browser_state', 'cookies', u'blob')
+        storage.set('backends', 'bank/2', 'seen', {'expire': datetime(2020, 1, 1)})
+        storage.save('backends', 'bank1')
+        storage.save('backends', 'bank/2')
+
+        bank1 = storage.shard_path('backends', 'bank1')
+        bank2 = storage.shard_path('backends', 'bank/2')
+        self.assertEqual(os.path.dirname(bank2), os.path.dirname(bank1))
+        with io.open(bank1, encoding='utf-8') as f:
+            self.assertEqual(f.read(), u'{"browser_state":{"cookies":"blob"}}')
+        # files are always readable as YAML
+        with io.open(bank2, encoding='utf-8') as f:
+            self.assertEqual(yaml.safe_load(f), {'seen': {'expire': datetime(2020, 1, 1)}})
+
+        # only changed shards are written
+        os.remove(bank1)
+        storage.set('backends', 'bank/2', 'seen', 'expire', datetime(2020, 1, 2))
+        storage.save('backends', 'bank1')
+        storage.save('backends', 'bank/2')
+        self.assertFalse(os.path.exists(bank1))
+        storage.set('backends', 'bank1', 'new', 1)
+        storage.save('backends', 'bank1')
+
+        # another process only reads the shard it needs
+        other = StandardStorage(self.path)
+        self.assertEqual(other.get('backends', 'bank/2', 'seen', 'expire'), datetime(2020, 1, 2))
+        self.assertEqual(other.get('backends', 'bank1', 'new'), 1)
+        self.assertEqual(list(other.config.values['backends']), ['bank/2', 'bank1'])
+        self.assertIsNone(other.get('backends', 'bank3', 'nothing', default=None))
+
+        other.delete('backends', 'bank1')
+        other.save('backends', 'bank1')
+        self.assertFalse(os.path.exists(bank1))
+
+    def test_migration(self):
+        config = YamlConfig(self.path)
+        config.values = {
+            'backends': {'bank1': {'browser_state': {'cookies': 'blob'}}, 'bank2': {}},
+            'applications': {'boobank': {'last': 42}},
+        }
+        config.save()
+
+        storage = StandardStorage(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(os.path.exists(self.path + '.bak'))
+        self.assertEqual(storage.get('backends', 'bank1', 'browser_state', 'cookies'), 'blob')
+        self.assertEqual(storage.get('backends', 'bank2'), {})
+        self.assertEqual(storage.get('applications', 'boobank', 'last'), 42)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['boobank.storage.bak', 'boobank.storage.d'])
+
+        # only done once
+        StandardStorage(self.path)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['boobank.storage.bak', 'boobank.storage.d'])